@@ -0,0 +1,382 @@
+"""Offscreen GUI benchmarks for GPTLearner.
+
+Builds synthetic curricula and chat logs of growing size and times the UI
+paths that have been slow in practice: curriculum tree parsing and editing,
+review rendering, tab creation, learning session restore, and chat scrolling. Each
+result is appended as one JSON line to benchmarks/results/results.jsonl,
+tagged with a run ID and the current commit, so runs can be compared:
+
+    python benchmarks/run_benchmarks.py              # full suite
+    python benchmarks/run_benchmarks.py --quick -k scroll
+    python benchmarks/run_benchmarks.py --compare    # diff against the previous run
+
+No API calls are made; a placeholder API key is used if none is set.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import platform
+import resource
+import threading
+import tempfile
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ.setdefault("GPTLEARNER_DATA_DIR", tempfile.mkdtemp(prefix="gptlearner-bench-"))
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark-placeholder")
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QT_VERSION_STR
+
+DEFAULT_OUTPUT = os.path.join(ROOT, "benchmarks", "results", "results.jsonl")
+CURRICULUM_SIZES = [10, 100, 500]  # Main topics, five subtopics each
+MESSAGE_COUNTS = [100, 1000, 5000]
+QUICK_CURRICULUM_SIZES = [10, 100]
+QUICK_MESSAGE_COUNTS = [100, 1000]
+TAB_COUNTS = [1, 10]
+MAX_SCROLL_FRAMES = 200
+RSS_SAMPLE_SECONDS = 0.002
+
+WORDS = ("closure scope function value type list index loop stream thread queue cache "
+         "pattern module object class method return error state event signal slot").split()
+
+
+def synthetic_curriculum(topics: int, seed: int = 1) -> str:
+    """A curriculum in the generator's markdown format with the given number of main topics."""
+    rng = random.Random(seed)
+    lines = ["# Learning Objectives"] + [f"- Objective {i}: understand {rng.choice(WORDS)}" for i in range(5)]
+    lines += ["", "# Prerequisites", "- Basic programming", "- Curiosity", "", "# Main Topics"]
+    for topic in range(topics):
+        lines.append(f"- Topic {topic}: {' '.join(rng.sample(WORDS, 3))}")
+        lines += [f"  - Subtopic {topic}.{sub}: {' '.join(rng.sample(WORDS, 4))}" for sub in range(5)]
+    lines += ["", "# Practical Exercises"] + [f"- Exercise {i}" for i in range(5)]
+    lines += ["", "# Key Resources"] + [f"- Resource {i}" for i in range(5)]
+    return "\n".join(lines)
+
+
+def synthetic_messages(count: int, seed: int = 1) -> List[Dict]:
+    """Alternating user and assistant messages of varied length."""
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        length = rng.randint(5, 20) if role == "user" else rng.randint(30, 250)
+        content = " ".join(rng.choice(WORDS) for _ in range(length))
+        messages.append({"type": role, "content": content, "timestamp": "12:00"})
+    return messages
+
+
+def session_state(topics: int, messages: int) -> Dict:
+    return {
+        "session_id": uuid.uuid4().hex,
+        "topic": f"Benchmark {topics}x{messages}",
+        "expertise_level": "Beginner",
+        "curriculum": synthetic_curriculum(topics),
+        "messages": synthetic_messages(messages),
+        "progress": {},
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence stdout from the code under test without skipping the work."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def peak_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def current_rss_mb() -> float:
+    """Resident memory now; where /proc is missing, the process peak stands in."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+    return pages * resource.getpagesize() / (1024 * 1024)
+
+
+class RssSampler:
+    """Tracks the highest resident memory above a baseline while a block runs.
+
+    ru_maxrss is a process-wide high-water mark, so after the first large
+    case it no longer says anything about the next one. This samples the
+    current RSS on a thread instead; each measure() block reports its own
+    peak over the RSS it started at.
+    """
+
+    def __init__(self):
+        self.peak_delta = 0.0
+        self._stop = threading.Event()
+
+    @contextlib.contextmanager
+    def measure(self):
+        baseline = current_rss_mb()
+        peak = [baseline]
+        self._stop.clear()
+
+        def sample():
+            while not self._stop.wait(RSS_SAMPLE_SECONDS):
+                peak[0] = max(peak[0], current_rss_mb())
+
+        thread = threading.Thread(target=sample, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            self._stop.set()
+            thread.join()
+            peak[0] = max(peak[0], current_rss_mb())
+            self.peak_delta = max(self.peak_delta, peak[0] - baseline)
+
+
+class Bench:
+    """Runs benchmark cases and collects result records."""
+
+    def __init__(self, app: QApplication, window, repeat: int, pattern: str):
+        self.app = app
+        self.window = window
+        self.repeat = repeat
+        self.pattern = pattern
+        self.records: List[Dict] = []
+
+    def time(self, case: str, size: int, fn: Callable[[], None], setup: Callable[[], None] = None,
+             teardown: Callable[[], None] = None):
+        """Time fn over the configured repeats; setup and teardown are not timed."""
+        if self.pattern and self.pattern not in case:
+            return
+        samples = []
+        memory = RssSampler()
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            with memory.measure():
+                started = time.perf_counter()
+                with quiet():
+                    fn()
+                    self.app.processEvents()
+                samples.append((time.perf_counter() - started) * 1000)
+            if teardown:
+                teardown()
+            self.app.processEvents()
+        self._record(case, size, samples, memory)
+
+    def frames(self, case: str, size: int, frame_times: List[float], memory: RssSampler):
+        self._record(case, size, frame_times, memory, frames=True)
+
+    def _record(self, case: str, size: int, samples: List[float], memory: RssSampler, frames: bool = False):
+        ordered = sorted(samples)
+        record = {
+            "case": case,
+            "size": size,
+            "median_ms": round(statistics.median(ordered), 3),
+            "min_ms": round(ordered[0], 3),
+            "max_ms": round(ordered[-1], 3),
+            "samples": len(ordered),
+            "peak_rss_delta_mb": round(memory.peak_delta, 1),  # Above the RSS at the start of a repeat
+            "rss_mb": round(current_rss_mb(), 1),
+        }
+        if frames:
+            record["p95_ms"] = round(ordered[int(0.95 * (len(ordered) - 1))], 3)
+        self.records.append(record)
+        extra = f" p95={record['p95_ms']:.2f}ms" if frames else ""
+        print(f"{case:<24} {size:>6}  median={record['median_ms']:9.2f}ms{extra}  "
+              f"mem=+{record['peak_rss_delta_mb']}MB")
+
+
+def run_suite(bench: Bench, curriculum_sizes: List[int], message_counts: List[int]):
+    from ui.tabs.learning_session_tab import CurriculumTreeView, LearningSessionTab
+    from ui.tabs.curriculum_review_tab import CurriculumReviewTab
+    from services.curriculum import CurriculumDocument
+
+    window = bench.window
+    for topics in curriculum_sizes:
+        curriculum = synthetic_curriculum(topics)
+
+        tree = CurriculumTreeView()
+        bench.time("tree_load", topics, lambda: tree.parse_curriculum(curriculum))
+        tree.deleteLater()
+
+        # One line rewritten and one inserted mid-curriculum, as typed in the review editor
+        document = CurriculumDocument(curriculum)
+        tree = CurriculumTreeView()
+        tree.load(document.curriculum())
+        middle = len(document.lines) // 2
+        edits = iter(range(1_000_000))
+
+        def edit_line():
+            lines = list(document.lines)
+            n = next(edits)
+            lines[middle] = f"  - Edited subtopic {n}"
+            lines.insert(middle + 1, f"- Inserted topic {n}")
+            _, changes = document.update("\n".join(lines))
+            tree.apply_changes(document.curriculum(), changes)
+
+        bench.time("curriculum_edit", topics, edit_line)
+        tree.deleteLater()
+
+        review = CurriculumReviewTab(window, f"Review {topics}", "Beginner")
+        bench.time("review_render", topics, lambda: review.set_curriculum_content(curriculum))
+        review.deleteLater()
+
+        topic = f"Bench {topics}"
+        bench.time(
+            "session_tab_create", topics,
+            lambda: window.create_learning_session(topic, "Beginner", curriculum),
+            teardown=lambda: window.close_tab(window.indexOf(window.learning_sessions[topic])),
+        )
+
+    # Widget construction and polish on their own, without curriculum parsing
+    for count in TAB_COUNTS:
+        reviews = []
+
+        def open_reviews():
+            for i in range(count):
+                review = CurriculumReviewTab(window, f"Tab {i}", "Beginner")
+                window.setCurrentIndex(window.addTab(review, f"Review: Tab {i}"))
+                reviews.append(review)
+
+        def close_reviews():
+            while reviews:
+                review = reviews.pop()
+                window.removeTab(window.indexOf(review))
+                review.deleteLater()
+
+        bench.time("review_tab_create", count, open_reviews, teardown=close_reviews)
+
+    for count in message_counts:
+        state = session_state(10, count)
+        tabs = []
+
+        def restore():
+            tab = LearningSessionTab.from_state(window, state)
+            window.addTab(tab, state["topic"])
+            window.setCurrentWidget(tab)
+            tabs.append(tab)
+
+        def discard():
+            tab = tabs.pop()
+            window.removeTab(window.indexOf(tab))
+            tab.deleteLater()
+
+        bench.time("session_restore", count, restore, teardown=discard)
+
+        if bench.pattern and bench.pattern not in "chat_scroll":
+            continue
+        with quiet():
+            restore()
+        tab = tabs[-1]
+        bench.app.processEvents()
+        scrollbar = tab.chat_display.verticalScrollBar()
+        step = max(1, scrollbar.maximum() // MAX_SCROLL_FRAMES)
+        frame_times = []
+        memory = RssSampler()
+        with memory.measure():
+            for value in range(0, scrollbar.maximum() + 1, step):
+                started = time.perf_counter()
+                scrollbar.setValue(value)
+                tab.chat_display.viewport().repaint()
+                bench.app.processEvents()
+                frame_times.append((time.perf_counter() - started) * 1000)
+        if frame_times:
+            bench.frames("chat_scroll", count, frame_times, memory)
+        discard()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def load_runs(path: str) -> Dict[str, List[Dict]]:
+    runs: Dict[str, List[Dict]] = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                runs.setdefault(record["run"], []).append(record)
+    return runs
+
+
+def compare(previous: List[Dict], current: List[Dict]):
+    """Print median changes between two runs for the cases they share."""
+    before = {(r["case"], r["size"]): r for r in previous}
+    print(f"\nCompared with run {previous[0]['run']} ({previous[0].get('commit') or 'unknown commit'}):")
+    for record in current:
+        old = before.get((record["case"], record["size"]))
+        if old is None or not old["median_ms"]:
+            continue
+        change = (record["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+        print(f"{record['case']:<24} {record['size']:>6}  {old['median_ms']:9.2f}ms -> "
+              f"{record['median_ms']:9.2f}ms  ({change:+.1f}%)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the offscreen GUI benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes, for a fast check")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repeats per case (default: 5)")
+    parser.add_argument("-k", dest="pattern", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Results file (JSON lines)")
+    parser.add_argument("--compare", action="store_true", help="Compare with the previous run in the results file")
+    args = parser.parse_args(argv)
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    app = QApplication(sys.argv[:1])
+    app.setStyle('Fusion')
+    from ui import MainWindow
+    window = MainWindow()
+    window.resize(1200, 900)
+    window.show()
+    app.processEvents()
+
+    bench = Bench(app, window, max(1, args.repeat), args.pattern)
+    run_suite(bench,
+              QUICK_CURRICULUM_SIZES if args.quick else CURRICULUM_SIZES,
+              QUICK_MESSAGE_COUNTS if args.quick else MESSAGE_COUNTS)
+
+    run = {
+        "run": uuid.uuid4().hex[:12],
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "qt": QT_VERSION_STR,
+        "platform": platform.platform(),
+        "quick": args.quick,
+    }
+    previous_runs = load_runs(args.output)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "a", encoding="utf-8") as f:
+        for record in bench.records:
+            f.write(json.dumps(dict(run, **record)) + "\n")
+    print(f"\nWrote {len(bench.records)} results for run {run['run']} to {args.output}")
+
+    if args.compare and previous_runs:
+        compare(list(previous_runs.values())[-1], [dict(run, **r) for r in bench.records])
+
+    window.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""Headless batch curriculum generation.
+
+Reads a list of topic/level pairs (CSV with topic and expertise_level
+columns, or JSONL with the same keys) and generates a curriculum for each
+one through AIService, either with bounded concurrency or as a single
+Message Batches submission. Finished curricula are written to the session
+store (where the app's near-duplicate lookup will find them) or to an
+output directory, and recorded in a checkpoint file so a restarted run
+skips everything already done.
+
+    python src/batch_generate.py topics.csv --concurrency 8
+    python src/batch_generate.py topics.jsonl --output-dir out/ --batch
+"""
+import os
+import re
+import csv
+import sys
+import json
+import time
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+from services.ai_service import AIService
+from services.budget import BudgetExceeded
+from services.session_store import SessionStore, curriculum_id
+from services.topic_similarity import TopicIndex
+from services.answer_cache import AnswerCache
+from services.quiz import QuizService
+from services.version_store import VersionStore
+
+logger = logging.getLogger("batch_generate")
+
+LEVELS = ("Beginner", "Intermediate", "Advanced")
+BATCH_POLL_SECONDS = 30
+
+
+def read_items(path: str) -> List[Dict[str, str]]:
+    """Read topic/level pairs from a CSV or JSONL file, dropping duplicates."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    items, seen = [], set()
+    for row in rows:
+        topic = (row.get("topic") or "").strip()
+        level = (row.get("expertise_level") or row.get("level") or "").strip().capitalize()
+        if not topic or level not in LEVELS:
+            logger.warning(f"Skipping invalid row: {row}")
+            continue
+        key = curriculum_id(topic, level)
+        if key not in seen:
+            seen.add(key)
+            items.append({"key": key, "topic": topic, "expertise_level": level})
+    return items
+
+
+class Checkpoint:
+    """Append-only JSONL record of finished items and submitted batches."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = set()
+        self.batch_id = None
+        self.batch_keys = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if "batch_id" in record:
+                        self.batch_id = record["batch_id"]
+                        self.batch_keys = record["keys"]
+                    else:
+                        self.done.add(record["key"])
+
+    def mark_done(self, key: str) -> None:
+        self._append({"key": key})
+        self.done.add(key)
+
+    def mark_batch(self, batch_id: str, keys: Dict[str, str]) -> None:
+        self._append({"batch_id": batch_id, "keys": keys})
+        self.batch_id, self.batch_keys = batch_id, keys
+
+    def _append(self, record: Dict) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+
+
+class ResultWriter:
+    """Writes finished curricula to the session store or an output directory.
+
+    Stored curricula go through the same steps as MainWindow.store_curriculum,
+    including a commit to the version store, so they have a history in the app.
+    """
+
+    def __init__(self, output_dir: str = None):
+        self.output_dir = output_dir
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        else:
+            self.store = SessionStore()
+            self.version_store = VersionStore(self.store.path("versions"))
+            self.topic_index = TopicIndex(os.path.join(self.store.path("topics"), "index.json"))
+            self.answer_cache = AnswerCache(self.store.path("answers"))
+            self.quiz_service = QuizService(None, self.store.path("quizzes"))  # Only invalidated here
+
+    def write(self, item: Dict[str, str], curriculum: str) -> None:
+        if self.output_dir:
+            path = os.path.join(self.output_dir, f"{item['key']}.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(curriculum)
+            return
+        cid = self.store.save_curriculum(item["topic"], item["expertise_level"], curriculum)
+        self.version_store.commit(cid, curriculum, "Generated in batch")
+        self.topic_index.add(cid, item["topic"], item["expertise_level"], curriculum)
+        self.answer_cache.invalidate(cid)
+        self.quiz_service.invalidate(cid)
+
+
+def run_concurrent(ai_service: AIService, items, writer: ResultWriter, checkpoint: Checkpoint,
+                   concurrency: int, retries: int) -> int:
+    """Generate items on a thread pool, writing each result as it finishes.
+
+    Running out of budget stops the run: items not yet started are dropped,
+    those in flight are still written, and BudgetExceeded is raised.
+    """
+
+    def generate(item):
+        for attempt in range(retries + 1):
+            try:
+                return ai_service.generate_curriculum(item["topic"], item["expertise_level"])
+            except BudgetExceeded:
+                raise  # Retrying cannot succeed
+            except ValueError:
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+
+    failures = 0
+    budget_error = None
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(generate, item): item for item in items}
+        try:
+            for count, future in enumerate(as_completed(futures), 1):
+                item = futures[future]
+                if future.cancelled():
+                    failures += 1
+                    continue
+                try:
+                    writer.write(item, future.result())
+                    checkpoint.mark_done(item["key"])
+                    logger.info(f"[{count}/{len(items)}] {item['topic']} ({item['expertise_level']}) done")
+                except BudgetExceeded as e:
+                    failures += 1
+                    if budget_error is None:
+                        budget_error = e
+                        logger.error(f"Stopping the run: {str(e)}")
+                        for other in futures:
+                            other.cancel()
+                except Exception as e:
+                    failures += 1
+                    logger.error(f"[{count}/{len(items)}] {item['topic']} failed: {str(e)}")
+        except KeyboardInterrupt:
+            logger.warning("Interrupted; finished items are checkpointed")
+            for future in futures:
+                future.cancel()
+            raise
+    elapsed = time.monotonic() - started
+    logger.info(f"Generated {len(items) - failures} curricula in {elapsed:.1f}s "
+                f"({(len(items) - failures) / max(elapsed, 1e-9) * 60:.1f}/min)")
+    if budget_error is not None:
+        raise budget_error
+    return failures
+
+
+def run_batch(ai_service: AIService, items, writer: ResultWriter, checkpoint: Checkpoint) -> int:
+    """Generate pending items with Message Batches and collect the results.
+
+    A checkpointed batch is collected first. Items it did not finish, because
+    they failed in it or were added to the input since, go into a new batch.
+    Every item left without a curriculum counts as a failure.
+    """
+    pending = {item["key"]: item for item in items}
+    errors = {}
+    if checkpoint.batch_id is not None:
+        logger.info(f"Resuming batch {checkpoint.batch_id}")
+        errors = _collect_batch(ai_service, pending, writer, checkpoint)
+        if pending:
+            logger.info(f"Resubmitting {len(pending)} items the batch did not finish")
+
+    if pending:
+        keys = {f"item-{index}": key for index, key in enumerate(pending)}
+        batch_id = ai_service.submit_curriculum_batch([
+            dict(pending[key], custom_id=custom_id) for custom_id, key in keys.items()
+        ])
+        checkpoint.mark_batch(batch_id, keys)
+        errors = _collect_batch(ai_service, pending, writer, checkpoint)
+
+    for key, item in pending.items():
+        logger.error(f"{item['topic']} failed in batch: {errors.get(key, 'no result')}")
+    return len(pending)
+
+
+def _collect_batch(ai_service: AIService, pending: Dict[str, Dict], writer: ResultWriter,
+                   checkpoint: Checkpoint) -> Dict[str, str]:
+    """Wait for the checkpointed batch and write its curricula, removing them from pending.
+
+    Returns the error of each pending item that failed in the batch.
+    """
+    results = ai_service.curriculum_batch_results(checkpoint.batch_id)
+    while results is None:
+        time.sleep(BATCH_POLL_SECONDS)
+        results = ai_service.curriculum_batch_results(checkpoint.batch_id)
+
+    errors = {}
+    for custom_id, result in results.items():
+        key = checkpoint.batch_keys.get(custom_id)
+        if key not in pending:
+            continue
+        if "curriculum" in result:
+            writer.write(pending.pop(key), result["curriculum"])
+            checkpoint.mark_done(key)
+        else:
+            errors[key] = result["error"]
+    return errors
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate curricula for a list of topics.")
+    parser.add_argument("input", help="CSV or JSONL file with topic and expertise_level columns")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel API requests (default: 4)")
+    parser.add_argument("--output-dir", help="Write markdown files here instead of the session store")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <input>.checkpoint.jsonl)")
+    parser.add_argument("--batch", action="store_true", help="Use the Message Batches API for bulk discounts")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per item on API errors (default: 2)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+    items = read_items(args.input)
+    checkpoint = Checkpoint(args.checkpoint or re.sub(r"\.\w+$", "", args.input) + ".checkpoint.jsonl")
+    pending = [item for item in items if item["key"] not in checkpoint.done]
+    logger.info(f"{len(items)} items, {len(items) - len(pending)} already done, {len(pending)} to generate")
+    if not pending:
+        return 0
+
+    ai_service = AIService()
+    writer = ResultWriter(args.output_dir)
+    try:
+        if args.batch:
+            failures = run_batch(ai_service, pending, writer, checkpoint)
+        else:
+            failures = run_concurrent(ai_service, pending, writer, checkpoint,
+                                      max(1, args.concurrency), args.retries)
+    except KeyboardInterrupt:
+        return 130
+    except BudgetExceeded as e:
+        logger.error(f"Budget exhausted; finished items are checkpointed: {str(e)}")
+        return 1
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,349 @@
+"""Local AI server shared by several GPTLearner front-ends.
+
+Hosts a single AIService, and with it a single API client, connection pool
+and rate-limit budget, behind a small HTTP API:
+
+    POST /v1/curriculum  {"topic", "expertise_level", "stream"?}
+    POST /v1/revise      {"topic", "expertise_level", "outline", "instruction", "stream"?}
+    POST /v1/chat        {"messages", "curriculum", "model"?, "stream"?}
+    POST /v1/questions   {"topic", "expertise_level", "curriculum", "sections", "per_section", "stream"?}
+    POST /v1/grade       {"question", "reference", "answer"}
+    GET  /v1/stats
+    GET  /v1/health
+
+With "stream": true the response is a server-sent event stream of "text"
+events followed by one "done" (or "error") event. Invalid parameters are
+answered with 400, failures of the upstream API with 502.
+
+Chat answers are kept in an answer cache shared by all clients, keyed by
+the curriculum's version and the turn the question follows (see
+AnswerCache); close matches are answered from it without an API request,
+unless the client asks for a specific model. Requests beyond the
+concurrency limit wait in a bounded queue; when the queue is full the server
+answers 503 with Retry-After instead of piling up work. Point the desktop app
+at it with GPTLEARNER_SERVER_URL=http://127.0.0.1:8765.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from services.ai_service import AIService
+from services.answer_cache import AnswerCache
+from services.cancellation import CancelToken, RequestCancelled
+from services.session_store import SessionStore
+from services.version_store import version_of
+
+logger = logging.getLogger("server")
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_ACTIVE = 8  # Concurrent API requests
+DEFAULT_MAX_QUEUED = 32  # Requests allowed to wait for a slot
+QUEUE_TIMEOUT_SECONDS = 60
+RETRY_AFTER_SECONDS = 5
+MAX_BODY_BYTES = 1024 * 1024
+MAX_PER_SECTION = 20
+
+
+class AdmissionController:
+    """Bounds concurrent API requests and sheds load when the queue is deep."""
+
+    def __init__(self, max_active: int, max_queued: int):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self._slots = threading.BoundedSemaphore(max_active)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self) -> bool:
+        """Wait for a slot; returns False if the request should be shed.
+
+        A free slot is taken at once, so max_queued 0 means "never wait".
+        """
+        if self._slots.acquire(False):
+            with self._lock:
+                self.active += 1
+                self.admitted += 1
+            return True
+        with self._lock:
+            if self.waiting >= self.max_queued:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=QUEUE_TIMEOUT_SECONDS)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.active += 1
+                self.admitted += 1
+            else:
+                self.rejected += 1
+        return acquired
+
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_active": self.max_active,
+                "max_queued": self.max_queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+class AIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, ai_service: AIService, admission: AdmissionController,
+                 answer_cache: Optional[AnswerCache] = None):
+        super().__init__(address, AIRequestHandler)
+        self.ai_service = ai_service
+        self.admission = admission
+        self.answer_cache = answer_cache
+        self.started = time.monotonic()
+
+    def stats(self) -> Dict:
+        cancellation = self.ai_service.cancellation_stats
+        return dict(
+            self.admission.stats(),
+            uptime_seconds=int(time.monotonic() - self.started),
+            cancelled_requests=cancellation.cancelled_requests,
+            tokens_saved=cancellation.tokens_saved,
+            expected_output_tokens=self.ai_service.expected_output_tokens,
+            routing=self.ai_service.router.stats(),
+            answer_cache=self.answer_cache.metrics() if self.answer_cache is not None else None,
+        )
+
+
+class AIRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/v1/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/v1/stats":
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        routes = {
+            "/v1/curriculum": self._curriculum,
+            "/v1/revise": self._revise,
+            "/v1/chat": self._chat,
+            "/v1/questions": self._questions,
+            "/v1/grade": self._grade,
+        }
+        route = routes.get(self.path)
+        if route is None:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        try:
+            body = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        if not self.server.admission.acquire():
+            logger.warning(f"Shedding {self.path} request; queue is full")
+            self._send_json(503, {"error": "Server busy"}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+            return
+        try:
+            route(body)
+        finally:
+            self.server.admission.release()
+
+    def _curriculum(self, body: Dict):
+        topic, level = body.get("topic"), body.get("expertise_level")
+        if not isinstance(topic, str) or not isinstance(level, str) or not topic.strip():
+            self._send_json(400, {"error": "topic and expertise_level are required"})
+            return
+        self._respond(body, lambda token, on_text: {
+            "curriculum": self.server.ai_service.generate_curriculum(
+                topic, level, cancel_token=token, on_text=on_text),
+        })
+
+    def _revise(self, body: Dict):
+        outline, instruction = body.get("outline"), body.get("instruction")
+        if not isinstance(outline, str) or not isinstance(instruction, str) or not instruction.strip():
+            self._send_json(400, {"error": "outline and instruction are required"})
+            return
+        self._respond(body, lambda token, on_text: {
+            "edits": self.server.ai_service.revise_curriculum(
+                str(body.get("topic", "")), str(body.get("expertise_level", "")), outline, instruction,
+                cancel_token=token),
+        })
+
+    def _chat(self, body: Dict):
+        messages, curriculum = body.get("messages"), body.get("curriculum", "")
+        model = body.get("model")
+        if not isinstance(messages, list) or not isinstance(curriculum, str):
+            self._send_json(400, {"error": "messages (list) and curriculum (string) are required"})
+            return
+        if not messages or not all(isinstance(msg, dict) and isinstance(msg.get("role"), str)
+                                   and isinstance(msg.get("content"), str) for msg in messages):
+            self._send_json(400, {"error": "messages must be objects with role and content strings"})
+            return
+        if model is not None and not isinstance(model, str):
+            self._send_json(400, {"error": "model must be a string"})
+            return
+        cache = self.server.answer_cache
+        question = messages[-1]["content"] if messages[-1]["role"] == "user" and cache is not None else None
+        if question is not None:
+            key = version_of(curriculum)  # Content-addressed, so a changed curriculum starts afresh
+            context = messages[-2]["content"] if len(messages) > 1 else ""
+            hit = cache.lookup(key, "", question, context) if model is None else None
+            if hit is not None and hit["action"] == "serve":
+                self._respond(body, lambda token, on_text: self._cached(hit["answer"], on_text))
+                return
+
+        def call(token, on_text):
+            response = self.server.ai_service.chat(messages, curriculum, cancel_token=token, on_text=on_text,
+                                                   model=model)
+            if question is not None:
+                cache.add(key, "", question, response, context)
+            return {"response": response}
+        self._respond(body, call)
+
+    @staticmethod
+    def _cached(answer: str, on_text) -> Dict:
+        if on_text is not None:
+            on_text(answer)
+        return {"response": answer, "cached": True}
+
+    def _questions(self, body: Dict):
+        sections, per_section = body.get("sections"), body.get("per_section", 5)
+        if not isinstance(sections, list) or not all(isinstance(s, str) for s in sections):
+            self._send_json(400, {"error": "sections must be a list of strings"})
+            return
+        if isinstance(per_section, bool) or not isinstance(per_section, int) \
+                or not 1 <= per_section <= MAX_PER_SECTION:
+            self._send_json(400, {"error": f"per_section must be an integer from 1 to {MAX_PER_SECTION}"})
+            return
+        self._respond(body, lambda token, on_text: {
+            "questions": self.server.ai_service.generate_questions(
+                str(body.get("topic", "")), str(body.get("expertise_level", "")),
+                str(body.get("curriculum", "")), sections, per_section, cancel_token=token),
+        })
+
+    def _grade(self, body: Dict):
+        fields = [body.get(name) for name in ("question", "reference", "answer")]
+        if not all(isinstance(field, str) for field in fields):
+            self._send_json(400, {"error": "question, reference and answer strings are required"})
+            return
+        self._respond(dict(body, stream=False),
+                      lambda token, on_text: self.server.ai_service.grade_answer(*fields))
+
+    def _respond(self, body: Dict, call: Callable[[CancelToken, Optional[Callable[[str], None]]], Dict]):
+        """Run an AIService call, replying with JSON or a server-sent event stream."""
+        token = CancelToken()
+        if not body.get("stream"):
+            try:
+                result = call(token, None)
+            except ValueError as e:
+                self._send_json(502, {"error": str(e)})
+                return
+            self._send_json(200, result)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def on_text(text):
+            try:
+                self._send_event("text", {"text": text})
+            except OSError:
+                # Client went away: stop generating instead of paying for it
+                token.cancel()
+
+        try:
+            self._send_event("done", call(token, on_text))
+        except RequestCancelled:
+            logger.info(f"Client disconnected; {self.path} request cancelled")
+        except (ValueError, OSError) as e:
+            try:
+                self._send_event("error", {"error": str(e)})
+            except OSError:
+                pass
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ValueError("Request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_event(self, event: str, payload: Dict):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve AIService to GPTLearner front-ends.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=int(os.getenv("GPTLEARNER_SERVER_PORT", DEFAULT_PORT)))
+    parser.add_argument("--max-active", type=int, default=DEFAULT_MAX_ACTIVE,
+                        help=f"Concurrent API requests (default: {DEFAULT_MAX_ACTIVE})")
+    parser.add_argument("--max-queued", type=int, default=DEFAULT_MAX_QUEUED,
+                        help=f"Requests allowed to wait before shedding (default: {DEFAULT_MAX_QUEUED})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+
+    admission = AdmissionController(max(1, args.max_active), max(0, args.max_queued))
+    answer_cache = AnswerCache(SessionStore().path("server", "answers"))
+    server = AIServer((args.host, args.port), AIService(), admission, answer_cache)
+    logger.info(f"Serving on http://{args.host}:{args.port} "
+                f"(max_active={admission.max_active}, max_queued={admission.max_queued})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,20 @@
 import os
+import json
+import time
 import anthropic
 import logging
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
+from .cancellation import CancelToken, CancellationStats, RequestCancelled
+from .model_router import ModelRouter
+from .budget import BudgetGovernor, BudgetExceeded
+from .session_store import DEFAULT_DATA_DIR
 
 logger = logging.getLogger(__name__)
 
 class AIService:
     """Service for interacting with Anthropic's Claude API."""
     
-    def __init__(self):
+    def __init__(self, budget: Optional[BudgetGovernor] = None):
         logger.debug("Initializing AIService")
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
@@ -25,64 +31,33 @@ class AIService:
             default_headers={"anthropic-version": "2023-06-01"}
         )
         
-        # Use specific model version for stability and predictability
-        self.model = "claude-3-opus-20240229"
+        # Curricula use the large model; chat requests are routed per request
+        self.router = ModelRouter()
+        self.model = self.router.large_model
         
         # Set optimal token limits
         self.max_tokens = 4000  # Default max tokens for responses
         self.max_context_tokens = 8000  # Maximum context window size
+
+        # Running estimate of output size, used to value cancelled requests
+        self.expected_output_tokens = self.max_tokens // 4
+        self.cancellation_stats = CancellationStats()
+
+        # Every request is estimated and booked against the spending limits
+        self.budget = budget or BudgetGovernor(os.path.join(
+            os.getenv("GPTLEARNER_DATA_DIR", DEFAULT_DATA_DIR), "budget", "ledger.json"))
         
         logger.debug(f"AIService initialized with model={self.model}, max_tokens={self.max_tokens}")
 
-    def generate_curriculum(self, topic: str, expertise_level: str) -> str:
+    def generate_curriculum(self, topic: str, expertise_level: str,
+                            cancel_token: Optional[CancelToken] = None,
+                            on_text: Optional[Callable[[str], None]] = None) -> str:
         """Generate a structured curriculum for the given topic."""
         logger.debug(f"Generating curriculum for topic='{topic}', expertise_level='{expertise_level}'")
         try:
-            # Create a focused system prompt
-            system_prompt = (
-                "You are an expert curriculum designer. Create a detailed, structured curriculum "
-                "that is precisely tailored to the specified expertise level. Be concise but thorough. "
-                "Focus on practical, actionable learning steps. Use proper markdown formatting with "
-                "# for main sections and - for subtopics."
-            )
-            
-            # Create a focused user message
-            message_content = (
-                f"Create a curriculum for learning {topic} at a {expertise_level} level.\n\n"
-                "Use this exact format:\n\n"
-                "# Learning Objectives\n"
-                "- Objective 1\n"
-                "- Objective 2\n"
-                "- Objective 3\n\n"
-                "# Prerequisites\n"
-                "- Prerequisite 1\n"
-                "- Prerequisite 2\n\n"
-                "# Main Topics\n"
-                "- Topic 1\n"
-                "  - Subtopic 1.1\n"
-                "  - Subtopic 1.2\n"
-                "- Topic 2\n"
-                "  - Subtopic 2.1\n"
-                "  - Subtopic 2.2\n\n"
-                "# Practical Exercises\n"
-                "- Exercise 1\n"
-                "- Exercise 2\n\n"
-                "# Key Resources\n"
-                "- Resource 1\n"
-                "- Resource 2\n\n"
-                "Make all content specifically appropriate for {expertise_level} level learners."
-            )
-
             logger.debug("Making API request to Anthropic")
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=self.max_tokens,
-                temperature=0.7,  # Balanced between creativity and consistency
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": message_content}
-                ]
-            )
+            message = self._create_message(cancel_token, on_text, kind="curriculum",
+                                           **self._curriculum_params(topic, expertise_level))
             
             logger.debug(f"Received response with ID: {message.id}")
             logger.debug(f"Input tokens: {message.usage.input_tokens}, Output tokens: {message.usage.output_tokens}")
@@ -92,6 +67,8 @@ class AIService:
             logger.debug(f"Response preview: {response_text[:200]}...")
             return response_text
 
+        except (RequestCancelled, BudgetExceeded):
+            raise
         except anthropic.APIError as e:
             logger.error(f"Anthropic API Error: {str(e)}", exc_info=True)
             raise ValueError(f"API Error: {str(e)}")
@@ -102,8 +79,164 @@ class AIService:
             logger.error(f"Unexpected error: {str(e)}", exc_info=True)
             raise ValueError(f"Unexpected error: {str(e)}")
 
-    def chat(self, messages: List[Dict[str, str]], curriculum: str) -> str:
-        """Handle chat interactions with curriculum context."""
+    def outline_curriculum(self, topic: str, expertise_level: str,
+                           cancel_token: Optional[CancelToken] = None) -> str:
+        """Generate a curriculum with its main topics listed but not yet broken into subtopics."""
+        logger.debug(f"Outlining curriculum for topic='{topic}', expertise_level='{expertise_level}'")
+        try:
+            message = self._create_message(cancel_token, kind="curriculum",
+                                           **self._curriculum_params(topic, expertise_level, outline=True))
+            logger.debug(f"Outline output tokens: {message.usage.output_tokens}")
+            return message.content[0].text
+        except (RequestCancelled, BudgetExceeded):
+            raise
+        except anthropic.APIError as e:
+            logger.error(f"Anthropic API Error outlining curriculum: {str(e)}", exc_info=True)
+            raise ValueError(f"API Error: {str(e)}")
+
+    def expand_topic(self, topic: str, expertise_level: str, outline: str, main_topic: str,
+                     cancel_token: Optional[CancelToken] = None) -> str:
+        """Generate the subtopics of one main topic of an outline, as a markdown list."""
+        logger.debug(f"Expanding '{main_topic}' of the {topic} curriculum")
+        system_prompt = (
+            "You are an expert curriculum designer filling in one topic of a curriculum outline. "
+            "Reply with only its subtopics as a markdown list, one '- ' line each, nested by two "
+            "spaces where useful. No heading, no repeat of the topic itself and no prose."
+        )
+        message_content = (
+            f"Curriculum outline for learning {topic} at a {expertise_level} level:\n\n{outline}\n\n"
+            f"Write 2-5 subtopics for the main topic \"{main_topic}\", appropriate for "
+            f"{expertise_level} level learners and not overlapping the other main topics."
+        )
+        try:
+            message = self._create_message(
+                cancel_token,
+                kind="curriculum",
+                model=self.router.choose("curriculum", []),
+                max_tokens=self.max_tokens // 8,
+                temperature=0.7,
+                system=system_prompt,
+                messages=[{"role": "user", "content": message_content}]
+            )
+            return message.content[0].text
+        except (RequestCancelled, BudgetExceeded):
+            raise
+        except anthropic.APIError as e:
+            logger.error(f"Anthropic API Error expanding topic: {str(e)}", exc_info=True)
+            raise ValueError(f"API Error: {str(e)}")
+
+    def _curriculum_params(self, topic: str, expertise_level: str, outline: bool = False) -> Dict:
+        """Build the Messages API parameters for a curriculum request.
+
+        With outline, the main topics are listed without subtopics (see
+        expand_topic) and the output cap is a quarter of a full curriculum's.
+        """
+        # Create a focused system prompt
+        system_prompt = (
+            "You are an expert curriculum designer. Create a detailed, structured curriculum "
+            "that is precisely tailored to the specified expertise level. Be concise but thorough. "
+            "Focus on practical, actionable learning steps. Use proper markdown formatting with "
+            "# for main sections and - for subtopics."
+        )
+        
+        # Create a focused user message
+        message_content = (
+            f"Create a curriculum for learning {topic} at a {expertise_level} level.\n\n"
+            "Use this exact format:\n\n"
+            "# Learning Objectives\n"
+            "- Objective 1\n"
+            "- Objective 2\n"
+            "- Objective 3\n\n"
+            "# Prerequisites\n"
+            "- Prerequisite 1\n"
+            "- Prerequisite 2\n\n"
+            "# Main Topics\n"
+            + ("- Topic 1\n"
+               "- Topic 2\n"
+               "- Topic 3\n\n"
+               if outline else
+               "- Topic 1\n"
+               "  - Subtopic 1.1\n"
+               "  - Subtopic 1.2\n"
+               "- Topic 2\n"
+               "  - Subtopic 2.1\n"
+               "  - Subtopic 2.2\n\n") +
+            "# Practical Exercises\n"
+            "- Exercise 1\n"
+            "- Exercise 2\n\n"
+            "# Key Resources\n"
+            "- [Resource 1](https://example.com/resource-1)\n"
+            "- [Resource 2](https://example.com/resource-2)\n\n"
+            f"Make all content specifically appropriate for {expertise_level} level learners."
+            + (" List each main topic on one line only; its subtopics are written separately."
+               if outline else "")
+        )
+
+        return dict(
+            model=self.router.choose("curriculum", []),
+            max_tokens=self.max_tokens // 4 if outline else self.max_tokens,
+            temperature=0.7,  # Balanced between creativity and consistency
+            system=system_prompt,
+            messages=[
+                {"role": "user", "content": message_content}
+            ]
+        )
+
+    def revise_curriculum(self, topic: str, expertise_level: str, outline: str, instruction: str,
+                          cancel_token: Optional[CancelToken] = None) -> List[Dict]:
+        """Ask for an edit script that revises a curriculum instead of a new curriculum.
+
+        outline is Curriculum.outline(): one '[id] text' line per node. Returns
+        edits for Curriculum.apply_edits.
+        """
+        logger.debug(f"Revising curriculum for topic='{topic}': {instruction}")
+        system_prompt = (
+            "You are an expert curriculum designer revising an existing curriculum. Do not rewrite "
+            "it: reply with a JSON array of edits only, no prose, and leave everything that still "
+            "fits untouched. Edits are {\"op\": \"rewrite\", \"id\", \"title\"} to change a line, "
+            "{\"op\": \"remove\", \"id\"} to delete a line and everything under it, and "
+            "{\"op\": \"add\", \"parent\", \"after\", \"title\", \"children\"} to insert a line under "
+            "parent (null for a new # section) after the sibling with id after (null for last); "
+            "children is an optional list of {\"title\", \"children\"}. Use the ids exactly as given."
+        )
+        message_content = (
+            f"Curriculum for learning {topic} at a {expertise_level} level, one line per item as "
+            f"[id] text, indented by depth:\n\n{outline}\n\nRevise it: {instruction}"
+        )
+        try:
+            message = self._create_message(
+                cancel_token,
+                kind="curriculum",
+                model=self.router.choose("curriculum", []),
+                max_tokens=self.max_tokens // 2,
+                temperature=0.3,
+                system=system_prompt,
+                messages=[{"role": "user", "content": message_content}]
+            )
+            text = message.content[0].text
+            logger.debug(f"Revision output tokens: {message.usage.output_tokens}")
+            edits = json.loads(text[text.index("["):text.rindex("]") + 1])
+        except (RequestCancelled, BudgetExceeded):
+            raise
+        except anthropic.APIError as e:
+            logger.error(f"Anthropic API Error revising curriculum: {str(e)}", exc_info=True)
+            raise ValueError(f"API Error: {str(e)}")
+        except ValueError as e:
+            logger.error(f"Could not parse curriculum edits: {str(e)}")
+            raise ValueError("The curriculum edits were not valid JSON")
+        if not isinstance(edits, list):
+            raise ValueError("The curriculum edits were not a list")
+        return edits
+
+    def chat(self, messages: List[Dict[str, str]], curriculum: str,
+             cancel_token: Optional[CancelToken] = None,
+             on_text: Optional[Callable[[str], None]] = None,
+             model: Optional[str] = None) -> str:
+        """Handle chat interactions with curriculum context.
+
+        The model is picked by the router unless one is given ("small",
+        "large" or a model name).
+        """
         logger.debug(f"Starting chat interaction with {len(messages)} messages")
         logger.debug(f"Curriculum length: {len(curriculum)} chars")
         
@@ -120,16 +253,23 @@ class AIService:
             curriculum_summary = curriculum[:2000] + "..." if len(curriculum) > 2000 else curriculum
             system_context = f"{system_prompt}\n\nCurrent curriculum:\n{curriculum_summary}"
 
-            # Filter and optimize message history
-            optimized_messages = self._optimize_message_history(messages)
+            # Filter and optimize message history; shorter as the budget runs low
+            optimized_messages = self._optimize_message_history(messages, *self.budget.history_limits())
 
-            response = self.client.messages.create(
-                model=self.model,
+            params = dict(
                 max_tokens=self.max_tokens,
                 temperature=0.7,
                 system=system_context,
                 messages=optimized_messages
             )
+            chosen = self.router.choose("chat", optimized_messages, system_context, model)
+            response = self._create_message(cancel_token, on_text, model=chosen, **params)
+
+            # Streamed text cannot be taken back, so only unstreamed answers escalate;
+            # a budget that forced the small model is not overridden here
+            if (model is None and on_text is None and getattr(response, "model", chosen) == chosen and
+                    self.router.needs_escalation(chosen, response.content[0].text)):
+                response = self._create_message(cancel_token, model=self.router.large_model, **params)
             
             logger.debug(f"Received chat response with ID: {response.id}")
             logger.debug(f"Input tokens: {response.usage.input_tokens}, Output tokens: {response.usage.output_tokens}")
@@ -139,6 +279,8 @@ class AIService:
             logger.debug(f"Chat response preview: {response_text[:200]}...")
             return response_text
             
+        except (RequestCancelled, BudgetExceeded):
+            raise
         except anthropic.APIError as e:
             logger.error(f"Anthropic API Error in chat: {str(e)}", exc_info=True)
             raise ValueError(f"API Error: {str(e)}")
@@ -149,19 +291,214 @@ class AIService:
             logger.error(f"Unexpected error in chat: {str(e)}", exc_info=True)
             raise ValueError(f"Unexpected error: {str(e)}")
 
-    def _optimize_message_history(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    def generate_questions(self, topic: str, expertise_level: str, curriculum: str,
+                           sections: List[str], per_section: int,
+                           cancel_token: Optional[CancelToken] = None) -> List[Dict]:
+        """Generate practice questions for several curriculum sections in one request.
+
+        Returns question dicts with section, type ("multiple_choice",
+        "short_answer" or "open_ended"), question, answer, and for multiple
+        choice questions the choices.
+        """
+        logger.debug(f"Generating {per_section} questions for each of {len(sections)} sections")
+        system_prompt = (
+            "You are an expert teacher writing practice questions. Reply with a JSON array only, "
+            "no prose. Each element is an object with keys: section, type, question, answer, "
+            "explanation, and for multiple_choice also choices (4 strings, answer is one of them). "
+            "type is one of multiple_choice, short_answer or open_ended. short_answer answers are "
+            "a word, number or short phrase; you may add accepted (a list of other correct forms)."
+        )
+        section_list = "\n".join(f"- {section}" for section in sections)
+        message_content = (
+            f"Curriculum for learning {topic} at a {expertise_level} level:\n\n{curriculum[:6000]}\n\n"
+            f"Write {per_section} questions for each of these sections, mostly multiple_choice and "
+            f"short_answer with at most one open_ended per section:\n{section_list}\n\n"
+            "Use each section title exactly as given in the section key."
+        )
+        try:
+            message = self._create_message(
+                cancel_token,
+                kind="quiz",
+                model=self.router.choose("quiz", []),
+                max_tokens=self.max_tokens,
+                temperature=0.7,
+                system=system_prompt,
+                messages=[{"role": "user", "content": message_content}]
+            )
+            text = message.content[0].text
+            questions = json.loads(text[text.index("["):text.rindex("]") + 1])
+        except BudgetExceeded:
+            raise
+        except anthropic.APIError as e:
+            logger.error(f"Anthropic API Error generating questions: {str(e)}", exc_info=True)
+            raise ValueError(f"API Error: {str(e)}")
+        except ValueError as e:
+            logger.error(f"Could not parse generated questions: {str(e)}")
+            raise ValueError("The generated questions were not valid JSON")
+        return [q for q in questions if isinstance(q, dict) and q.get("question") and q.get("answer")]
+
+    def grade_answer(self, question: str, reference: str, answer: str) -> Dict:
+        """Grade an open-ended answer; returns {"correct", "score", "feedback"}."""
+        system_prompt = (
+            "You grade a student's answer against a reference answer. Reply with a JSON object "
+            "only: {\"score\": number from 0 to 1, \"feedback\": one or two sentences}."
+        )
+        message_content = f"Question: {question}\n\nReference answer: {reference}\n\nStudent answer: {answer}"
+        try:
+            message = self._create_message(
+                None,
+                kind="grading",
+                model=self.router.choose("grading", []),
+                max_tokens=300,
+                temperature=0,
+                system=system_prompt,
+                messages=[{"role": "user", "content": message_content}]
+            )
+            text = message.content[0].text
+            result = json.loads(text[text.index("{"):text.rindex("}") + 1])
+            score = min(1.0, max(0.0, float(result["score"])))
+        except BudgetExceeded:
+            raise
+        except anthropic.APIError as e:
+            logger.error(f"Anthropic API Error grading answer: {str(e)}", exc_info=True)
+            raise ValueError(f"API Error: {str(e)}")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Could not parse grading result: {str(e)}")
+            raise ValueError("The grading result was not valid JSON")
+        return {"correct": score >= 0.5, "score": score, "feedback": str(result.get("feedback", ""))}
+
+    def submit_curriculum_batch(self, items: List[Dict[str, str]]) -> str:
+        """Submit curriculum requests through the Message Batches API.
+
+        Each item needs custom_id, topic and expertise_level. Batches are
+        billed at a discount but complete asynchronously; returns the batch ID.
+        """
+        requests = [
+            {"custom_id": item["custom_id"],
+             "params": self._curriculum_params(item["topic"], item["expertise_level"])}
+            for item in items
+        ]
+        try:
+            batch = self._batches().create(requests=requests)
+        except anthropic.APIError as e:
+            logger.error(f"Anthropic API Error submitting batch: {str(e)}", exc_info=True)
+            raise ValueError(f"API Error: {str(e)}")
+        logger.info(f"Submitted batch {batch.id} with {len(requests)} curriculum requests")
+        return batch.id
+
+    def curriculum_batch_results(self, batch_id: str) -> Optional[Dict[str, Dict[str, str]]]:
+        """Return {custom_id: {"curriculum" or "error": ...}} once a batch has ended, else None."""
+        try:
+            batches = self._batches()
+            batch = batches.retrieve(batch_id)
+            if batch.processing_status != "ended":
+                logger.debug(f"Batch {batch_id} is {batch.processing_status}")
+                return None
+            results = {}
+            for entry in batches.results(batch_id):
+                if entry.result.type == "succeeded":
+                    results[entry.custom_id] = {"curriculum": entry.result.message.content[0].text}
+                else:
+                    results[entry.custom_id] = {"error": entry.result.type}
+            return results
+        except anthropic.APIError as e:
+            logger.error(f"Anthropic API Error reading batch: {str(e)}", exc_info=True)
+            raise ValueError(f"API Error: {str(e)}")
+
+    def _batches(self):
+        """Return the Message Batches resource (GA or beta, depending on SDK version)."""
+        batches = getattr(self.client.messages, "batches", None)
+        if batches is None:
+            batches = getattr(getattr(self.client, "beta", None), "messages", None)
+            batches = getattr(batches, "batches", None)
+        if batches is None:
+            raise ValueError("Message Batches require a newer version of the anthropic package")
+        return batches
+
+    def _create_message(self, cancel_token: Optional[CancelToken],
+                        on_text: Optional[Callable[[str], None]] = None, kind: str = "chat", **params):
+        """Send a request within the budget and record its latency or failure with the router."""
+        params, reservation = self.budget.admit(params, self.router.small_model)
+        started = time.monotonic()
+        try:
+            message = self._send_message(cancel_token, on_text, **params)
+        except RequestCancelled as e:
+            self.budget.settle(reservation, output_tokens=getattr(e, "output_tokens", 0))
+            raise
+        except Exception:
+            self.budget.settle(reservation, 0, 0)
+            self.router.record(params["model"], None, ok=False, kind=kind)
+            raise
+        self.budget.settle(reservation, message.usage.input_tokens, message.usage.output_tokens)
+        self.router.record(params["model"], time.monotonic() - started, ok=True, kind=kind)
+        return message
+
+    def _send_message(self, cancel_token: Optional[CancelToken],
+                      on_text: Optional[Callable[[str], None]] = None, **params):
+        """Send a request, streaming it when it may need to be cancelled.
+
+        With a cancel token the response is streamed so that cancelling closes
+        the HTTP connection immediately and generation stops server-side.
+        With on_text each chunk of generated text is passed on as it arrives.
+        """
+        if cancel_token is None and on_text is None:
+            message = self.client.messages.create(**params)
+            self._record_output_tokens(message.usage.output_tokens)
+            return message
+
+        cancel_token = cancel_token or CancelToken()
+        cancel_token.raise_if_cancelled()
+        produced_chars = 0
+        with self.client.messages.stream(**params) as stream:
+            cancel_token.add_callback(stream.close)
+            try:
+                for text in stream.text_stream:
+                    produced_chars += len(text)
+                    if cancel_token.cancelled:
+                        break
+                    if on_text:
+                        on_text(text)
+                if not cancel_token.cancelled:
+                    message = stream.get_final_message()
+                    self._record_output_tokens(message.usage.output_tokens)
+                    return message
+            except Exception:
+                if not cancel_token.cancelled:
+                    raise
+            finally:
+                cancel_token.remove_callback(stream.close)
+
+        # Roughly four characters per token for the text we did receive
+        tokens_saved = self.expected_output_tokens - produced_chars // 4
+        self.cancellation_stats.record(tokens_saved)
+        error = RequestCancelled("Request was cancelled")
+        error.output_tokens = produced_chars // 4  # Billed even though the answer was dropped
+        raise error
+
+    def _record_output_tokens(self, output_tokens: int) -> None:
+        """Update the running estimate of response size."""
+        self.expected_output_tokens = int(0.8 * self.expected_output_tokens + 0.2 * output_tokens)
+
+    def _optimize_message_history(self, messages: List[Dict[str, str]], keep: int = 10,
+                                  max_chars: int = 1000) -> List[Dict[str, str]]:
         """Optimize message history to reduce token usage while maintaining context."""
-        # Keep only the last 10 messages to prevent context window overflow
-        recent_messages = messages[-10:]
+        # Keep only the last messages to prevent context window overflow
+        recent_messages = messages[-keep:]
         
         # Ensure messages follow the correct format
         optimized = []
         for msg in recent_messages:
             # Ensure content isn't too long
             content = msg["content"]
-            if len(content) > 1000:  # Arbitrary limit to prevent huge messages
-                content = content[:997] + "..."
+            if len(content) > max_chars:
+                content = content[:max_chars - 3] + "..."
             
+            # Merge consecutive turns from the same role, e.g. a question sent
+            # while a superseded request was still running
+            if optimized and optimized[-1]["role"] == msg["role"]:
+                optimized[-1]["content"] += "\n\n" + content
+                continue
+
             optimized.append({
                 "role": msg["role"],
                 "content": content
@@ -0,0 +1,279 @@
+import os
+import re
+import json
+import zlib
+import hashlib
+import logging
+import threading
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIM = 1 << 10  # A question has a few dozen features at most
+DEFAULT_SERVE_THRESHOLD = 0.9  # Serve the cached answer directly
+DEFAULT_OFFER_THRESHOLD = 0.75  # Offer the cached answer to the learner
+MIN_CONTENT_TOKENS = 1  # Questions with no content words are never cached
+MIN_SERVE_TOKENS = 2  # Questions with fewer content words are only ever offered
+MAX_ENTRIES = 500  # Per curriculum; the least recently used answer makes room
+INITIAL_CAPACITY = 16
+CACHE_FORMAT = 2
+
+# Words that point back into the conversation: a question using them is not
+# self-contained, so its answer is only ever offered
+REFERENTIAL = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "another",
+    "above", "previous", "same", "again", "else", "instead", "there",
+}
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "to", "of", "and", "or",
+    "in", "on", "for", "with", "what", "how", "why", "when", "which", "who",
+    "do", "does", "did", "can", "could", "would", "should", "i", "you", "me",
+    "my", "it", "this", "that", "please", "explain", "again", "tell", "about",
+    "mean", "means", "give", "example", "examples", "more", "some",
+    "work", "works", "use", "used", "using",
+}
+
+
+def context_key(context: str) -> str:
+    """Key for the conversation a question was asked in: its preceding turn, or "" for a first question."""
+    if not context:
+        return ""
+    return hashlib.blake2b(context.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def content_tokens(text: str, ignore: FrozenSet[str] = frozenset()) -> List[str]:
+    tokens = re.findall(r"\w+", text.lower())
+    # Light stemming so "closures" and "closure" hash alike
+    words = [token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+             for token in tokens if token not in STOPWORDS]
+    return [word for word in words if word not in ignore]
+
+
+class HashingVectorizer:
+    """Maps text to L2-normalized, signed feature-hashed vectors.
+
+    Features are content-word unigrams and bigrams with sublinear term
+    frequency, so the vectors are purely lexical and need no model download.
+    Words in `ignore` (e.g. the curriculum topic, which every question about
+    it shares) are left out.
+    """
+
+    def __init__(self, dim: int = VECTOR_DIM):
+        self.dim = dim
+
+    def transform(self, texts: List[str], ignore: FrozenSet[str] = frozenset()) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = content_tokens(text, ignore)
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dim] += sign
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))  # Sublinear tf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class AnswerCache:
+    """Per-curriculum cache of tutor answers keyed by question similarity.
+
+    An answer depends on the conversation before the question, so each
+    entry also records the turn it followed (see context_key) and lookups
+    only match questions asked after the same turn. First questions share
+    the empty context across sessions; follow-ups only match a repeat of
+    the same exchange.
+
+    Lookups return the closest cached question for the curriculum with its
+    cosine similarity and an action: "serve" above the serve threshold or
+    "offer" above the offer threshold. Short questions and ones that refer
+    back to the conversation ("another example", "why does that fail")
+    are at most offered. Each curriculum keeps its MAX_ENTRIES most
+    recently used answers. Entries are persisted as JSON per curriculum;
+    vectors are rebuilt lazily when a curriculum is first used.
+    """
+
+    def __init__(self, directory: str, serve_threshold: Optional[float] = None,
+                 offer_threshold: Optional[float] = None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        if serve_threshold is None:
+            serve_threshold = float(os.getenv("GPTLEARNER_CACHE_SERVE", DEFAULT_SERVE_THRESHOLD))
+        if offer_threshold is None:
+            offer_threshold = float(os.getenv("GPTLEARNER_CACHE_OFFER", DEFAULT_OFFER_THRESHOLD))
+        self.serve_threshold = serve_threshold
+        self.offer_threshold = offer_threshold
+        self.vectorizer = HashingVectorizer()
+        self._lock = threading.Lock()
+        self._curricula: Dict[str, Dict] = {}
+        self.lookups = 0
+        self.served = 0
+        self.offered = 0
+        self.accepted = 0
+
+    def lookup(self, curriculum_id: str, topic: str, question: str, context: str = "") -> Optional[Dict]:
+        """Return {'question', 'answer', 'score', 'action'} for a close match, else None.
+
+        context is the conversation turn the question follows, "" for a first question.
+        """
+        with self._lock:
+            entries = self._entries(curriculum_id, topic)
+            if len(content_tokens(question, entries["ignore"])) < MIN_CONTENT_TOKENS:
+                return None
+            self.lookups += 1
+            key = context_key(context)
+            rows = [row for row, entry_key in enumerate(entries["contexts"]) if entry_key == key]
+            if not rows:
+                return None
+            query = self.vectorizer.transform([question], entries["ignore"])[0]
+            scores = entries["matrix"][rows] @ query  # Rows are unit length: dot product is cosine
+            best = rows[int(np.argmax(scores))]
+            score = float(scores.max())
+            if score < self.offer_threshold:
+                return None
+            action = "serve" if score >= self.serve_threshold and self._self_contained(question, entries) else "offer"
+            if action == "serve":
+                self.served += 1
+            else:
+                self.offered += 1
+            self._touch(entries, best)
+        logger.info(f"Answer cache {action} (score={score:.2f}); {self.metrics()}")
+        return {
+            "question": entries["questions"][best],
+            "answer": entries["answers"][best],
+            "score": score,
+            "action": action,
+        }
+
+    def record_accepted(self) -> None:
+        """Count an offered answer that the learner accepted."""
+        with self._lock:
+            self.accepted += 1
+
+    def add(self, curriculum_id: str, topic: str, question: str, answer: str, context: str = "") -> None:
+        """Cache an answer for a curriculum, replacing the same question asked after the same turn."""
+        with self._lock:
+            entries = self._entries(curriculum_id, topic)
+            if len(content_tokens(question, entries["ignore"])) < MIN_CONTENT_TOKENS:
+                return
+            self._put(entries, question, answer, context_key(context))
+            self._save(curriculum_id, entries)
+
+    def seed(self, curriculum_id: str, topic: str, pairs: List[Dict]) -> int:
+        """Cache precomputed first-question {"question", "answer"} pairs, keeping answers already cached.
+
+        Returns the number of questions added.
+        """
+        with self._lock:
+            entries = self._entries(curriculum_id, topic)
+            cached = {(question, key) for question, key in zip(entries["questions"], entries["contexts"])}
+            new = [pair for pair in pairs if (pair["question"], "") not in cached
+                   and len(content_tokens(pair["question"], entries["ignore"])) >= MIN_CONTENT_TOKENS]
+            new = list({pair["question"]: pair for pair in new}.values())
+            if not new:
+                return 0
+            for pair in new:
+                self._put(entries, pair["question"], pair["answer"], "")
+            self._save(curriculum_id, entries)
+        return len(new)
+
+    def invalidate(self, curriculum_id: str) -> None:
+        """Drop all cached answers for a curriculum, e.g. after it changes."""
+        with self._lock:
+            self._curricula.pop(curriculum_id, None)
+            path = self._path(curriculum_id)
+            if os.path.exists(path):
+                os.remove(path)
+        logger.debug(f"Answer cache invalidated for {curriculum_id}")
+
+    def metrics(self) -> Dict[str, float]:
+        hits = self.served + self.accepted
+        return {
+            "lookups": self.lookups,
+            "served": self.served,
+            "offered": self.offered,
+            "accepted": self.accepted,
+            "hit_rate": hits / self.lookups if self.lookups else 0.0,
+        }
+
+    def _self_contained(self, question: str, entries: Dict) -> bool:
+        """Whether a question is specific enough to serve an answer to without asking."""
+        if REFERENTIAL.intersection(re.findall(r"\w+", question.lower())):
+            return False
+        return len(content_tokens(question, entries["ignore"])) >= MIN_SERVE_TOKENS
+
+    def _put(self, entries: Dict, question: str, answer: str, key: str) -> None:
+        """Store one answer, evicting the least recently used one when the curriculum is full."""
+        for row, (cached, entry_key) in enumerate(zip(entries["questions"], entries["contexts"])):
+            if cached == question and entry_key == key:
+                entries["answers"][row] = answer
+                self._touch(entries, row)
+                return
+        vector = self.vectorizer.transform([question], entries["ignore"])[0]
+        if len(entries["questions"]) >= MAX_ENTRIES:
+            row = min(range(len(entries["used"])), key=entries["used"].__getitem__)
+            entries["questions"][row], entries["answers"][row], entries["contexts"][row] = question, answer, key
+        else:
+            row = len(entries["questions"])
+            if row == len(entries["matrix"]):
+                # Grow by doubling, so inserts do not copy the matrix each time
+                grown = np.zeros((max(INITIAL_CAPACITY, 2 * row), self.vectorizer.dim), dtype=np.float32)
+                grown[:row] = entries["matrix"]
+                entries["matrix"] = grown
+            entries["questions"].append(question)
+            entries["answers"].append(answer)
+            entries["contexts"].append(key)
+            entries["used"].append(0)
+        entries["matrix"][row] = vector
+        self._touch(entries, row)
+
+    def _touch(self, entries: Dict, row: int) -> None:
+        entries["clock"] += 1
+        entries["used"][row] = entries["clock"]
+
+    def _entries(self, curriculum_id: str, topic: str) -> Dict:
+        entries = self._curricula.get(curriculum_id)
+        if entries is None:
+            ignore = frozenset(content_tokens(topic))
+            questions, answers, contexts = [], [], []
+            path = self._path(curriculum_id)
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    if data.get("format") == CACHE_FORMAT:
+                        # Saved least recently used first
+                        questions, answers, contexts = data["questions"], data["answers"], data["contexts"]
+                        questions, answers, contexts = (questions[-MAX_ENTRIES:], answers[-MAX_ENTRIES:],
+                                                        contexts[-MAX_ENTRIES:])
+                    else:
+                        # Answers cached without their context cannot be matched safely
+                        logger.info(f"Discarding answer cache {path} from an older format")
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error(f"Ignoring unreadable answer cache {path}: {str(e)}")
+            matrix = np.zeros((max(INITIAL_CAPACITY, len(questions)), self.vectorizer.dim), dtype=np.float32)
+            if questions:
+                matrix[:len(questions)] = self.vectorizer.transform(questions, ignore)
+            entries = {"questions": questions, "answers": answers, "contexts": contexts,
+                       "used": list(range(1, len(questions) + 1)), "clock": len(questions),
+                       "matrix": matrix, "ignore": ignore}
+            self._curricula[curriculum_id] = entries
+        return entries
+
+    def _save(self, curriculum_id: str, entries: Dict) -> None:
+        order = sorted(range(len(entries["questions"])), key=entries["used"].__getitem__)
+        tmp_path = self._path(curriculum_id) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": CACHE_FORMAT,
+                       "questions": [entries["questions"][row] for row in order],
+                       "answers": [entries["answers"][row] for row in order],
+                       "contexts": [entries["contexts"][row] for row in order]}, f,
+                      ensure_ascii=False)
+        os.replace(tmp_path, self._path(curriculum_id))
+
+    def _path(self, curriculum_id: str) -> str:
+        return os.path.join(self.directory, f"{curriculum_id}.json")
@@ -0,0 +1,213 @@
+import os
+import json
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# USD per million (input, output) tokens; unknown models are priced as the largest
+PRICES = {
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "claude-3-5-haiku-20241022": (0.8, 4.0),
+    "claude-3-sonnet-20240229": (3.0, 15.0),
+    "claude-3-5-sonnet-20241022": (3.0, 15.0),
+    "claude-3-opus-20240229": (15.0, 75.0),
+}
+DEFAULT_LIMITS = {"day": 5.0, "session": 1.0, "curriculum": 2.0}  # USD per day; 0 disables a limit
+CHARS_PER_TOKEN = 4
+KEEP_DAYS = 90  # Ledger entries untouched for longer are dropped
+
+# Degradation steps by the share of the tightest budget already spent or
+# reserved: (share, output token cap, history messages kept, characters per
+# history message, use the small model)
+DEGRADE_STEPS = (
+    (0.5, 2000, 10, 1000, False),
+    (0.7, 1000, 4, 500, False),
+    (0.85, 600, 2, 300, True),
+)
+FULL_HISTORY = (10, 1000)
+
+_scope: contextvars.ContextVar = contextvars.ContextVar("budget_scope", default={})
+
+
+class BudgetExceeded(ValueError):
+    """Raised before sending a request that would go over a spending limit."""
+
+
+@contextmanager
+def budget_scope(session: Optional[str] = None, curriculum: Optional[str] = None):
+    """Charge requests made inside the block to a session and curriculum.
+
+    The scope is a context variable, so pool threads must enter it
+    themselves (or run in a copied context).
+    """
+    token = _scope.set({key: value for key, value in (("session", session), ("curriculum", curriculum))
+                        if value})
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def estimate_tokens(params: Dict) -> int:
+    """Rough input token count of a Messages API request."""
+    chars = len(str(params.get("system", "")))
+    for message in params.get("messages", []):
+        content = message["content"]
+        chars += len(content) if isinstance(content, str) else len(json.dumps(content))
+    return chars // CHARS_PER_TOKEN + 1
+
+
+def request_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    price_in, price_out = PRICES.get(model, max(PRICES.values()))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+class BudgetGovernor:
+    """Persistent token and cost ledger that keeps spending within limits.
+
+    Spend is tracked per day, and per session and per curriculum within
+    each day (see budget_scope). Every limit is a daily window: a session
+    resumed tomorrow, or a topic studied again, starts with its full
+    budget. Every request is estimated and reserved before it is
+    sent, counting its full output cap, so concurrent requests cannot
+    together overshoot a limit. As the tightest applicable budget fills,
+    requests are degraded step by step (DEGRADE_STEPS): a lower output
+    cap, a shorter chat history, then the small model. A request that
+    would still not fit raises BudgetExceeded.
+
+    Limits come from GPTLEARNER_BUDGET_DAY, GPTLEARNER_BUDGET_SESSION and
+    GPTLEARNER_BUDGET_CURRICULUM in USD per day.
+    """
+
+    def __init__(self, path: str, limits: Optional[Dict[str, float]] = None):
+        self.path = path
+        if limits is None:
+            limits = {scope: float(os.getenv(f"GPTLEARNER_BUDGET_{scope.upper()}", default))
+                      for scope, default in DEFAULT_LIMITS.items()}
+        self.limits = {scope: limit for scope, limit in limits.items() if limit > 0}
+        self._lock = threading.Lock()
+        self._ledger: Dict[str, Dict[str, Dict]] = {"day": {}, "session": {}, "curriculum": {}}
+        self._reserved: Dict[Tuple[str, str], float] = {}  # (scope, key) -> cost of requests in flight
+        self._load()
+
+    def history_limits(self) -> Tuple[int, int]:
+        """(messages, characters per message) of chat history to send at the current level."""
+        step = self._step(self._keys())
+        return (step[2], step[3]) if step else FULL_HISTORY
+
+    def admit(self, params: Dict, small_model: Optional[str] = None) -> Tuple[Dict, Dict]:
+        """Degrade a request to fit the budget and reserve its worst-case cost.
+
+        Starts at the step for the budget already used and degrades further
+        while the request would not fit. Returns the request parameters to
+        send and a reservation for settle(). Raises BudgetExceeded if even
+        the most degraded request would go over a limit.
+        """
+        keys = self._keys()
+        input_tokens = estimate_tokens(params)
+        with self._lock:
+            steps = (None,) + DEGRADE_STEPS
+            step = self._step(keys)
+            for step in steps[steps.index(step):]:
+                planned = dict(params)
+                if step:
+                    planned["max_tokens"] = min(params["max_tokens"], step[1])
+                    if step[4] and small_model:
+                        planned["model"] = small_model
+                cost = request_cost(planned["model"], input_tokens, planned["max_tokens"])
+                over = [(scope, key) for scope, key in keys
+                        if scope in self.limits and self._used(scope, key) + cost > self.limits[scope]]
+                if not over:
+                    break
+            if over:
+                scope, key = over[0]
+                raise BudgetExceeded(
+                    f"The {self._describe(scope)} budget of ${self.limits[scope]:.2f} is used up "
+                    f"(${self._entry(scope, key)['cost']:.2f} spent). "
+                    f"Raise GPTLEARNER_BUDGET_{scope.upper()} to continue."
+                )
+            for scope_key in keys:
+                self._reserved[scope_key] = self._reserved.get(scope_key, 0.0) + cost
+        if step:
+            logger.info(f"Budget nearly used: capped output at {planned['max_tokens']} tokens"
+                        + (f" on {planned['model']}" if step[4] and small_model else ""))
+        return planned, {"keys": keys, "cost": cost, "model": planned["model"], "input_tokens": input_tokens}
+
+    def settle(self, reservation: Dict, input_tokens: Optional[int] = None, output_tokens: int = 0) -> float:
+        """Release a reservation and book the actual usage; returns its cost."""
+        input_tokens = reservation["input_tokens"] if input_tokens is None else input_tokens
+        cost = request_cost(reservation["model"], input_tokens, output_tokens)
+        with self._lock:
+            today = date.today().isoformat()
+            for scope, key in reservation["keys"]:
+                self._reserved[(scope, key)] -= reservation["cost"]
+                if self._reserved[(scope, key)] <= 1e-12:
+                    del self._reserved[(scope, key)]
+                entry = self._entry(scope, key)
+                entry["input_tokens"] += input_tokens
+                entry["output_tokens"] += output_tokens
+                entry["requests"] += 1
+                entry["cost"] = round(entry["cost"] + cost, 6)
+                entry["updated"] = today
+                self._ledger[scope][key] = entry
+            self._save()
+        logger.debug(f"Booked {input_tokens}+{output_tokens} tokens on {reservation['model']} (${cost:.4f})")
+        return cost
+
+    def spent(self, scope: str, key: Optional[str] = None) -> Dict:
+        """Ledger entry for a scope: a day (default today), or a session or curriculum ID today."""
+        today = date.today().isoformat()
+        key = (key or today) if scope == "day" else f"{today}:{key}"
+        with self._lock:
+            return dict(self._entry(scope, key))
+
+    def _keys(self) -> List[Tuple[str, str]]:
+        scope, today = _scope.get(), date.today().isoformat()
+        return [("day", today)] + [(name, f"{today}:{scope[name]}") for name in ("session", "curriculum")
+                                   if name in scope]
+
+    def _step(self, keys: List[Tuple[str, str]]) -> Optional[tuple]:
+        share = max([self._used(scope, key) / self.limits[scope] for scope, key in keys if scope in self.limits],
+                    default=0.0)
+        current = None
+        for step in DEGRADE_STEPS:
+            if share >= step[0]:
+                current = step
+        return current
+
+    def _used(self, scope: str, key: str) -> float:
+        return self._entry(scope, key)["cost"] + self._reserved.get((scope, key), 0.0)
+
+    def _entry(self, scope: str, key: str) -> Dict:
+        return self._ledger[scope].get(key) or {
+            "input_tokens": 0, "output_tokens": 0, "requests": 0, "cost": 0.0, "updated": ""}
+
+    @staticmethod
+    def _describe(scope: str) -> str:
+        return {"day": "daily", "session": "daily session", "curriculum": "daily curriculum"}[scope]
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load budget ledger: {str(e)}")
+            return
+        cutoff = (date.today() - timedelta(days=KEEP_DAYS)).isoformat()
+        for scope in self._ledger:
+            self._ledger[scope] = {key: entry for key, entry in data.get(scope, {}).items()
+                                   if entry.get("updated", "") >= cutoff}
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._ledger, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,75 @@
+import logging
+import threading
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCancelled(Exception):
+    """Raised inside a request whose cancel token has been triggered."""
+
+
+class CancelToken:
+    """Thread-safe flag used to cooperatively cancel an in-flight request.
+
+    Callbacks registered with the token run as soon as it is cancelled, which
+    lets the API layer close the underlying HTTP stream from another thread
+    instead of waiting for the next chunk to arrive.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """Cancel the token and run any registered abort callbacks."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Cancel callback raised: {str(e)}")
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """Register a callback, running it immediately if already cancelled."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise RequestCancelled("Request was cancelled")
+
+
+class CancellationStats:
+    """Counters for cancelled requests and the output tokens they avoided."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled_requests = 0
+        self.tokens_saved = 0
+
+    def record(self, tokens_saved: int) -> None:
+        with self._lock:
+            self.cancelled_requests += 1
+            self.tokens_saved += max(0, tokens_saved)
+            logger.info(
+                f"Request cancelled: {self.cancelled_requests} cancelled so far, "
+                f"~{self.tokens_saved} output tokens saved"
+            )
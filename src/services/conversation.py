@@ -0,0 +1,141 @@
+import hashlib
+import threading
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+CHAT_ROLES = ("user", "assistant")  # Roles sent to the model; others are display-only
+
+
+class MessageNode:
+    """One immutable message in a conversation tree.
+
+    A node points at its parent, so every branch shares the nodes of its
+    common prefix. The node ID hashes the parent ID, role and content, which
+    makes identical messages at the same point the same node.
+    """
+
+    __slots__ = ("id", "parent", "role", "content", "timestamp", "depth", "message")
+
+    def __init__(self, node_id: str, parent: Optional["MessageNode"], role: str, content: str,
+                 timestamp: Optional[str]):
+        self.id = node_id
+        self.parent = parent
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+        self.depth = parent.depth + 1 if parent else 0
+        # Read-only view handed out in snapshots, shared by every snapshot
+        self.message = MappingProxyType({"role": role, "content": content})
+
+    def __setattr__(self, name, value):
+        if hasattr(self, "message"):
+            raise AttributeError("MessageNode is immutable")
+        object.__setattr__(self, name, value)
+
+
+def node_id(parent_id: Optional[str], role: str, content: str) -> str:
+    digest = hashlib.blake2b(digest_size=10)
+    for part in (parent_id or "", role, content):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ConversationTree:
+    """Persistent tree of chat messages with a movable head.
+
+    Appending never changes existing nodes, so a snapshot (a tuple of
+    read-only messages from the root to a node) stays valid while the UI
+    keeps adding messages or switches branches. Editing or regenerating a
+    message is just appending a sibling under the same parent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, MessageNode] = {}
+        self._children: Dict[Optional[str], List[str]] = {}
+        self.head: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._nodes
+
+    def node(self, node_id: str) -> MessageNode:
+        return self._nodes[node_id]
+
+    def append(self, role: str, content: str, timestamp: Optional[str] = None,
+               parent: Optional[str] = "head") -> str:
+        """Add a message under parent (the head by default), move the head to it and return its ID."""
+        with self._lock:
+            parent_id = self.head if parent == "head" else parent
+            nid = node_id(parent_id, role, content)
+            if nid not in self._nodes:
+                self._nodes[nid] = MessageNode(nid, self._nodes.get(parent_id), role, content, timestamp)
+                self._children.setdefault(parent_id, []).append(nid)
+            self.head = nid
+            return nid
+
+    def path(self, node_id: Optional[str] = None) -> Tuple[MessageNode, ...]:
+        """Nodes from the root to node_id (the head by default)."""
+        node = self._nodes.get(self.head if node_id is None else node_id)
+        nodes = []
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        return tuple(reversed(nodes))
+
+    def snapshot(self, node_id: Optional[str] = None) -> Tuple[Mapping[str, str], ...]:
+        """Immutable chat history up to a node, for handing to worker threads."""
+        return tuple(node.message for node in self.path(node_id) if node.role in CHAT_ROLES)
+
+    def children(self, node_id: Optional[str]) -> List[str]:
+        return list(self._children.get(node_id, []))
+
+    def siblings(self, node_id: str) -> List[str]:
+        """All alternatives for a message, including itself, in creation order."""
+        parent = self._nodes[node_id].parent
+        return self.children(parent.id if parent else None)
+
+    def leaf(self, node_id: str) -> str:
+        """The newest descendant of a node, following the latest child at each step."""
+        while self._children.get(node_id):
+            node_id = self._children[node_id][-1]
+        return node_id
+
+    def checkout(self, node_id: Optional[str]) -> None:
+        """Move the head, e.g. to a message to branch from or to another branch's leaf."""
+        if node_id is not None and node_id not in self._nodes:
+            raise ValueError(f"Unknown message {node_id}")
+        self.head = node_id
+
+    def content_chars(self) -> int:
+        """Characters of unique message content held by the tree."""
+        return sum(len(node.content) for node in self._nodes.values())
+
+    def to_dict(self) -> Dict:
+        """Serialize every node once, parents before children."""
+        return {
+            "head": self.head,
+            "nodes": [
+                [node.id, node.parent.id if node.parent else None, node.role, node.content, node.timestamp]
+                for node in self._nodes.values()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ConversationTree":
+        tree = cls()
+        for _, parent, role, content, timestamp in data.get("nodes", []):
+            tree.append(role, content, timestamp, parent=parent)
+        tree.head = data.get("head") if data.get("head") in tree._nodes else tree.head
+        return tree
+
+    @classmethod
+    def from_messages(cls, messages: Iterable[Dict]) -> "ConversationTree":
+        """Build a single-branch tree from saved display messages."""
+        tree = cls()
+        for msg in messages:
+            tree.append(msg["type"], msg["content"], msg.get("timestamp"))
+        return tree
@@ -0,0 +1,699 @@
+import os
+import re
+import hashlib
+import functools
+import difflib
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .budget import BudgetExceeded
+from .cancellation import CancelToken, RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+LIST_ITEM = re.compile(r"^([-*+]|\d+[.)])\s+(.*)$")
+EDIT_OPS = ("add", "remove", "rewrite")
+_UNLINKED = object()  # Parent of a node that was not in the tree before an edit
+DEFAULT_EXPAND_PARALLEL = 6  # Main topics expanded at once; 0 generates in a single request
+EXPAND_ATTEMPTS = 2  # A topic whose expansion fails this often is kept without subtopics
+SLOT_POLL_SECONDS = 0.1
+
+_expand_slots: Optional[threading.BoundedSemaphore] = None
+_expand_slots_lock = threading.Lock()
+
+
+# (depth, marker, title, title key): depth is the heading level for headings
+# and the indentation for other lines
+ParsedLine = Tuple[int, str, str, str]
+
+
+def parse_line(raw: str) -> Optional[ParsedLine]:
+    """Parse one line of curriculum markdown; None for blank lines."""
+    line = raw.strip()
+    if not line:
+        return None
+    match = HEADING.match(line)
+    if match:
+        depth, marker, title = len(match.group(1)), match.group(1), match.group(2).strip()
+    else:
+        depth = len(raw) - len(raw.lstrip())
+        match = LIST_ITEM.match(line)
+        marker, title = (match.group(1), match.group(2).strip()) if match else ("", line)
+    return depth, marker, title, _title_key(title)
+
+
+class CurriculumNode:
+    """One line of a curriculum: a heading, a list item or a plain line.
+
+    The marker ("#", "##", "-", "1.", or "" for a plain line) is kept so the
+    curriculum can be written back in the form it was read.
+    """
+
+    __slots__ = ("id", "title", "marker", "children")
+
+    def __init__(self, title: str, marker: str = "-"):
+        self.id = ""
+        self.title = title
+        self.marker = marker
+        self.children: List["CurriculumNode"] = []
+
+    @property
+    def is_heading(self) -> bool:
+        return self.marker.startswith("#")
+
+
+def node_id(title: str, occurrence: int = 0) -> str:
+    """Stable ID for a node: its normalized text, plus a counter for repeated titles.
+
+    IDs do not depend on the node's position, so adding, removing or
+    rewriting other nodes leaves them unchanged.
+    """
+    return _hashed_id(_title_key(title), occurrence)
+
+
+def _title_key(title: str) -> str:
+    return " ".join(title.lower().split())
+
+
+@functools.lru_cache(maxsize=1 << 16)  # Reloading or revising a curriculum re-hashes nothing
+def _hashed_id(key: str, occurrence: int) -> str:
+    # 64 bits: progress, reviews and pack sections are keyed by ID, and a
+    # collision would silently merge two sections' state
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(key.encode("utf-8"))
+    digest.update(f"\0{occurrence}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class Curriculum:
+    """A curriculum parsed from markdown into a tree of nodes with stable IDs.
+
+    Headings nest by level, and list items nest under the closest heading
+    and by indentation. Progress, cached questions and edit scripts all
+    refer to nodes by ID.
+    """
+
+    def __init__(self, roots: Optional[List[CurriculumNode]] = None, _index=None):
+        self.roots = roots or []
+        self._index: Dict[str, Tuple[CurriculumNode, List[CurriculumNode]]] = _index or {}
+        if _index is None:
+            self._assign_ids()
+
+    @classmethod
+    def parse(cls, text: str) -> "Curriculum":
+        return cls.build(parse_line(raw) for raw in text.splitlines())
+
+    @classmethod
+    def build(cls, lines: Iterable[Optional[ParsedLine]]) -> "Curriculum":
+        """Assemble the tree from parsed lines (see parse_line).
+
+        Lines arrive in document order, which is the order IDs are assigned
+        in, so IDs are set as nodes are created.
+        """
+        roots: List[CurriculumNode] = []
+        index = {}
+        seen: Dict[str, int] = {}
+        headings: List[Tuple[int, CurriculumNode]] = []  # Open headings, outermost first
+        items: List[Tuple[int, CurriculumNode]] = []  # Open list items by indent
+        for line in lines:
+            if line is None:
+                continue
+            depth, marker, title, key = line
+            node = CurriculumNode(title, marker)
+            occurrence = seen.get(key, 0)
+            seen[key] = occurrence + 1
+            node.id = _hashed_id(key, occurrence)
+            if marker[:1] == "#":
+                while headings and headings[-1][0] >= depth:
+                    headings.pop()
+                siblings = headings[-1][1].children if headings else roots
+                headings.append((depth, node))
+                items = []
+            else:
+                while items and items[-1][0] >= depth:
+                    items.pop()
+                parent = items[-1][1] if items else headings[-1][1] if headings else None
+                siblings = parent.children if parent else roots
+                items.append((depth, node))
+            siblings.append(node)
+            index[node.id] = (node, siblings)
+        return cls(roots, index)
+
+    def __contains__(self, nid: str) -> bool:
+        return nid in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def nodes(self) -> Iterator[Tuple[CurriculumNode, int]]:
+        """All nodes in document order, with their depth."""
+        stack = [(node, 0) for node in reversed(self.roots)]
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            stack.extend((child, depth + 1) for child in reversed(node.children))
+
+    def node(self, nid: str) -> CurriculumNode:
+        return self._index[nid][0]
+
+    def find(self, title: str) -> Optional[str]:
+        """ID of the first node with this text, if any."""
+        nid = node_id(title)
+        return nid if nid in self._index else None
+
+    def outline(self) -> str:
+        """The curriculum as indented '[id] text' lines, for edit-script prompts."""
+        lines = []
+        for node, depth in self.nodes():
+            prefix = f"{node.marker} " if node.is_heading else ""
+            lines.append(f"{'  ' * depth}[{node.id}] {prefix}{node.title}")
+        return "\n".join(lines)
+
+    def to_markdown(self) -> str:
+        lines: List[str] = []
+        self._write(self.roots, 0, lines)
+        return "\n".join(lines).strip() + "\n"
+
+    def apply_edits(self, edits: List[Dict]) -> Dict[str, List[str]]:
+        """Apply an edit script in place.
+
+        Each edit is {"op": "rewrite", "id", "title"}, {"op": "remove", "id"}
+        or {"op": "add", "parent", "after"?, "title", "children"?}, where a
+        null parent adds a top-level section. IDs refer to the curriculum as
+        it was before the script; edits naming unknown nodes are skipped.
+        Returns the IDs that were added, and the IDs and titles of nodes that
+        were removed or rewritten.
+        """
+        changes = {"added": [], "removed": [], "rewritten": [], "changed_titles": []}
+        added = []
+        for edit in edits:
+            op = edit.get("op") if isinstance(edit, dict) else None
+            if op not in EDIT_OPS:
+                logger.warning(f"Skipping invalid curriculum edit: {edit!r}")
+                continue
+            if op == "add":
+                parent_id = edit.get("parent")
+                if parent_id is not None and parent_id not in self._index:
+                    logger.warning(f"Skipping edit for unknown parent {parent_id}")
+                    continue
+                node = self._build(edit, "#" if parent_id is None else "-")
+                if node is None:
+                    continue
+                siblings = self.node(parent_id).children if parent_id else self.roots
+                after = [i for i, sibling in enumerate(siblings) if sibling.id and sibling.id == edit.get("after")]
+                position = after[0] + 1 if after else len(siblings)
+                # Items written after a subheading would be read back as its children
+                headings = [i for i, sibling in enumerate(siblings) if sibling.is_heading]
+                if not node.is_heading and headings:
+                    position = min(position, headings[0])
+                siblings.insert(position, node)
+                added.append(node)
+            elif edit.get("id") not in self._index:
+                logger.warning(f"Skipping edit for unknown node {edit.get('id')}")
+            elif op == "remove":
+                node, siblings = self._index[edit["id"]]
+                if node in siblings:
+                    siblings.remove(node)
+                    for removed in _walk(node):
+                        changes["removed"].append(removed.id)
+                        changes["changed_titles"].append(removed.title)
+            else:
+                node = self.node(edit["id"])
+                title = _clean_title(edit.get("title"))
+                if title and title != node.title and node.id not in changes["rewritten"]:
+                    changes["rewritten"].append(node.id)
+                    changes["changed_titles"].append(node.title)
+                    node.title = title
+        self._assign_ids()
+        changes["added"] = [n.id for node in added for n in _walk(node)]
+        return changes
+
+    def _build(self, spec: Dict, marker: str) -> Optional[CurriculumNode]:
+        title = _clean_title(spec.get("title"))
+        if not title:
+            return None
+        node = CurriculumNode(title, marker)
+        for child in spec.get("children") or []:
+            built = self._build(child, "-") if isinstance(child, dict) else None
+            if built is not None:
+                node.children.append(built)
+        return node
+
+    def _write(self, nodes: List[CurriculumNode], depth: int, lines: List[str]):
+        for node in nodes:
+            if node.is_heading:
+                lines += ["", f"{node.marker} {node.title}"]
+                self._write(node.children, 0, lines)
+            else:
+                marker = f"{node.marker} " if node.marker else ""
+                lines.append(f"{'  ' * depth}{marker}{node.title}")
+                self._write(node.children, depth + 1, lines)
+
+    def _assign_ids(self):
+        """(Re)compute every node's ID and the ID index."""
+        self._index = {}
+        seen: Dict[str, int] = {}
+        stack = [(node, self.roots) for node in reversed(self.roots)]
+        while stack:
+            node, siblings = stack.pop()
+            key = _title_key(node.title)
+            occurrence = seen.get(key, 0)
+            node.id = _hashed_id(key, occurrence)
+            seen[key] = occurrence + 1
+            self._index[node.id] = (node, siblings)
+            stack.extend((child, node.children) for child in reversed(node.children))
+
+
+def line_edit(old: List[str], new: List[str]) -> Optional[Dict]:
+    """The single line-range replacement that turns old into new, or None if equal.
+
+    Edits are {"first", "removed", "lines"}: replace removed lines starting
+    at index first with lines.
+    """
+    limit = min(len(old), len(new))
+    first = 0
+    while first < limit and old[first] == new[first]:
+        first += 1
+    if first == len(old) == len(new):
+        return None
+    end = 0
+    while end < limit - first and old[len(old) - 1 - end] == new[len(new) - 1 - end]:
+        end += 1
+    return {"first": first, "removed": len(old) - first - end, "lines": new[first:len(new) - end]}
+
+
+def line_edits(old: List[str], new: List[str]) -> List[Dict]:
+    """Line edits (see line_edit) that turn old into new, one per changed run of lines.
+
+    They are ordered last to first, so applying them in turn leaves the
+    line numbers of the ones still to come valid.
+    """
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    return [{"first": i1, "removed": i2 - i1, "lines": new[j1:j2]}
+            for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()) if tag != "equal"]
+
+
+def apply_line_edit(lines: List[str], edit: Dict) -> None:
+    """Apply a line edit from line_edit in place."""
+    lines[edit["first"]:edit["first"] + edit["removed"]] = edit["lines"]
+
+
+class CurriculumDocument:
+    """Curriculum markdown held as lines, with its tree kept up to date as lines change.
+
+    An edit re-parses only the lines it replaces and re-links only the nodes
+    whose parent can have changed: the replaced lines, and the lines after
+    them up to the first one that nests exactly as before. A replaced line
+    with the same level (or indentation) and marker keeps its node.
+    """
+
+    def __init__(self, text: str = ""):
+        self.lines: List[str] = []
+        self._parsed: List[Optional[ParsedLine]] = []
+        self._nodes: List[Optional[CurriculumNode]] = []  # Per line; None for blank lines
+        self._parent: Dict[CurriculumNode, Optional[CurriculumNode]] = {}
+        self._depth: Dict[CurriculumNode, int] = {}
+        self._counts: Dict[str, int] = {}  # Title key -> number of nodes with it
+        self.tree = Curriculum([], {})
+        self.apply({"first": 0, "removed": 0, "lines": text.split("\n")})
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def curriculum(self) -> Curriculum:
+        """The parsed tree; it is updated in place by later edits."""
+        return self.tree
+
+    def update(self, text: str) -> Optional[Tuple[Dict, Dict]]:
+        """Bring the document in line with text.
+
+        Returns the line edit and the tree changes from apply, or None if
+        nothing changed.
+        """
+        edit = line_edit(self.lines, text.split("\n"))
+        return None if edit is None else (edit, self.apply(edit))
+
+    def apply(self, edit: Dict) -> Dict:
+        """Apply a line edit (see line_edit) and return what changed in the tree.
+
+        The changes are "renamed" ({old ID: new ID}), "removed" ([(ID, title)]),
+        "retitled" ({ID: old title}) and "ranges": for each parent whose
+        children changed, the slice of its old children that was replaced
+        ("first", "removed") and the IDs replacing it ("children"). Parents are
+        named by their ID before ("before") and after ("after") the edit, with
+        None for the top level.
+        """
+        first, count, lines = edit["first"], edit["removed"], edit["lines"]
+        old_keys = {node: line[3] for node, line in zip(self._nodes[first:first + count],
+                                                        self._parsed[first:first + count]) if node}
+        parsed = [parse_line(line) for line in lines]
+        nodes, retitled = [], {}
+        for i, line in enumerate(parsed):
+            node = None
+            if line is not None and i < count and self._nodes[first + i] and self._parsed[first + i][:2] == line[:2]:
+                node = self._nodes[first + i]  # Same level and marker: the node stays
+                if node.title != line[2]:
+                    retitled[node] = node.title
+                    node.title = line[2]
+            elif line is not None:
+                node = CurriculumNode(line[2], line[1])
+                self._depth[node] = line[0]
+            nodes.append(node)
+        kept = {node for node in nodes if node in old_keys}
+        gone = [node for node in old_keys if node not in kept]
+        self.lines[first:first + count] = lines
+        self._parsed[first:first + count] = parsed
+        self._nodes[first:first + count] = nodes
+
+        parents, below = self._relink(first, first + len(lines))
+
+        # Splice the re-linked nodes into the children lists they left and joined
+        touched = set(parents).union(gone)
+        new_children: Dict[Optional[CurriculumNode], List[CurriculumNode]] = {}
+        for node, parent in parents.items():
+            new_children.setdefault(parent, []).append(node)
+        for node in touched:
+            if node in self._parent:
+                new_children.setdefault(self._parent[node], [])
+        gone_set = set(gone)
+        ranges = []
+        for parent, children in new_children.items():
+            siblings = parent.children if parent is not None else self.tree.roots
+            low = siblings.index(below[parent]) + 1 if parent in below else 0
+            high = low
+            while high < len(siblings) and siblings[high] in touched:
+                high += 1
+            if siblings[low:high] == children:
+                continue  # Re-linked in place
+            ranges.append((parent, parent.id if parent is not None else None, low, high - low, children))
+            if parent not in gone_set:
+                siblings[low:high] = children
+        for node in gone:
+            del self._parent[node], self._depth[node]
+        self._parent.update(parents)
+
+        renamed, removed = self._renumber(old_keys, nodes, parsed, gone, parents)
+        return {
+            "renamed": renamed,
+            "removed": removed,
+            "retitled": {node.id: title for node, title in retitled.items()},
+            "ranges": [{"before": before, "after": parent.id if parent is not None else None,
+                        "first": low, "removed": removed_count, "children": [node.id for node in children]}
+                       for parent, before, low, removed_count, children in ranges],
+        }
+
+    def _relink(self, first: int, end: int):
+        """Find the parents of the nodes from line first on, until they nest as before.
+
+        Lines from end on are old; the first of them that gets its old parent,
+        with every ancestor unchanged, leaves the nesting of all later lines
+        as it was. Returns {node: new parent} in document order, and the open
+        node chain before first as {parent: its open child}.
+        """
+        i = first - 1
+        while i >= 0 and self._nodes[i] is None:
+            i -= 1
+        chain = []  # Open nodes before the edit, innermost first
+        node = self._nodes[i] if i >= 0 else None
+        while node is not None:
+            chain.append(node)
+            node = self._parent[node]
+        below = {self._parent[node]: node for node in chain}
+        headings = [(self._depth[node], node) for node in reversed(chain) if node.is_heading]
+        items = [(self._depth[node], node) for node in reversed(chain) if not node.is_heading]
+
+        parents: Dict[CurriculumNode, Optional[CurriculumNode]] = {}
+        for index in range(first, len(self._nodes)):
+            node = self._nodes[index]
+            if node is None:
+                continue
+            depth = self._depth[node]
+            if node.is_heading:
+                while headings and headings[-1][0] >= depth:
+                    headings.pop()
+                parent = headings[-1][1] if headings else None
+                headings.append((depth, node))
+                items = []
+            else:
+                while items and items[-1][0] >= depth:
+                    items.pop()
+                parent = items[-1][1] if items else headings[-1][1] if headings else None
+                items.append((depth, node))
+            parents[node] = parent
+            if index >= end and parent is self._parent.get(node, _UNLINKED) and self._settled(parent, parents):
+                del parents[node]  # Unchanged, like every node after it
+                break
+        return parents, below
+
+    def _settled(self, node: Optional[CurriculumNode], parents: Dict) -> bool:
+        """Whether node and all its ancestors kept their old parents."""
+        while node is not None:
+            old = self._parent.get(node, _UNLINKED)
+            if node in parents and parents[node] is not old:
+                return False
+            node = old
+        return True
+
+    def _renumber(self, old_keys: Dict[CurriculumNode, str], nodes: List[Optional[CurriculumNode]],
+                  parsed: List[Optional[ParsedLine]], gone: List[CurriculumNode], parents: Dict):
+        """Update key counts, IDs and the ID index after nodes were replaced and re-linked.
+
+        Only title keys that were added, removed or changed are renumbered;
+        a full scan is needed only when such a key also occurs elsewhere.
+        Returns the renamed IDs and the removed (ID, title) pairs.
+        """
+        index = self.tree._index
+        span_keys: Dict[str, List[CurriculumNode]] = {}
+        changed = {old_keys[node] for node in gone}
+        for node, line in zip(nodes, parsed):
+            if node is None:
+                continue
+            key = line[3]
+            span_keys.setdefault(key, []).append(node)
+            self._counts[key] = self._counts.get(key, 0) + 1
+            if old_keys.get(node) != key:
+                changed.add(key)
+                if node in old_keys:
+                    changed.add(old_keys[node])
+        for key in old_keys.values():
+            self._counts[key] -= 1
+            if not self._counts[key]:
+                del self._counts[key]
+
+        removed = []
+        for node in gone:
+            removed.append((node.id, node.title))
+            if node.id in index and index[node.id][0] is node:
+                del index[node.id]
+        reassigned = []
+        for key in changed:
+            total = self._counts.get(key, 0)
+            group = span_keys.get(key, [])
+            if total != len(group):
+                group = [node for node, line in zip(self._nodes, self._parsed) if line and line[3] == key]
+            for occurrence, node in enumerate(group):
+                new_id = _hashed_id(key, occurrence)
+                if new_id != node.id:
+                    siblings = index.pop(node.id)[1] if node.id in index and index[node.id][0] is node else None
+                    reassigned.append((node, new_id, siblings))
+        renamed = {}
+        for node, new_id, siblings in reassigned:
+            if node.id:
+                renamed[node.id] = new_id
+            node.id = new_id
+            if siblings is not None:
+                index[new_id] = (node, siblings)
+        for node, parent in parents.items():
+            index[node.id] = (node, parent.children if parent is not None else self.tree.roots)
+        return renamed, removed
+
+
+def _walk(node: CurriculumNode) -> Iterator[CurriculumNode]:
+    yield node
+    for child in node.children:
+        yield from _walk(child)
+
+
+def _clean_title(title) -> str:
+    return " ".join(str(title).split()) if title else ""
+
+
+def quiz_sections(tree: Curriculum) -> List[CurriculumNode]:
+    """The nodes quiz questions are written for: main topics, else top-level sections.
+
+    Question banks are keyed by these nodes' titles. Resource sections are
+    left out.
+    """
+    sections = []
+    for top in tree.roots:
+        if "resource" in top.title.lower():
+            continue
+        if any(child.children for child in top.children):
+            sections.extend(top.children)
+        else:
+            sections.append(top)
+    return sections
+
+
+def changed_quiz_sections(old: str, new: str) -> List[str]:
+    """Titles of the old curriculum's quiz sections that a change to new touched.
+
+    A section counts as changed when it is gone or anything in its subtree
+    was added, removed or retitled, so the questions written for it may no
+    longer fit.
+    """
+    def subtrees(text: str) -> Dict[str, List[str]]:
+        return {section.title: [node.title for node in _walk(section)]
+                for section in quiz_sections(Curriculum.parse(text))}
+
+    after = subtrees(new)
+    return [title for title, nodes in subtrees(old).items() if after.get(title) != nodes]
+
+
+def revise_curriculum(ai_service, topic: str, expertise_level: str, curriculum: str,
+                      instruction: str, cancel_token=None) -> Tuple[str, Dict[str, List[str]]]:
+    """Revise a curriculum through an edit script instead of a full rewrite.
+
+    Only the edits are generated, so unchanged nodes keep their IDs (and
+    with them progress and cached questions). Returns the new markdown and
+    the changes from Curriculum.apply_edits. Raises ValueError if the
+    model's reply is not a usable edit script.
+    """
+    tree = Curriculum.parse(curriculum)
+    if not len(tree):
+        raise ValueError("The curriculum is empty")
+    edits = ai_service.revise_curriculum(topic, expertise_level, tree.outline(), instruction,
+                                         cancel_token=cancel_token)
+    changes = tree.apply_edits(edits)
+    logger.info(f"Revised curriculum for '{topic}': {len(changes['added'])} added, "
+                f"{len(changes['removed'])} removed, {len(changes['rewritten'])} rewritten")
+    return tree.to_markdown(), changes
+
+
+def generate_curriculum_in_parallel(ai_service, topic: str, expertise_level: str, cancel_token=None,
+                                    on_update: Optional[Callable[[str, int, int], None]] = None,
+                                    max_parallel: Optional[int] = None) -> str:
+    """Generate a curriculum as an outline whose main topics are then expanded in parallel.
+
+    One short request lists the sections and main topics; each main topic
+    then gets its subtopics from its own request, up to max_parallel at a
+    time (GPTLEARNER_EXPAND_PARALLEL), so the wait is about one outline
+    plus one topic rather than the whole curriculum. The same limit also
+    applies across all generations running at once. A topic whose
+    expansion fails twice is kept without subtopics; cancellation or an
+    exhausted budget stops the expansions still running. on_update, if given,
+    is called with the markdown so far, the topics expanded and the total,
+    first for the bare outline and then as each topic arrives. The result
+    has the same markdown structure as ai_service.generate_curriculum,
+    which is used instead when the service cannot outline, parallelism is
+    off, or the outline has no main topics.
+    """
+    if max_parallel is None:
+        max_parallel = int(os.getenv("GPTLEARNER_EXPAND_PARALLEL", DEFAULT_EXPAND_PARALLEL))
+    if max_parallel <= 0 or not hasattr(ai_service, "outline_curriculum"):
+        return ai_service.generate_curriculum(topic, expertise_level, cancel_token=cancel_token)
+
+    outline = ai_service.outline_curriculum(topic, expertise_level, cancel_token=cancel_token)
+    lines = outline.strip().splitlines()
+    topics = _main_topics(lines)
+    if not topics:
+        logger.warning(f"Outline for '{topic}' has no main topics; generating it in one request")
+        return ai_service.generate_curriculum(topic, expertise_level, cancel_token=cancel_token)
+
+    expansions: Dict[int, List[str]] = {}  # Line of a main topic -> its subtopic lines
+
+    def assemble() -> str:
+        result = []
+        for index, line in enumerate(lines):
+            result.append(line)
+            result.extend(expansions.get(index, ()))
+        return "\n".join(result)
+
+    if on_update is not None:
+        on_update(assemble(), 0, len(topics))
+    # Stops this generation's expansions, whether the caller cancels or one of them fails for good
+    stop = CancelToken()
+    if cancel_token is not None:
+        cancel_token.add_callback(stop.cancel)
+
+    def expand(title: str, indent: int) -> List[str]:
+        slots = _expansion_slots()
+        for attempt in range(1, EXPAND_ATTEMPTS + 1):
+            while not slots.acquire(timeout=SLOT_POLL_SECONDS):
+                stop.raise_if_cancelled()
+            try:
+                stop.raise_if_cancelled()
+                return _indent_list(ai_service.expand_topic(topic, expertise_level, outline, title, stop), indent + 2)
+            except (RequestCancelled, BudgetExceeded):
+                raise
+            except Exception as e:
+                logger.warning(f"Expanding '{title}' failed (attempt {attempt} of {EXPAND_ATTEMPTS}): {str(e)}")
+            finally:
+                slots.release()
+        return []  # The bare topic line stays
+
+    logger.info(f"Expanding {len(topics)} main topics of '{topic}', {max_parallel} at a time")
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_parallel, len(topics))) as pool:
+            # Each request runs in a copy of the caller's context, keeping its budget scope
+            futures = {pool.submit(contextvars.copy_context().run, expand, title, indent): index
+                       for index, title, indent in topics}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    expansions[futures[future]] = future.result()
+                    if on_update is not None:
+                        on_update(assemble(), done, len(topics))
+            except BaseException:
+                for future in futures:
+                    future.cancel()  # Topics not yet started are not sent
+                stop.cancel()  # Running ones close their streams instead of being billed to the end
+                raise
+    finally:
+        if cancel_token is not None:
+            cancel_token.remove_callback(stop.cancel)
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    bare = sum(1 for expansion in expansions.values() if not expansion)
+    if bare:
+        logger.warning(f"{bare} of {len(topics)} main topics of '{topic}' were kept without subtopics")
+    return assemble()
+
+
+def _expansion_slots() -> threading.BoundedSemaphore:
+    """Limit on topic expansions in flight across all generations (GPTLEARNER_EXPAND_PARALLEL)."""
+    global _expand_slots
+    with _expand_slots_lock:
+        if _expand_slots is None:
+            limit = int(os.getenv("GPTLEARNER_EXPAND_PARALLEL", DEFAULT_EXPAND_PARALLEL))
+            _expand_slots = threading.BoundedSemaphore(max(1, limit))
+        return _expand_slots
+
+
+def _main_topics(lines: List[str]) -> List[Tuple[int, str, int]]:
+    """(line index, title, indentation) of the top-level items under the Main Topics heading."""
+    items = []
+    in_topics = False
+    for index, raw in enumerate(lines):
+        parsed = parse_line(raw)
+        if parsed is None:
+            continue
+        depth, marker, title, _ = parsed
+        if marker.startswith("#"):
+            in_topics = "main topic" in title.lower()
+        elif in_topics and marker:
+            items.append((index, title, depth))
+    top = min((depth for _, _, depth in items), default=0)
+    return [item for item in items if item[2] == top]
+
+
+def _indent_list(text: str, indent: int) -> List[str]:
+    """The list lines of a reply, re-indented so its top level sits at indent."""
+    lines = [line.rstrip() for line in text.splitlines() if LIST_ITEM.match(line.strip())]
+    if not lines:
+        return []
+    base = min(len(line) - len(line.lstrip()) for line in lines)
+    return [" " * indent + line[base:] for line in lines]
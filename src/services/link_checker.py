@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cancellation import CancelToken
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_PER_HOST = 4  # Concurrent requests to any one host
+DEFAULT_TTL_HOURS = 24.0  # Results younger than this are used without a request
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 10.0
+MAX_PAGE_BYTES = 256 * 1024  # Read at most this much of a page for its title and summary
+SUMMARY_CHARS = 300
+USER_AGENT = "GPTLearner link checker (+https://github.com/Erbun-Technologies/GPTLearner)"
+HEAD_UNSUPPORTED = {403, 405, 501}  # Statuses some servers give HEAD but not GET
+
+MARKDOWN_LINK = re.compile(r"\[([^\]]*)\]\((https?://[^)\s]+)\)")
+BARE_URL = re.compile(r"https?://[^\s<>()\[\]\"']+")
+
+
+def extract_links(text: str) -> List[str]:
+    """URLs in markdown text, from [label](url) links and bare URLs, in order of appearance."""
+    found = {}
+    for match in MARKDOWN_LINK.finditer(text):
+        found.setdefault(match.start(), match.group(2))
+    covered = [(match.start(), match.end()) for match in MARKDOWN_LINK.finditer(text)]
+    for match in BARE_URL.finditer(text):
+        if not any(start <= match.start() < end for start, end in covered):
+            found.setdefault(match.start(), match.group(0).rstrip(".,;:!?"))
+    return list(dict.fromkeys(found[start] for start in sorted(found)))
+
+
+class _PageSummary(HTMLParser):
+    """Collects a page's <title> and its description, or else its first paragraph."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.description = ""
+        self.paragraph = ""
+        self._in = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "meta" and (attrs.get("name") or attrs.get("property", "")).lower() in (
+                "description", "og:description") and not self.description:
+            self.description = (attrs.get("content") or "").strip()
+        elif tag in ("title", "p") and self._in is None and not (tag == "p" and self.paragraph):
+            self._in = tag
+
+    def handle_endtag(self, tag):
+        if tag == self._in:
+            self._in = None
+
+    def handle_data(self, data):
+        if self._in == "title" and len(self.title) < SUMMARY_CHARS:
+            self.title += data
+        elif self._in == "p" and len(self.paragraph) < SUMMARY_CHARS:
+            self.paragraph += data
+
+    def summary(self) -> Dict[str, str]:
+        text = " ".join((self.description or self.paragraph).split())
+        return {"title": " ".join(self.title.split())[:SUMMARY_CHARS], "summary": text[:SUMMARY_CHARS]}
+
+
+class LinkChecker:
+    """Validates curriculum links concurrently and caches the results.
+
+    Requests share one pooled requests.Session, with at most per_host
+    requests in flight to any host. Results are cached as JSON with the
+    ETag and Last-Modified validators, so a stale link is revalidated with
+    a conditional request that usually returns 304 without a body. With
+    prefetch, the page is fetched (the first MAX_PAGE_BYTES) and its title
+    and summary are kept for display while offline.
+    """
+
+    def __init__(self, path: str, max_workers: Optional[int] = None, per_host: Optional[int] = None,
+                 ttl_hours: Optional[float] = None):
+        self.path = path
+        if max_workers is None:
+            max_workers = int(os.getenv("GPTLEARNER_LINK_WORKERS", DEFAULT_MAX_WORKERS))
+        if per_host is None:
+            per_host = int(os.getenv("GPTLEARNER_LINKS_PER_HOST", DEFAULT_PER_HOST))
+        if ttl_hours is None:
+            ttl_hours = float(os.getenv("GPTLEARNER_LINK_TTL_HOURS", DEFAULT_TTL_HOURS))
+        self.max_workers = max(1, max_workers)
+        self.per_host = max(1, per_host)
+        self.ttl = ttl_hours * 3600
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        # Enough pooled connections per host for its concurrency limit, so none are discarded
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, threading.Semaphore] = {}
+        self._results: Dict[str, Dict] = {}
+        self._load()
+
+    def cached(self, url: str) -> Optional[Dict]:
+        """The last result for a URL, however old, without a request."""
+        with self._lock:
+            result = self._results.get(url)
+        return dict(result) if result else None
+
+    def check(self, urls: Iterable[str], prefetch: bool = False,
+              progress: Optional[Callable[[int], None]] = None,
+              cancel_token: Optional[CancelToken] = None) -> Dict[str, Dict]:
+        """Validate URLs and return url -> result.
+
+        A result has "ok", "status" (None if unreachable), "final_url",
+        "error", "checked" and, when prefetched, "title" and "summary".
+        progress, if given, is called with the number of URLs done so far.
+        """
+        urls = list(dict.fromkeys(urls))
+        results = {}
+        stale = []
+        now = time.time()
+        for url in urls:
+            cached = self.cached(url)
+            if cached and now - cached["checked"] < self.ttl and (cached.get("prefetched") or not prefetch):
+                results[url] = cached
+            else:
+                stale.append(url)
+        done = len(results)
+        if progress is not None:
+            progress(done)
+        if not stale:
+            return results
+
+        logger.info(f"Checking {len(stale)} links ({len(results)} cached)")
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(stale))) as pool:
+            futures = [(url, pool.submit(self._check_one, url, prefetch, cancel_token))
+                       for url in self._interleave_hosts(stale)]
+            for url, future in futures:
+                results[url] = future.result()
+                done += 1
+                if progress is not None:
+                    progress(done)
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        with self._lock:
+            self._save()
+        broken = sum(1 for url in stale if not results[url]["ok"])
+        logger.info(f"Checked {len(stale)} links in {time.monotonic() - started:.1f}s, {broken} broken")
+        return {url: results[url] for url in urls}
+
+    @staticmethod
+    def _interleave_hosts(urls: List[str]) -> List[str]:
+        """Order URLs round-robin by host, so workers rarely all wait on one host's limit."""
+        by_host: Dict[str, List[str]] = {}
+        for url in urls:
+            by_host.setdefault(urlsplit(url).netloc.lower(), []).append(url)
+        queues = list(by_host.values())
+        ordered = []
+        for i in range(max(len(queue) for queue in queues)):
+            ordered.extend(queue[i] for queue in queues if i < len(queue))
+        return ordered
+
+    def _slot(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.Semaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _check_one(self, url: str, prefetch: bool, cancel_token: Optional[CancelToken]) -> Dict:
+        if cancel_token is not None and cancel_token.cancelled:
+            return self.cached(url) or {"ok": False, "status": None, "error": "cancelled", "checked": 0}
+        previous = self.cached(url) or {}
+        headers = {}
+        if previous.get("ok") and (previous.get("prefetched") or not prefetch):
+            if previous.get("etag"):
+                headers["If-None-Match"] = previous["etag"]
+            if previous.get("last_modified"):
+                headers["If-Modified-Since"] = previous["last_modified"]
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        with self._slot(url):
+            try:
+                if prefetch:
+                    response = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+                else:
+                    response = self.session.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+                    if response.status_code in HEAD_UNSUPPORTED:
+                        response.close()
+                        response = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+                with response:
+                    result = self._result(url, response, prefetch, previous)
+            except requests.RequestException as e:
+                logger.debug(f"Link {url} unreachable: {str(e)}")
+                # Keep what was prefetched before, so it can still be shown offline
+                result = dict(previous, ok=False, status=None, error=type(e).__name__, checked=time.time())
+        with self._lock:
+            self._results[url] = result
+        return dict(result)
+
+    def _result(self, url: str, response: requests.Response, prefetch: bool, previous: Dict) -> Dict:
+        if response.status_code == 304 and previous:
+            return dict(previous, checked=time.time())
+        result = {
+            "ok": response.status_code < 400,
+            "status": response.status_code,
+            "final_url": response.url,
+            "error": None if response.status_code < 400 else response.reason,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked": time.time(),
+            "prefetched": prefetch,
+        }
+        if prefetch and result["ok"]:
+            if "html" in response.headers.get("Content-Type", ""):
+                body = b""
+                for chunk in response.iter_content(16 * 1024):
+                    body += chunk
+                    if len(body) >= MAX_PAGE_BYTES:
+                        break
+                parser = _PageSummary()
+                parser.feed(body.decode(response.encoding or "utf-8", errors="replace"))
+                result.update(parser.summary())
+        return result
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._results = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load link cache: {str(e)}")
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._results, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
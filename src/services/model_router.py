@@ -0,0 +1,160 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SMALL_MODEL = "claude-3-haiku-20240307"
+LARGE_MODEL = "claude-3-opus-20240229"
+
+# Starting latency estimates (seconds per request) before any are measured
+PRIOR_LATENCY = {"small": 3.0, "large": 15.0}
+EWMA_ALPHA = 0.2
+MAX_ERROR_RATE = 0.5  # Avoid a model whose recent requests mostly failed
+PROBE_EVERY = 10  # While the small model is avoided, every Nth simple question still goes to it
+
+SIMPLE_QUESTION_CHARS = 280
+SMALL_PROMPT_CHARS = 12000
+MIN_ANSWER_CHARS = 40
+
+# Phrases that suggest a question needs deeper reasoning
+COMPLEX_MARKERS = (
+    "step by step", "in detail", "in depth", "compare", "difference between", "prove",
+    "derive", "design", "implement", "debug", "trade-off", "tradeoff", "```",
+)
+
+# Phrases that suggest the small model's answer fell short
+INSUFFICIENT_MARKERS = (
+    "i'm not sure", "i am not sure", "i don't know", "i do not know",
+    "i can't answer", "i cannot answer", "beyond my", "unable to answer",
+)
+
+
+class ModelStats:
+    """Running latency and error-rate estimates for one model on one kind of request."""
+
+    def __init__(self, prior_latency: float):
+        self.latency = prior_latency
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        self.requests += 1
+        if ok:
+            self.latency = (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * latency
+        else:
+            self.errors += 1
+        self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA * (0.0 if ok else 1.0)
+
+
+class ModelRouter:
+    """Chooses a model per request and tracks how each model performs.
+
+    Curriculum and quiz generation go to the large model and answer grading
+    to the small one. Chat questions go to the small model when they are
+    short, the prompt is small and nothing marks them as complex, unless live
+    stats show the small model failing or no faster. While it is avoided,
+    every PROBE_EVERY-th simple question still goes to it, so its stats can
+    recover. GPTLEARNER_MODEL (or a per-call model) overrides the choice.
+
+    Stats are kept per model and request kind, so the chat comparison is
+    not skewed by long curriculum generations on the large model.
+    """
+
+    def __init__(self, small_model: str = SMALL_MODEL, large_model: str = LARGE_MODEL,
+                 override: Optional[str] = None):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.override = override if override is not None else os.getenv("GPTLEARNER_MODEL") or None
+        self._lock = threading.Lock()
+        self._stats = {
+            (small_model, "chat"): ModelStats(PRIOR_LATENCY["small"]),
+            (large_model, "chat"): ModelStats(PRIOR_LATENCY["large"]),
+        }
+        self._avoided = 0  # Simple questions sent to the large model since the last probe
+        self.latency_saved = 0.0
+        self.escalations = 0
+
+    def choose(self, kind: str, messages: List[Dict[str, str]], system: str = "",
+               model: Optional[str] = None) -> str:
+        """Return the model for a request of the given kind ("curriculum" or "chat")."""
+        chosen, reason = self._choose(kind, messages, system, model)
+        logger.info(f"Routing {kind} request to {chosen} ({reason})")
+        return chosen
+
+    def _choose(self, kind, messages, system, model) -> Tuple[str, str]:
+        if model:
+            return {"small": self.small_model, "large": self.large_model}.get(model, model), "requested"
+        if self.override:
+            return self.override, "GPTLEARNER_MODEL"
+        if kind == "grading":
+            return self.small_model, "grading against a reference answer"
+        if kind != "chat":
+            return self.large_model, f"{kind} requests need the large model"
+
+        question = messages[-1]["content"] if messages else ""
+        prompt_chars = len(system) + sum(len(msg["content"]) for msg in messages)
+        lowered = question.lower()
+        if len(question) > SIMPLE_QUESTION_CHARS:
+            return self.large_model, "long question"
+        if prompt_chars > SMALL_PROMPT_CHARS:
+            return self.large_model, f"large prompt ({prompt_chars} chars)"
+        if any(marker in lowered for marker in COMPLEX_MARKERS) or question.count("?") > 1:
+            return self.large_model, "complex question"
+
+        with self._lock:
+            small, large = self._stats[(self.small_model, "chat")], self._stats[(self.large_model, "chat")]
+            if small.error_rate > MAX_ERROR_RATE and large.error_rate <= MAX_ERROR_RATE:
+                reason = f"{self.small_model} error rate {small.error_rate:.0%}"
+            elif small.latency >= large.latency:
+                reason = f"{self.small_model} currently no faster"
+            else:
+                self._avoided = 0
+                return self.small_model, "simple question"
+            # Its stats only change when it answers, so try it now and then
+            self._avoided += 1
+            if self._avoided >= PROBE_EVERY:
+                self._avoided = 0
+                return self.small_model, f"probing ({reason})"
+        return self.large_model, reason
+
+    def needs_escalation(self, model: str, answer: str) -> bool:
+        """True if a small-model answer looks insufficient and should be retried."""
+        if model != self.small_model:
+            return False
+        lowered = answer.strip().lower()
+        insufficient = (len(lowered) < MIN_ANSWER_CHARS or
+                        any(marker in lowered[:300] for marker in INSUFFICIENT_MARKERS))
+        if insufficient:
+            with self._lock:
+                self.escalations += 1
+            logger.info(f"Escalating to {self.large_model}: {self.small_model} answer looks insufficient")
+        return insufficient
+
+    def record(self, model: str, latency: Optional[float], ok: bool, kind: str = "chat") -> None:
+        """Record a finished request's latency, or a failure."""
+        with self._lock:
+            stats = self._stats.setdefault((model, kind), ModelStats(latency or PRIOR_LATENCY["large"]))
+            stats.record(latency, ok)
+            if not ok or model != self.small_model or kind != "chat":
+                return
+            saved = self._stats[(self.large_model, "chat")].latency - latency
+            self.latency_saved += max(0.0, saved)
+            total = self.latency_saved
+        logger.info(f"{model} answered in {latency:.1f}s, ~{max(0.0, saved):.1f}s faster than "
+                    f"{self.large_model} (~{total:.0f}s saved so far)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            models: Dict[str, Dict] = {}
+            for (model, kind), s in self._stats.items():
+                models.setdefault(model, {})[kind] = {
+                    "latency": round(s.latency, 2), "error_rate": round(s.error_rate, 3),
+                    "requests": s.requests, "errors": s.errors}
+            return {
+                "models": models,
+                "latency_saved": round(self.latency_saved, 1),
+                "escalations": self.escalations,
+            }
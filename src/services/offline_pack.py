@@ -0,0 +1,239 @@
+import os
+import re
+import logging
+import threading
+import contextvars
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import markdown
+
+from .budget import BudgetExceeded
+from .cancellation import CancelToken, RequestCancelled
+from .curriculum import Curriculum
+from .session_archive import ArchiveWriter, read_index, read_chunk
+from .version_store import version_of
+
+logger = logging.getLogger(__name__)
+
+PACK_MAGIC = b"GPTLPAK\x01"
+PACK_SUFFIX = ".gptlpack"
+DEFAULT_COMMON_QUESTIONS = 8
+MAX_PARALLEL_REQUESTS = 4
+MARKDOWN_EXTENSIONS = ["fenced_code", "sane_lists"]
+
+QUESTION_PREFIX = re.compile(r"^\s*(?:[-*+]|\d+[.)])?\s*")
+
+
+def pack_path(directory: str, cid: str) -> str:
+    return os.path.join(directory, f"{cid}{PACK_SUFFIX}")
+
+
+def explain_section(ai_service, topic: str, expertise_level: str, curriculum: str, title: str,
+                    cancel_token=None) -> str:
+    """Ask the tutor for a study explanation of one curriculum section, as markdown."""
+    question = (
+        f"Explain the section \"{title}\" of this {topic} curriculum for a {expertise_level} learner: "
+        "its key ideas, a short worked example and common pitfalls. Use markdown."
+    )
+    return ai_service.chat([{"role": "user", "content": question}], curriculum, cancel_token=cancel_token)
+
+
+def render_explanation(text: str) -> str:
+    return markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+
+
+def build_pack(path: str, ai_service, quiz_service, cid: str, topic: str, expertise_level: str,
+               curriculum: str, sections: List[str], common_questions: int = DEFAULT_COMMON_QUESTIONS,
+               progress: Optional[Callable[[tuple], None]] = None, cancel_token=None) -> Dict:
+    """Precompute a curriculum's study content and bundle it into one offline pack.
+
+    The pack holds an explanation of each section (markdown and rendered
+    HTML, keyed by node ID), the quiz question bank, and answers to the
+    questions a learner is most likely to ask. Requests run in parallel in
+    copies of the caller's context, so they are charged to its budget
+    scope. A section or answer that fails is left out, to be fetched live
+    when it is needed. Cancelling, or running out of budget, stops the
+    requests in flight and drops the queued ones. progress, if given, is
+    called with (done, total).
+
+    The file uses the session archive container (see ArchiveWriter), so
+    each section is a separate compressed chunk that is read on its own.
+    Returns the pack's summary.
+    """
+    tree = Curriculum.parse(curriculum)
+    section_ids = {title: tree.find(title) for title in sections if tree.find(title) is not None}
+    total = len(section_ids) + 2 + common_questions  # Sections, quiz, question list, answers
+    done = 0
+    lock = threading.Lock()
+
+    def step():
+        nonlocal done
+        with lock:
+            done += 1
+            if progress is not None:
+                progress((done, total))
+
+    # Stops every request of this build, whether the caller cancels or one of them cannot go on
+    stop = CancelToken()
+    if cancel_token is not None:
+        cancel_token.add_callback(stop.cancel)
+    futures = []
+    fatal = []
+
+    def attempt(fn, *args):
+        """Run one request, returning None if it fails for any reason but budget or cancellation."""
+        try:
+            stop.raise_if_cancelled()
+            return fn(*args)
+        except (BudgetExceeded, RequestCancelled) as e:
+            with lock:
+                fatal.append(e)
+                queued = list(futures)
+            for future in queued:
+                future.cancel()  # Requests not yet started are not sent
+            stop.cancel()  # Running ones close their streams
+            raise
+        except Exception as e:
+            logger.warning(f"Offline pack for '{topic}': {getattr(fn, '__name__', 'request')} failed: {str(e)}")
+            return None
+        finally:
+            step()
+
+    def ask(question: str) -> str:
+        return ai_service.chat([{"role": "user", "content": question}], curriculum, cancel_token=stop)
+
+    logger.info(f"Building offline pack for '{topic}': {len(section_ids)} sections, {common_questions} questions")
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as pool:
+            def submit(fn, *args):
+                future = pool.submit(contextvars.copy_context().run, attempt, fn, *args)
+                with lock:
+                    futures.append(future)
+                return future
+
+            try:
+                # The question list goes first, so its answers are not queued behind every explanation
+                listed = submit(ask, f"List the {common_questions} questions a {expertise_level} learner is most "
+                                     "likely to ask while studying this curriculum, one per line, without answers.")
+                quiz = submit(partial(quiz_service.get_bank, cancel_token=stop), cid, topic, expertise_level, curriculum,
+                              sections)
+                explanations = {title: submit(explain_section, ai_service, topic, expertise_level, curriculum,
+                                              title, stop)
+                                for title in section_ids}
+                questions = _parse_questions(listed.result() or "", common_questions)
+                for _ in range(common_questions - len(questions)):
+                    step()  # Fewer questions than asked for
+                answers = {question: submit(ask, question) for question in questions}
+
+                entries = {}
+                for title, future in explanations.items():
+                    text = future.result()
+                    if text:
+                        entries[section_ids[title]] = {"title": title, "explanation": text,
+                                                       "html": render_explanation(text)}
+                bank = quiz.result()
+                pairs = [{"question": question, "answer": future.result()}
+                         for question, future in answers.items() if future.result()]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                stop.cancel()
+                if fatal:
+                    raise fatal[0]  # What stopped the build, rather than a request it dropped
+                raise
+    finally:
+        if cancel_token is not None:
+            cancel_token.remove_callback(stop.cancel)
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+
+    index = {
+        "version": 1,
+        "curriculum_id": cid,
+        "topic": topic,
+        "expertise_level": expertise_level,
+        "curriculum_version": version_of(curriculum),
+        "built": datetime.now().isoformat(timespec="seconds"),
+        "sections": {},
+        "quiz": None,
+        "answers": None,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with ArchiveWriter(path, PACK_MAGIC) as writer:
+        for node_id, entry in entries.items():
+            index["sections"][node_id] = {"title": entry["title"], "chunk": writer.put(entry)}
+        if bank:
+            index["quiz"] = writer.put(bank)
+        index["answers"] = writer.put(pairs)
+        writer.finish(index)
+    summary = {"sections": len(entries), "questions": len(bank or []), "answers": len(pairs),
+               "bytes": os.path.getsize(path)}
+    logger.info(f"Built offline pack for '{topic}': {summary}")
+    return summary
+
+
+def _parse_questions(text: str, limit: int) -> List[str]:
+    questions = []
+    for line in text.splitlines():
+        question = QUESTION_PREFIX.sub("", line).strip().strip("*").strip()
+        if question.endswith("?") and question not in questions:
+            questions.append(question)
+    return questions[:limit]
+
+
+class OfflinePack:
+    """Read side of a pack written by build_pack.
+
+    Opening reads only the index; a section is decompressed when it is
+    first shown. The file is opened per read, so a pack held by a session
+    tab keeps no file handle open.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._index = read_index(f, PACK_MAGIC, "offline pack")
+        self._sections: Dict[str, Dict] = {}
+
+    @classmethod
+    def open(cls, path: str) -> Optional["OfflinePack"]:
+        """The pack at path, or None if there is none or it cannot be read."""
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable offline pack {path}: {str(e)}")
+            return None
+
+    @property
+    def built(self) -> str:
+        return self._index["built"]
+
+    @property
+    def curriculum_version(self) -> str:
+        return self._index["curriculum_version"]
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._index["sections"]
+
+    def section(self, node_id: str) -> Optional[Dict]:
+        """A section's {"title", "explanation", "html"}, if the pack has it."""
+        if node_id not in self._index["sections"]:
+            return None
+        if node_id not in self._sections:
+            self._sections[node_id] = self._read(self._index["sections"][node_id]["chunk"])
+        return self._sections[node_id]
+
+    def quiz(self) -> List[Dict]:
+        return self._read(self._index["quiz"]) if self._index["quiz"] else []
+
+    def answers(self) -> List[Dict]:
+        return self._read(self._index["answers"]) if self._index["answers"] else []
+
+    def _read(self, chunk) -> object:
+        with open(self.path, "rb") as f:
+            return read_chunk(f, chunk)
@@ -0,0 +1,167 @@
+import os
+import re
+import json
+import random
+import difflib
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS_PER_SECTION = 5
+SECTIONS_PER_REQUEST = 4  # Sections covered by one generation request
+MAX_PARALLEL_REQUESTS = 3
+FUZZY_THRESHOLD = 0.85  # Similarity at which a short answer counts as a typo of the right one
+
+QUESTION_TYPES = ("multiple_choice", "short_answer", "open_ended")
+ARTICLES = {"a", "an", "the"}
+
+
+def normalize_answer(text: str) -> str:
+    """Lowercase, drop punctuation and articles, and collapse whitespace."""
+    words = re.findall(r"[\w.+-]+", str(text).lower())
+    words = [word.strip(".") for word in words if word not in ARTICLES]
+    return " ".join(word for word in words if word)
+
+
+def grade_locally(question: Dict, answer: str) -> Optional[Dict]:
+    """Grade an objective answer; returns None for open-ended questions."""
+    kind = question["type"]
+    if kind == "open_ended":
+        return None
+    given = normalize_answer(answer)
+    if kind == "multiple_choice":
+        correct = given == normalize_answer(question["answer"])
+    else:
+        accepted = [normalize_answer(a) for a in [question["answer"]] + question.get("accepted", [])]
+        correct = given in accepted or any(
+            difflib.SequenceMatcher(None, given, a).ratio() >= FUZZY_THRESHOLD
+            for a in accepted if len(a) > 3  # Typos in very short answers change meaning
+        )
+    feedback = "Correct!" if correct else f"The answer is: {question['answer']}"
+    if question.get("explanation"):
+        feedback += f"\n\n{question['explanation']}"
+    return {"correct": correct, "score": 1.0 if correct else 0.0, "feedback": feedback}
+
+
+class QuizService:
+    """Generates, caches and grades practice questions per curriculum.
+
+    A curriculum's question bank is generated once, a few sections per
+    request with several requests in parallel, and stored as JSON so later
+    quizzes cost no API calls. Multiple choice and short answers are graded
+    locally; only open-ended answers are sent to the model.
+    """
+
+    def __init__(self, ai_service, directory: str):
+        self.ai_service = ai_service
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def has_bank(self, curriculum_id: str) -> bool:
+        return os.path.exists(self._path(curriculum_id))
+
+    def load_bank(self, curriculum_id: str) -> List[Dict]:
+        """Return the cached question bank for a curriculum, or an empty list."""
+        try:
+            with open(self._path(curriculum_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def get_bank(self, curriculum_id: str, topic: str, expertise_level: str,
+                 curriculum: str, sections: List[str], cancel_token=None) -> List[Dict]:
+        """Return the question bank, generating questions for any sections it lacks."""
+        bank = self.load_bank(curriculum_id)
+        sections = self.missing_sections(bank, sections)
+        if bank and not sections:
+            return bank
+
+        groups = [sections[i:i + SECTIONS_PER_REQUEST] for i in range(0, len(sections), SECTIONS_PER_REQUEST)]
+        logger.info(f"Generating question bank for '{topic}': {len(sections)} sections in {len(groups)} requests")
+        # Each request runs in a copy of the caller's context, keeping its budget scope
+        runs = [contextvars.copy_context().run for _ in groups]
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as pool:
+            results = list(pool.map(
+                lambda run, group: run(self.ai_service.generate_questions,
+                                       topic, expertise_level, curriculum, group, QUESTIONS_PER_SECTION,
+                                       cancel_token),
+                runs, groups
+            ))
+
+        for group, questions in zip(groups, results):
+            for question in questions:
+                # Keep section keys matching the titles, so the sections count as covered
+                close = difflib.get_close_matches(str(question.get("section", "")), group, n=1, cutoff=0.6)
+                if close:
+                    question["section"] = close[0]
+                if question.get("type") not in QUESTION_TYPES:
+                    question["type"] = "open_ended"
+                if question["type"] == "multiple_choice" and question["answer"] not in question.get("choices", []):
+                    question["type"] = "short_answer"
+                question["id"] = len(bank)
+                bank.append(question)
+        if not bank:
+            raise ValueError("No questions could be generated for this curriculum")
+        self._save(curriculum_id, bank)
+        return bank
+
+    @staticmethod
+    def missing_sections(bank: List[Dict], sections: List[str]) -> List[str]:
+        """Sections without questions in the bank, e.g. ones added by a revision."""
+        covered = {question.get("section") for question in bank}
+        return [section for section in sections if section not in covered]
+
+    def invalidate(self, curriculum_id: str, sections: Optional[List[str]] = None) -> None:
+        """Drop a curriculum's question bank, or only the questions for some sections.
+
+        Sections dropped this way are generated again by the next get_bank.
+        """
+        if sections is not None:
+            bank, dropped = self.load_bank(curriculum_id), set(sections)
+            kept = [question for question in bank if question.get("section") not in dropped]
+            if len(kept) != len(bank):
+                for index, question in enumerate(kept):
+                    question["id"] = index
+                self._save(curriculum_id, kept)
+            return
+        with self._lock:
+            if os.path.exists(self._path(curriculum_id)):
+                os.remove(self._path(curriculum_id))
+
+    @staticmethod
+    def build_quiz(bank: List[Dict], count: int = 50) -> List[Dict]:
+        """Pick up to count questions, spread across sections, in random order."""
+        by_section: Dict[str, List[Dict]] = {}
+        for question in bank:
+            by_section.setdefault(question.get("section", ""), []).append(question)
+        for questions in by_section.values():
+            random.shuffle(questions)
+        picked = []
+        while len(picked) < count and any(by_section.values()):
+            for questions in by_section.values():
+                if questions and len(picked) < count:
+                    picked.append(questions.pop())
+        random.shuffle(picked)
+        return picked
+
+    def grade(self, question: Dict, answer: str) -> Dict:
+        """Grade an answer, locally when possible; may call the API for open-ended ones."""
+        result = grade_locally(question, answer)
+        if result is None:
+            result = self.ai_service.grade_answer(question["question"], question["answer"], answer)
+        return result
+
+    def _save(self, curriculum_id: str, bank: List[Dict]) -> None:
+        with self._lock:
+            tmp_path = self._path(curriculum_id) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(bank, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(curriculum_id))
+
+    def _path(self, curriculum_id: str) -> str:
+        return os.path.join(self.directory, f"{curriculum_id}.json")
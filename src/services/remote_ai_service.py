@@ -0,0 +1,136 @@
+import json
+import logging
+import requests
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from .cancellation import CancelToken, CancellationStats, RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT_SECONDS = 5
+READ_TIMEOUT_SECONDS = 300
+
+
+class RemoteAIService:
+    """Thin client for a shared AI server (see server.py).
+
+    Offers the same generation, chat and grading calls as AIService, so the
+    UI can use either. Cancellable requests are streamed and cancelling
+    closes the connection, which makes the server stop generating.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()  # Keep-alive connections to the server
+        self.cancellation_stats = CancellationStats()
+        logger.debug(f"RemoteAIService using {self.base_url}")
+
+    def generate_curriculum(self, topic: str, expertise_level: str,
+                            cancel_token: Optional[CancelToken] = None,
+                            on_text: Optional[Callable[[str], None]] = None) -> str:
+        """Generate a structured curriculum for the given topic."""
+        result = self._post("/v1/curriculum", {"topic": topic, "expertise_level": expertise_level},
+                            cancel_token, on_text)
+        return result["curriculum"]
+
+    def revise_curriculum(self, topic: str, expertise_level: str, outline: str, instruction: str,
+                          cancel_token: Optional[CancelToken] = None) -> List[Dict]:
+        """Ask for an edit script that revises a curriculum instead of a new curriculum."""
+        result = self._post("/v1/revise", {
+            "topic": topic, "expertise_level": expertise_level, "outline": outline, "instruction": instruction,
+        }, cancel_token, None)
+        return result["edits"]
+
+    def chat(self, messages: List[Dict[str, str]], curriculum: str,
+             cancel_token: Optional[CancelToken] = None,
+             on_text: Optional[Callable[[str], None]] = None,
+             model: Optional[str] = None) -> str:
+        """Handle chat interactions with curriculum context."""
+        messages = [dict(msg) for msg in messages]  # Snapshots hold read-only mappings
+        result = self._post("/v1/chat", {"messages": messages, "curriculum": curriculum, "model": model},
+                            cancel_token, on_text)
+        return result["response"]
+
+    def generate_questions(self, topic: str, expertise_level: str, curriculum: str,
+                           sections: List[str], per_section: int,
+                           cancel_token: Optional[CancelToken] = None) -> List[Dict]:
+        """Generate practice questions for several curriculum sections in one request."""
+        result = self._post("/v1/questions", {
+            "topic": topic, "expertise_level": expertise_level, "curriculum": curriculum,
+            "sections": sections, "per_section": per_section,
+        }, cancel_token, None)
+        return result["questions"]
+
+    def grade_answer(self, question: str, reference: str, answer: str) -> Dict:
+        """Grade an open-ended answer; returns {"correct", "score", "feedback"}."""
+        return self._post("/v1/grade", {"question": question, "reference": reference, "answer": answer},
+                          None, None)
+
+    def _post(self, path: str, payload: Dict, cancel_token: Optional[CancelToken],
+              on_text: Optional[Callable[[str], None]]) -> Dict:
+        stream = cancel_token is not None or on_text is not None
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+        try:
+            response = self.session.post(
+                self.base_url + path, json=dict(payload, stream=stream), stream=stream,
+                timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS),
+            )
+        except requests.RequestException as e:
+            logger.error(f"AI server connection error: {str(e)}")
+            raise ValueError(f"Connection Error: {str(e)}")
+
+        with response:
+            if response.status_code == 503:
+                retry_after = response.headers.get("Retry-After", "a few")
+                raise ValueError(f"AI server is busy; try again in {retry_after} seconds")
+            if response.status_code != 200:
+                raise ValueError(f"Server Error: {self._error_text(response)}")
+            if not stream:
+                return response.json()
+
+            cancel_token = cancel_token or CancelToken()
+            cancel_token.add_callback(response.close)
+            try:
+                for event, data in self._events(response):
+                    if cancel_token.cancelled:
+                        break
+                    if event == "text" and on_text:
+                        on_text(data["text"])
+                    elif event == "done":
+                        return data
+                    elif event == "error":
+                        raise ValueError(data["error"])
+            except requests.RequestException as e:
+                if not cancel_token.cancelled:
+                    raise ValueError(f"Connection Error: {str(e)}")
+            except Exception:
+                if not cancel_token.cancelled:
+                    raise
+            finally:
+                cancel_token.remove_callback(response.close)
+
+        if cancel_token.cancelled:
+            self.cancellation_stats.record(0)  # The server accounts for tokens saved
+            raise RequestCancelled("Request was cancelled")
+        raise ValueError("AI server closed the stream before the response was complete")
+
+    @staticmethod
+    def _events(response) -> Iterator[Tuple[str, Dict]]:
+        """Parse a server-sent event stream into (event, data) pairs."""
+        event, data = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                if data:
+                    yield event, json.loads("\n".join(data))
+                event, data = "message", []
+            elif line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].strip())
+
+    @staticmethod
+    def _error_text(response) -> str:
+        try:
+            return response.json().get("error", response.reason)
+        except ValueError:
+            return f"{response.status_code} {response.reason}"
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import heapq
+import logging
+import threading
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_INTERVAL_DAYS = 1.0
+SECOND_INTERVAL_DAYS = 6.0
+PASSING_QUALITY = 3  # SM-2 grades below this are lapses and restart the schedule
+MAX_DUE = 200  # Due items listed at once
+
+
+def quality_from_result(result: Dict) -> int:
+    """Map a quiz grading result to an SM-2 quality grade (0-5)."""
+    score = max(0.0, min(1.0, float(result.get("score", 1.0 if result.get("correct") else 0.0))))
+    if result.get("correct"):
+        return 5 if score >= 1.0 else 4 if score >= 0.7 else PASSING_QUALITY
+    return 2 if score >= 0.4 else 1
+
+
+class IndexedHeap:
+    """Binary min-heap of (priority, key) with a key -> position index.
+
+    Pushing, re-prioritizing and removing any key are O(log n); the
+    minimum is O(1). Ties are broken by insertion order so equal
+    priorities come out first in, first out.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._position: Dict[Hashable, int] = {}
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._position
+
+    def push(self, key: Hashable, priority: float) -> None:
+        """Add a key, or move it if it is already queued."""
+        self._counter += 1
+        if key in self._position:
+            index = self._position[key]
+            old = self._heap[index][0]
+            self._heap[index] = (priority, self._counter, key)
+            if priority < old:
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
+            return
+        self._heap.append((priority, self._counter, key))
+        self._position[key] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def remove(self, key: Hashable) -> None:
+        index = self._position.pop(key)
+        last = self._heap.pop()
+        if index < len(self._heap):
+            self._heap[index] = last
+            self._position[last[2]] = index
+            self._sift_up(index)
+            self._sift_down(self._position[last[2]])
+
+    def peek(self) -> Optional[Tuple[Hashable, float]]:
+        if not self._heap:
+            return None
+        priority, _, key = self._heap[0]
+        return key, priority
+
+    def pop(self) -> Tuple[Hashable, float]:
+        key, priority = self.peek()
+        self.remove(key)
+        return key, priority
+
+    def smallest(self, until: float, limit: int) -> Iterator[Tuple[Hashable, float]]:
+        """Yield up to limit keys with priority <= until, lowest first.
+
+        Walks the heap array with a frontier heap instead of popping, so
+        listing k items costs O(k log k) and leaves the queue untouched.
+        """
+        frontier = [self._heap[0] + (0,)] if self._heap else []
+        while frontier and limit > 0:
+            priority, _, key, index = heapq.heappop(frontier)
+            if priority > until:
+                return
+            yield key, priority
+            limit -= 1
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, self._heap[child] + (child,))
+
+    def _sift_up(self, index: int) -> None:
+        item = self._heap[index]
+        while index > 0:
+            parent = (index - 1) // 2
+            if self._heap[parent][:2] <= item[:2]:
+                break
+            self._heap[index] = self._heap[parent]
+            self._position[self._heap[index][2]] = index
+            index = parent
+        self._heap[index] = item
+        self._position[item[2]] = index
+
+    def _sift_down(self, index: int) -> None:
+        item = self._heap[index]
+        size = len(self._heap)
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and self._heap[child + 1][:2] < self._heap[child][:2]:
+                child += 1
+            if item[:2] <= self._heap[child][:2]:
+                break
+            self._heap[index] = self._heap[child]
+            self._position[self._heap[index][2]] = index
+            index = child
+        self._heap[index] = item
+        self._position[item[2]] = index
+
+
+class ReviewScheduler:
+    """SM-2 spaced-repetition schedule over curriculum nodes.
+
+    Nodes are keyed by (curriculum ID, node ID), so the schedule spans
+    every session and curriculum. A node is tracked once it has been
+    studied and is first due a day later; each graded review then moves
+    it out by its interval and ease, and a failed review starts it over.
+    Due dates live in an indexed heap, so what is due now is answered
+    without scanning all tracked nodes.
+
+    Changes are appended to a JSON lines log, one entry state per line;
+    the log is rewritten when it is loaded with many superseded lines.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Dict] = {}
+        self._queue = IndexedHeap()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_tracked(self, cid: str, node_id: str) -> bool:
+        return (cid, node_id) in self._entries
+
+    def track(self, cid: str, node_id: str, title: str, topic: str, expertise_level: str,
+              session_id: Optional[str] = None, now: Optional[float] = None) -> None:
+        """Start scheduling a node the learner has studied; known nodes keep their schedule."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get((cid, node_id))
+            if entry is not None:
+                if entry["title"] == title and session_id in (None, entry.get("session_id")):
+                    return
+                entry["title"] = title
+                entry["session_id"] = session_id or entry.get("session_id")
+            else:
+                entry = {
+                    "curriculum_id": cid,
+                    "node_id": node_id,
+                    "title": title,
+                    "topic": topic,
+                    "expertise_level": expertise_level,
+                    "session_id": session_id,
+                    "ease": DEFAULT_EASE,
+                    "interval": 0.0,  # Days
+                    "reps": 0,
+                    "lapses": 0,
+                    "due": now + FIRST_INTERVAL_DAYS * DAY,
+                }
+                self._entries[(cid, node_id)] = entry
+                self._queue.push((cid, node_id), entry["due"])
+            self._append(entry)
+
+    def review(self, cid: str, node_id: str, quality: int, now: Optional[float] = None) -> Dict:
+        """Record a review graded 0-5 and reschedule the node (SM-2)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get((cid, node_id))
+            if entry is None:
+                raise ValueError(f"Node {node_id} of {cid} is not scheduled for review")
+            if quality < PASSING_QUALITY:
+                entry["reps"] = 0
+                entry["lapses"] += 1
+                entry["interval"] = FIRST_INTERVAL_DAYS
+            else:
+                entry["reps"] += 1
+                if entry["reps"] == 1:
+                    entry["interval"] = FIRST_INTERVAL_DAYS
+                elif entry["reps"] == 2:
+                    entry["interval"] = SECOND_INTERVAL_DAYS
+                else:
+                    entry["interval"] = round(entry["interval"] * entry["ease"], 2)
+            entry["ease"] = max(MIN_EASE, entry["ease"] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+            entry["due"] = now + entry["interval"] * DAY
+            entry["reviewed"] = now
+            self._queue.push((cid, node_id), entry["due"])
+            self._append(entry)
+            logger.debug(f"Reviewed '{entry['title']}' (quality {quality}); next in {entry['interval']} days")
+            return dict(entry)
+
+    def due(self, now: Optional[float] = None, limit: int = MAX_DUE) -> List[Dict]:
+        """Entries due at now (default: the current time), most overdue first."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [dict(self._entries[key]) for key, _ in self._queue.smallest(now, limit)]
+
+    def next_due(self) -> Optional[float]:
+        """Timestamp of the earliest due review, if any node is tracked."""
+        with self._lock:
+            top = self._queue.peek()
+        return top[1] if top else None
+
+    def forget(self, cid: str, node_ids: List[str]) -> None:
+        """Stop scheduling nodes, e.g. ones removed from their curriculum."""
+        with self._lock:
+            for node_id in node_ids:
+                entry = self._entries.pop((cid, node_id), None)
+                if entry is not None:
+                    self._queue.remove((cid, node_id))
+                    self._append(dict(entry, removed=True))
+
+    def _append(self, entry: Dict) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        lines = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        key = (entry["curriculum_id"], entry["node_id"])
+                    except (ValueError, KeyError, TypeError):
+                        logger.error(f"Skipping unreadable line {lines} of the review schedule")
+                        continue
+                    if entry.pop("removed", False):
+                        self._entries.pop(key, None)
+                    else:
+                        self._entries[key] = entry
+        except OSError as e:
+            logger.error(f"Could not load review schedule: {str(e)}")
+            return
+        for key, entry in self._entries.items():
+            self._queue.push(key, entry["due"])
+        if lines > 2 * len(self._entries) + 64:
+            self._compact()
+        logger.debug(f"Review schedule loaded with {len(self._entries)} nodes")
+
+    def _compact(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
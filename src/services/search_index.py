@@ -0,0 +1,286 @@
+import os
+import re
+import json
+import math
+import heapq
+import bisect
+import itertools
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+")
+QUERY_RE = re.compile(r'"([^"]+)"|(\S+)')
+PREVIEW_CHARS = 160
+MAX_PREFIX_EXPANSIONS = 50
+BM25_K1 = 1.2
+BM25_B = 0.75
+COMMON_TERM_SHARE = 0.05  # Terms in more of the documents only score candidates found by rarer terms
+MAX_COMMON_CANDIDATES = 2000  # Documents scored for a query of common terms only
+COMPACT_RATIO = 1.5  # Rewrite the log on load once it has this many records per live document
+COMPACT_MIN_RECORDS = 1000
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "to", "of", "and", "or", "in", "on",
+    "for", "with", "it", "this", "that", "as", "at", "by", "i", "you", "do", "does",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+class SearchResults(list):
+    """Ranked hits; truncated is True when some documents containing every query term were not scored."""
+
+    def __init__(self, hits=(), truncated: bool = False):
+        super().__init__(hits)
+        self.truncated = truncated
+
+
+class SearchIndex:
+    """Incremental inverted index over curricula and chat messages.
+
+    Documents are identified by a string key and carry a small metadata dict
+    (session, kind, reference, preview). Postings keep term positions so the
+    index answers ranked (BM25), prefix ("recur*") and phrase ("tail call")
+    queries. Every change is appended to a JSONL log, which is replayed on
+    load, so updates never require a rebuild; load compacts a log that has
+    grown well past the live documents.
+
+    Ranking walks only the postings of rare terms. Stopwords are dropped
+    from queries, and terms found in more than COMMON_TERM_SHARE of the
+    documents add to the score of candidates found by rarer terms without
+    their postings being walked. A query of common terms alone scores up to
+    MAX_COMMON_CANDIDATES documents: those containing every term first, then
+    the most recent containing its rarest term. Results say when documents
+    containing every term were left out (see SearchResults).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, List[int]]] = {}
+        self._terms: List[str] = []  # Sorted vocabulary for prefix lookups
+        self._docs: Dict[int, Dict] = {}
+        self._keys: Dict[str, int] = {}
+        self._lengths: Dict[int, int] = {}
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._total_length = 0
+        self._next_id = 0
+
+    def load(self) -> int:
+        """Replay the on-disk log; returns the number of indexed documents."""
+        if not os.path.exists(self.path):
+            return 0
+        live: Dict[str, Dict] = {}  # Key -> last add record, for compaction
+        records = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                records += self._replay(line, live)
+            with self._lock:
+                # Records appended while replaying; later appends wait for the lock
+                for line in f:
+                    records += self._replay(line, live)
+                if records >= COMPACT_MIN_RECORDS and records > COMPACT_RATIO * len(live):
+                    self._compact(live.values())
+                    logger.info(f"Search index log compacted from {records} to {len(live)} records")
+        logger.info(f"Search index loaded with {len(self._docs)} documents")
+        return len(self._docs)
+
+    def _replay(self, line: str, live: Dict[str, Dict]) -> int:
+        """Apply one log record; returns 1 if it was readable."""
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return 0  # Torn final line after a crash
+        # Lock per record so queries are not blocked while loading
+        with self._lock:
+            if record.get("op") == "remove":
+                self._remove(record["key"])
+                live.pop(record["key"], None)
+            else:
+                self._add(record["key"], record["text"], record["meta"])
+                live.pop(record["key"], None)
+                live[record["key"]] = record
+        return 1
+
+    def _compact(self, records) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def add_document(self, key: str, text: str, meta: Dict) -> None:
+        """Index (or re-index) a document and append it to the log."""
+        with self._lock:
+            self._add(key, text, meta)
+            self._append({"key": key, "text": text, "meta": meta})
+
+    def remove_document(self, key: str) -> None:
+        with self._lock:
+            if key in self._keys:
+                self._remove(key)
+                self._append({"op": "remove", "key": key})
+
+    def add_message(self, session_id: str, topic: str, ref, role: str, content: str) -> None:
+        """Index one chat message; ref is its conversation node ID (or row in older sessions)."""
+        self.add_document(f"{session_id}:message:{ref}", content, {
+            "session_id": session_id, "topic": topic, "kind": "message", "ref": ref, "role": role,
+        })
+
+    def add_section(self, session_id: str, topic: str, title: str, content: str) -> None:
+        """Index one curriculum section of a session."""
+        self.add_document(f"{session_id}:section:{title}", content, {
+            "session_id": session_id, "topic": topic, "kind": "section", "ref": title,
+        })
+
+    def index_session(self, state: Dict) -> None:
+        """Index every chat message of a saved session state, e.g. after import."""
+        if "conversation" in state:
+            # Every branch, each message once
+            for node_id, _, role, content, _ in state["conversation"]["nodes"]:
+                if role in ("user", "assistant"):
+                    self.add_message(state["session_id"], state.get("topic", ""), node_id, role, content)
+            return
+        for row, msg in enumerate(state.get("messages", [])):
+            if msg.get("type") in ("user", "assistant"):
+                self.add_message(state["session_id"], state.get("topic", ""), row, msg["type"], msg["content"])
+
+    def search(self, query: str, limit: int = 20) -> SearchResults:
+        """Return the best matching documents' metadata, with a 'score' key.
+
+        Bare words are ranked with BM25, words ending in '*' match any term
+        with that prefix, and quoted text must appear as an exact phrase.
+        """
+        phrases, terms = [], []
+        for phrase, word in QUERY_RE.findall(query):
+            if phrase:
+                tokens = tokenize(phrase)
+                if len(tokens) > 1:
+                    phrases.append(tokens)
+                terms.extend(tokens)
+            elif word.endswith("*"):
+                terms.extend(self._expand_prefix(word[:-1].lower()))
+            else:
+                terms.extend(tokenize(word))
+        # Stopwords still count inside phrases, which are matched by position
+        terms = [term for term in terms if term not in STOPWORDS] or terms
+        if not terms:
+            return SearchResults()
+
+        with self._lock:
+            scores, truncated = self._score(terms)
+            for phrase in phrases:
+                scores = {doc_id: score for doc_id, score in scores.items()
+                          if self._contains_phrase(doc_id, phrase)}
+            best = heapq.nlargest(limit, scores.items(), key=lambda pair: pair[1])
+            if truncated:
+                logger.debug(f"Search for {query!r} scored only {MAX_COMMON_CANDIDATES} of its matches")
+            return SearchResults([dict(self._docs[doc_id], score=score) for doc_id, score in best], truncated)
+
+    def _score(self, terms: List[str]) -> Tuple[Dict[int, float], bool]:
+        """BM25 scores of the candidate documents, and whether candidates were cut off."""
+        doc_count = len(self._docs)
+        if not doc_count:
+            return {}, False
+        avg_length = self._total_length / doc_count
+        postings = sorted((self._postings[term] for term in set(terms) if term in self._postings), key=len)
+        if not postings:
+            return {}, False
+        cutoff = max(MAX_COMMON_CANDIDATES, COMMON_TERM_SHARE * doc_count)
+        rare = [term_postings for term_postings in postings if len(term_postings) <= cutoff]
+        truncated = False
+        if rare:
+            candidates = set().union(*rare)
+        else:
+            # Documents with every term rank best, and hold every phrase match.
+            # Dicts keep insertion order, so reversed postings run newest first.
+            first, rest = postings[0], postings[1:]
+            matching = (doc_id for doc_id in reversed(first) if all(doc_id in other for other in rest))
+            candidates = set(itertools.islice(matching, MAX_COMMON_CANDIDATES))
+            truncated = len(candidates) == MAX_COMMON_CANDIDATES and next(matching, None) is not None
+            for doc_id in reversed(first):
+                if len(candidates) >= MAX_COMMON_CANDIDATES:
+                    break
+                candidates.add(doc_id)
+
+        scores = dict.fromkeys(candidates, 0.0)
+        for term_postings in postings:
+            idf = math.log(1 + (doc_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            walked = term_postings.items() if len(term_postings) <= len(candidates) else (
+                (doc_id, term_postings[doc_id]) for doc_id in candidates if doc_id in term_postings)
+            for doc_id, positions in walked:
+                if doc_id not in scores:
+                    continue
+                tf = len(positions)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores, truncated
+
+    def _contains_phrase(self, doc_id: int, phrase: List[str]) -> bool:
+        position_sets = []
+        for term in phrase:
+            positions = self._postings.get(term, {}).get(doc_id)
+            if not positions:
+                return False
+            position_sets.append(set(positions))
+        return any(
+            all(start + offset in position_sets[offset] for offset in range(1, len(phrase)))
+            for start in position_sets[0]
+        )
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        if not prefix:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._terms, prefix)
+            matches = []
+            for term in self._terms[start:start + MAX_PREFIX_EXPANSIONS]:
+                if not term.startswith(prefix):
+                    break
+                matches.append(term)
+            return matches
+
+    def _add(self, key: str, text: str, meta: Dict) -> None:
+        if key in self._keys:
+            self._remove(key)
+        doc_id = self._next_id
+        self._next_id += 1
+        tokens = tokenize(text)
+        for position, token in enumerate(tokens):
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._terms, token)
+            postings.setdefault(doc_id, []).append(position)
+        meta = dict(meta, preview=text[:PREVIEW_CHARS])
+        self._docs[doc_id] = meta
+        self._keys[key] = doc_id
+        self._lengths[doc_id] = len(tokens)
+        self._doc_terms[doc_id] = list(set(tokens))
+        self._total_length += len(tokens)
+
+    def _remove(self, key: str) -> None:
+        doc_id = self._keys.pop(key, None)
+        if doc_id is None:
+            return
+        # Only the postings of this document's own terms need touching
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._terms, term)
+                if index < len(self._terms) and self._terms[index] == term:
+                    del self._terms[index]
+        self._total_length -= self._lengths.pop(doc_id)
+        del self._docs[doc_id]
+
+    def _append(self, record: Dict) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,229 @@
+import os
+import json
+import zlib
+import struct
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GPTLARC\x01"
+FOOTER_MAGIC = b"GPTLIDX\x01"
+FOOTER = struct.Struct("<QQ8s")  # index offset, index length, magic
+CHUNK_SIZE = 500  # Messages per compressed chat chunk
+COMPRESSION_LEVEL = 6
+
+# Fields stored as their own chunks; everything else goes into "meta"
+BLOB_FIELDS = ("curriculum", "progress", "section_content", "conversation")
+LIST_FIELDS = ("messages", "chat_history")
+
+
+def _encode(value) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def _decode(data: bytes):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+class ArchiveWriter:
+    """Writes a chunked archive: magic, zlib-compressed JSON chunks, the
+    compressed index, then a fixed-size footer pointing at the index.
+
+    put() stores a value as a chunk and returns its [offset, length] for
+    the index; finish() writes the index and moves the file into place.
+    The file types differ only in their magic.
+    """
+
+    def __init__(self, path: str, magic: bytes = MAGIC):
+        self.path = path
+        self._tmp_path = path + ".tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(magic)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._file.closed:
+            self._file.close()
+            os.remove(self._tmp_path)  # Not finished: leave no partial archive behind
+
+    def put(self, value) -> List[int]:
+        data = _encode(value)
+        offset = self._file.tell()
+        self._file.write(data)
+        return [offset, len(data)]
+
+    def finish(self, index: Dict) -> None:
+        index_data = _encode(index)
+        index_offset = self._file.tell()
+        self._file.write(index_data)
+        self._file.write(FOOTER.pack(index_offset, len(index_data), FOOTER_MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+
+def read_index(f, magic: bytes = MAGIC, kind: str = "session archive") -> Dict:
+    """Check an open archive's magic and footer and return its index."""
+    f.seek(0)
+    if f.read(len(magic)) != magic:
+        raise ValueError(f"{f.name} is not a {kind}")
+    f.seek(-FOOTER.size, os.SEEK_END)
+    index_offset, index_length, footer_magic = FOOTER.unpack(f.read(FOOTER.size))
+    if footer_magic != FOOTER_MAGIC:
+        raise ValueError(f"{f.name} is truncated or corrupt")
+    return read_chunk(f, (index_offset, index_length))
+
+
+def read_chunk(f, chunk) -> object:
+    """Decode the chunk at [offset, length] of an open archive."""
+    f.seek(chunk[0])
+    return _decode(f.read(chunk[1]))
+
+
+def write_archive(path: str, states: Iterable[Dict], chunk_size: int = CHUNK_SIZE) -> int:
+    """Write session states to a compressed, indexed archive (see ArchiveWriter).
+
+    Chat lists are split into chunks of chunk_size messages so a reader can
+    load any single conversation, or part of one, without touching the
+    rest of the file. Returns the number of sessions written.
+    """
+    index = {"version": 1, "sessions": []}
+    with ArchiveWriter(path) as writer:
+        put = writer.put
+        for state in states:
+            meta = {k: v for k, v in state.items() if k not in BLOB_FIELDS + LIST_FIELDS}
+            entry = {
+                "session_id": state["session_id"],
+                "topic": state.get("topic", ""),
+                "expertise_level": state.get("expertise_level", ""),
+                "updated": state.get("updated", ""),
+                "message_count": len(state.get("messages", [])),
+                "chunks": {"meta": put(meta)},
+                "lists": {},
+            }
+            for field in BLOB_FIELDS:
+                if field in state:
+                    entry["chunks"][field] = put(state[field])
+            for field in LIST_FIELDS:
+                items = state.get(field, [])
+                entry["lists"][field] = [
+                    put(items[start:start + chunk_size]) + [len(items[start:start + chunk_size])]
+                    for start in range(0, len(items), chunk_size)
+                ]
+            index["sessions"].append(entry)
+        writer.finish(index)
+    logger.info(f"Wrote {len(index['sessions'])} sessions to archive '{path}'")
+    return len(index["sessions"])
+
+
+class SessionArchive:
+    """Random-access reader for archives produced by write_archive.
+
+    Opening an archive only reads the footer and index; session parts are
+    decompressed individually when requested.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            index = read_index(self._file)
+        except Exception:
+            self._file.close()
+            raise
+        self._sessions = {entry["session_id"]: entry for entry in index["sessions"]}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def list_sessions(self) -> List[Dict]:
+        """Return summaries of the sessions in the archive, in archive order."""
+        return [
+            {key: entry[key] for key in ("session_id", "topic", "expertise_level", "updated", "message_count")}
+            for entry in self._sessions.values()
+        ]
+
+    def load_messages(self, session_id: str, start: int = 0, end: Optional[int] = None,
+                      field: str = "messages") -> List[Dict]:
+        """Load a slice of a session's conversation, decompressing only the chunks it spans."""
+        entry = self._entry(session_id)
+        result = []
+        position = 0
+        for offset, length, count in entry["lists"].get(field, []):
+            chunk_start, position = position, position + count
+            if position <= start:
+                continue
+            if end is not None and chunk_start >= end:
+                break
+            items = read_chunk(self._file, (offset, length))
+            result.extend(items[max(0, start - chunk_start):None if end is None else end - chunk_start])
+        return result
+
+    def load_session(self, session_id: str) -> Dict:
+        """Load a complete session state."""
+        entry = self._entry(session_id)
+        state = read_chunk(self._file, entry["chunks"]["meta"])
+        for field in BLOB_FIELDS:
+            if field in entry["chunks"]:
+                state[field] = read_chunk(self._file, entry["chunks"][field])
+        for field in LIST_FIELDS:
+            state[field] = self.load_messages(session_id, field=field)
+        return state
+
+    def _entry(self, session_id: str) -> Dict:
+        if session_id not in self._sessions:
+            raise ValueError(f"Session {session_id} not found in {self.path}")
+        return self._sessions[session_id]
+
+
+def export_sessions(store, path: str, session_ids: Optional[List[str]] = None) -> int:
+    """Export sessions from a SessionStore (all of them by default) to an archive."""
+    if session_ids is None:
+        session_ids = [summary["session_id"] for summary in store.list_sessions()]
+    return write_archive(path, (store.load_session(session_id) for session_id in session_ids))
+
+
+def _import_one(store, path: str, lock: threading.Lock) -> List[Dict]:
+    imported = []
+    with SessionArchive(path) as archive:
+        for summary in archive.list_sessions():
+            session_id = summary["session_id"]
+            state = archive.load_session(session_id)
+            # Check-and-save must be atomic when archives share sessions
+            with lock:
+                if store.has_session(session_id):
+                    existing = store.load_session(session_id)
+                    if existing.get("imported_from", existing.get("updated", "")) >= summary["updated"]:
+                        logger.debug(f"Skipping session {session_id}: stored copy is as new")
+                        continue
+                state["imported_from"] = summary["updated"]
+                store.save_session(state)
+            imported.append(summary)
+    logger.info(f"Imported {len(imported)} sessions from '{path}'")
+    return imported
+
+
+def import_archives(store, paths: List[str], max_workers: Optional[int] = None) -> List[Dict]:
+    """Import many archives into a SessionStore in parallel.
+
+    Decompression and file I/O release the GIL, so a thread pool scales well
+    here. Sessions already stored with a newer timestamp are kept. Returns
+    summaries of the imported sessions.
+    """
+    if not paths:
+        return []
+    max_workers = max_workers or min(8, len(paths))
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(lambda path: _import_one(store, path, lock), paths)
+        return [summary for imported in results for summary in imported]
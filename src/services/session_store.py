@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import logging
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+from .curriculum import apply_line_edit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_DIR = os.path.join(os.path.expanduser("~"), ".gptlearner")
+EDIT_LOG_MIN_BYTES = 64 * 1024  # Edit logs are folded into the curriculum past this or its own size
+
+
+def curriculum_id(topic: str, expertise_level: str) -> str:
+    """Return the stable storage ID for a topic/level curriculum."""
+    slug = re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-") or "untitled"
+    return f"{slug}--{expertise_level.lower()}"
+
+
+class SessionStore:
+    """File-backed storage for serialized learning sessions.
+
+    Each session is one JSON document under <data_dir>/sessions, written
+    atomically so a crash never leaves a half-written session behind.
+    """
+
+    def __init__(self, data_dir: Optional[str] = None):
+        self.data_dir = data_dir or os.getenv("GPTLEARNER_DATA_DIR", DEFAULT_DATA_DIR)
+        self.sessions_dir = self.path("sessions")
+        self.curricula_dir = self.path("curricula")
+        self._summaries: Dict[str, tuple] = {}  # Session file name -> (mtime, summary)
+        logger.debug(f"SessionStore using data_dir='{self.data_dir}'")
+
+    def path(self, *parts: str) -> str:
+        """Return a path inside the data directory, creating the directory."""
+        directory = os.path.join(self.data_dir, *parts)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def save_session(self, state: Dict) -> None:
+        """Persist a session state dict keyed by its session_id."""
+        state = dict(state)
+        state["updated"] = datetime.now().isoformat(timespec="seconds")
+        self._write_json(self._session_path(state["session_id"]), state)
+        logger.debug(f"Saved session {state['session_id']} ({state.get('topic', '')})")
+
+    def load_session(self, session_id: str) -> Dict:
+        """Load a previously saved session state."""
+        path = self._session_path(session_id)
+        if not os.path.exists(path):
+            raise ValueError(f"Session {session_id} not found")
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def has_session(self, session_id: str) -> bool:
+        return os.path.exists(self._session_path(session_id))
+
+    def delete_session(self, session_id: str) -> None:
+        path = self._session_path(session_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def list_sessions(self) -> List[Dict]:
+        """Return lightweight summaries of all stored sessions, newest first.
+
+        Summaries are cached by file modification time, so only sessions
+        saved since the last call are read.
+        """
+        summaries = []
+        names = set()
+        for name in os.listdir(self.sessions_dir):
+            if not name.endswith(".json"):
+                continue
+            names.add(name)
+            try:
+                mtime = os.path.getmtime(os.path.join(self.sessions_dir, name))
+                cached = self._summaries.get(name)
+                if cached is not None and cached[0] == mtime:
+                    summaries.append(dict(cached[1]))
+                    continue
+                state = self.load_session(name[:-len(".json")])
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping unreadable session file {name}: {str(e)}")
+                continue
+            summary = {
+                "session_id": state["session_id"],
+                "topic": state.get("topic", ""),
+                "expertise_level": state.get("expertise_level", ""),
+                "updated": state.get("updated", ""),
+            }
+            self._summaries[name] = (mtime, summary)
+            summaries.append(dict(summary))
+        for name in set(self._summaries) - names:
+            del self._summaries[name]
+        summaries.sort(key=lambda summary: summary["updated"], reverse=True)
+        return summaries
+
+    def save_curriculum(self, topic: str, expertise_level: str, curriculum: str) -> str:
+        """Store the latest curriculum for a topic/level and return its ID."""
+        cid = curriculum_id(topic, expertise_level)
+        self._write_curriculum({
+            "curriculum_id": cid,
+            "topic": topic,
+            "expertise_level": expertise_level,
+            "curriculum": curriculum,
+        })
+        logger.debug(f"Saved curriculum {cid}")
+        return cid
+
+    def save_curriculum_edits(self, cid: str, edits: List[Dict]) -> None:
+        """Append line edits (see curriculum.line_edit) to a stored curriculum.
+
+        Edits go to a log next to the curriculum, so saving a one-line change
+        to a large curriculum writes one short line. The log is folded back
+        into the curriculum once it outgrows it.
+        """
+        path = self._curriculum_path(cid)
+        if not os.path.exists(path):
+            raise ValueError(f"Curriculum {cid} not found")
+        log_path = self._edit_log_path(cid)
+        with open(log_path, "a", encoding="utf-8") as f:
+            for edit in edits:
+                f.write(json.dumps(edit, ensure_ascii=False) + "\n")
+        if os.path.getsize(log_path) > max(EDIT_LOG_MIN_BYTES, os.path.getsize(path)):
+            self._write_curriculum(self.load_curriculum(cid))
+            logger.debug(f"Compacted edit log of curriculum {cid}")
+
+    def load_curriculum(self, cid: str) -> Dict:
+        """Load a stored curriculum record by ID, with any logged edits applied."""
+        path = self._curriculum_path(cid)
+        if not os.path.exists(path):
+            raise ValueError(f"Curriculum {cid} not found")
+        with open(path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+        log_path = self._edit_log_path(cid)
+        if os.path.exists(log_path):
+            lines = record["curriculum"].split("\n")
+            with open(log_path, "r", encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    try:
+                        apply_line_edit(lines, json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        # A crash mid-append leaves a partial last line; later edits build on it
+                        logger.error(f"Ignoring edits from line {number} of the {cid} edit log")
+                        break
+            record["curriculum"] = "\n".join(lines)
+        return record
+
+    def has_curriculum(self, cid: str) -> bool:
+        return os.path.exists(self._curriculum_path(cid))
+
+    def _write_curriculum(self, record: Dict) -> None:
+        """Write a full curriculum record, replacing any edit log."""
+        record = dict(record, updated=datetime.now().isoformat(timespec="seconds"))
+        self._write_json(self._curriculum_path(record["curriculum_id"]), record)
+        log_path = self._edit_log_path(record["curriculum_id"])
+        if os.path.exists(log_path):
+            os.remove(log_path)
+
+    def _curriculum_path(self, cid: str) -> str:
+        return os.path.join(self.curricula_dir, f"{cid}.json")
+
+    def _edit_log_path(self, cid: str) -> str:
+        return os.path.join(self.curricula_dir, f"{cid}.edits.jsonl")
+
+    def _session_path(self, session_id: str) -> str:
+        return os.path.join(self.sessions_dir, f"{session_id}.json")
+
+    def _write_json(self, path: str, data) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import random
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.6  # Minimum topic similarity to offer reuse
+CONTENT_THRESHOLD = 0.5  # Estimated content Jaccard that marks a near-duplicate curriculum
+NUM_PERM = 64
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows each
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Filler words that do not change what a topic is about
+STOPWORDS = {
+    "a", "an", "the", "to", "of", "for", "and", "in", "with", "on",
+    "learn", "basic", "basics", "intro", "introduction", "fundamentals",
+    "beginner", "beginners", "course", "tutorial", "guide", "101",
+    "getting", "started", "programming", "language",
+}
+
+
+def normalize_topic(topic: str) -> str:
+    """Reduce a topic to sorted content words ("Learn Python basics" -> "python")."""
+    tokens = re.findall(r"\w+", topic.lower())
+    words = [token for token in tokens if token not in STOPWORDS] or tokens
+    # Light stemming so "closures" and "closure" agree
+    words = [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+             for word in words]
+    return " ".join(sorted(set(words)))
+
+
+def char_shingles(text: str, k: int = 3) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + k] for i in range(max(1, len(padded) - k + 1))}
+
+
+def word_shingles(text: str, k: int = 3) -> Set[str]:
+    words = re.findall(r"\w+", text.lower())
+    return {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """Computes MinHash signatures with a fixed, seeded permutation family."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = random.Random(seed)
+        self.coefficients = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, shingles: Set[str]) -> List[int]:
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                  for s in shingles]
+        return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.coefficients]
+
+    @staticmethod
+    def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+class TopicIndex:
+    """Similarity index over previously generated topics and curricula.
+
+    Each entry is one stored curriculum with the normalized topics (aliases)
+    that map to it. Candidate entries are found through LSH buckets over
+    MinHash signatures of the topic text, then verified with exact Jaccard.
+    When a newly generated curriculum is a near-duplicate of an existing one
+    (by content MinHash), its topic is added as an alias of that entry so
+    later lookups for either phrasing find it.
+    """
+
+    def __init__(self, path: str, threshold: Optional[float] = None):
+        self.path = path
+        if threshold is None:
+            threshold = float(os.getenv("GPTLEARNER_TOPIC_SIMILARITY", DEFAULT_THRESHOLD))
+        self.threshold = threshold
+        self.hasher = MinHasher()
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}  # curriculum_id -> entry
+        self._topic_buckets: Dict[tuple, Set[str]] = {}
+        self._content_buckets: Dict[tuple, Set[str]] = {}
+        self.api_calls_avoided = 0
+        self._load()
+
+    def find_similar(self, topic: str, expertise_level: str) -> Optional[Dict]:
+        """Return the closest stored curriculum at the same level, if similar enough."""
+        normalized = normalize_topic(topic)
+        query_shingles = char_shingles(normalized)
+        with self._lock:
+            candidates = self._candidates(self._topic_buckets, self.hasher.signature(query_shingles))
+            best = None
+            for cid in candidates:
+                entry = self._entries[cid]
+                if entry["expertise_level"] != expertise_level:
+                    continue
+                score = max(jaccard(query_shingles, char_shingles(alias)) for alias in entry["aliases"])
+                if score >= self.threshold and (best is None or score > best["score"]):
+                    best = {"curriculum_id": cid, "topic": entry["topic"], "score": score}
+        if best:
+            logger.debug(f"Topic '{topic}' matches '{best['topic']}' (score={best['score']:.2f})")
+        return best
+
+    def add(self, cid: str, topic: str, expertise_level: str, curriculum: str) -> str:
+        """Record a generated curriculum; returns the entry ID its topic was filed under."""
+        normalized = normalize_topic(topic)
+        content_sig = self.hasher.signature(word_shingles(curriculum))
+        with self._lock:
+            target = cid
+            if cid not in self._entries:
+                for other in self._candidates(self._content_buckets, content_sig):
+                    entry = self._entries[other]
+                    if (entry["expertise_level"] == expertise_level and
+                            MinHasher.similarity(entry["content_sig"], content_sig) >= CONTENT_THRESHOLD):
+                        logger.info(f"Curriculum for '{topic}' is a near-duplicate of '{entry['topic']}'")
+                        target = other
+                        break
+            if target == cid:
+                entry = self._entries.pop(cid, None) or {"aliases": []}
+                if "content_sig" in entry:
+                    self._unbucket(cid, entry)
+                entry.update({
+                    "topic": topic,
+                    "expertise_level": expertise_level,
+                    "content_sig": content_sig,
+                })
+                self._entries[cid] = entry
+            entry = self._entries[target]
+            if normalized not in entry["aliases"]:
+                entry["aliases"].append(normalized)
+            self._bucket(target, entry)
+            self._save()
+        return target
+
+    def record_reuse(self) -> int:
+        """Count a generation that was avoided by reusing a curriculum."""
+        with self._lock:
+            self.api_calls_avoided += 1
+            self._save()
+        logger.info(f"Reused existing curriculum; {self.api_calls_avoided} API calls avoided so far")
+        return self.api_calls_avoided
+
+    def _candidates(self, buckets: Dict[tuple, Set[str]], signature: List[int]) -> Set[str]:
+        found = set()
+        for key in self._band_keys(signature):
+            found |= buckets.get(key, set())
+        return found
+
+    def _band_keys(self, signature: List[int]) -> List[tuple]:
+        rows = len(signature) // BANDS
+        return [(band,) + tuple(signature[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+
+    def _bucket(self, cid: str, entry: Dict) -> None:
+        for alias in entry["aliases"]:
+            for key in self._band_keys(self.hasher.signature(char_shingles(alias))):
+                self._topic_buckets.setdefault(key, set()).add(cid)
+        for key in self._band_keys(entry["content_sig"]):
+            self._content_buckets.setdefault(key, set()).add(cid)
+
+    def _unbucket(self, cid: str, entry: Dict) -> None:
+        for buckets in (self._topic_buckets, self._content_buckets):
+            for members in buckets.values():
+                members.discard(cid)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load topic index: {str(e)}")
+            return
+        self.api_calls_avoided = data.get("api_calls_avoided", 0)
+        self._entries = data.get("entries", {})
+        for cid, entry in self._entries.items():
+            self._bucket(cid, entry)
+        logger.debug(f"Topic index loaded with {len(self._entries)} curricula")
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"api_calls_avoided": self.api_calls_avoided, "entries": self._entries}, f)
+        os.replace(tmp_path, self.path)
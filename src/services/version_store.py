@@ -0,0 +1,224 @@
+import os
+import json
+import difflib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from .curriculum import CurriculumDocument, apply_line_edit, line_edits
+
+logger = logging.getLogger(__name__)
+
+MAX_CHAIN = 50  # Deltas applied at most to check out a version; the next one is stored in full
+MAX_DELTA_SHARE = 0.5  # A delta larger than this share of the full text is not worth storing
+CACHED_TEXTS = 16  # Checked-out versions kept in memory
+RETITLE_SIMILARITY = 0.5  # A retitled node is still the same node when its titles are at least this similar
+
+
+def version_of(text: str) -> str:
+    """Content address of a curriculum version."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=10).hexdigest()
+
+
+def map_node_ids(old: str, new: str, edits: Optional[List[Dict]] = None) -> Dict[str, Optional[str]]:
+    """Where each node of curriculum old is in curriculum new: {old ID: new ID, or None if removed}.
+
+    The line edits from old to new (computed unless given) are replayed on
+    a CurriculumDocument, so identity follows the same rules as editing: a
+    node keeps its ID while its title is unchanged, and a replaced line at
+    the same level keeps its node. Unlike in the editor, a replaced line
+    only stays the same node if its title stays similar, so a regenerated
+    curriculum does not pass one section's progress on to another.
+    """
+    if edits is None:
+        edits = line_edits(old.split("\n"), new.split("\n"))
+    document = CurriculumDocument(old)
+    titles = {node.id: node.title for node, _ in document.curriculum().nodes()}
+    mapping = {node_id: node_id for node_id in titles}
+    for edit in edits:
+        changes = document.apply(edit)
+        removed = {node_id for node_id, _ in changes["removed"]}
+        renamed = changes["renamed"]
+        for source, current in mapping.items():
+            if current in removed:
+                mapping[source] = None
+            elif current in renamed:
+                mapping[source] = renamed[current]
+    tree = document.curriculum()
+    for source, target in mapping.items():
+        if (target is not None and target != source
+                and _similarity(titles[source], tree.node(target).title) < RETITLE_SIMILARITY):
+            mapping[source] = None
+    return mapping
+
+
+def _similarity(a: str, b: str) -> float:
+    """How alike two titles are: by characters, or by the share of the shorter one's words kept."""
+    a, b = a.lower(), b.lower()
+    words_a, words_b = set(a.split()), set(b.split())
+    overlap = len(words_a & words_b) / max(1, min(len(words_a), len(words_b)))
+    return max(overlap, difflib.SequenceMatcher(None, a, b).ratio())
+
+
+class VersionStore:
+    """Every version of every curriculum, addressed by content and stored as deltas.
+
+    A version's ID is the hash of its text, so storing a text again (e.g.
+    restoring an older version) adds no data. New versions are stored as
+    line edits against their parent; a version is stored in full when it
+    has no parent, shares little with it, or would make a chain of more
+    than MAX_CHAIN deltas, which bounds the cost of a checkout. Storage
+    thus grows with the size of the changes rather than the number of
+    versions.
+
+    Objects are appended to versions/pack.jsonl and each curriculum's
+    history (version, parent, time and note) to versions/refs.jsonl; only
+    an offset per object is kept in memory.
+    """
+
+    def __init__(self, directory: str):
+        self.pack_path = os.path.join(directory, "pack.jsonl")
+        self.refs_path = os.path.join(directory, "refs.jsonl")
+        self._lock = threading.RLock()
+        self._objects: Dict[str, Tuple[int, Optional[str], int]] = {}  # ID -> offset, base ID, chain length
+        self._history: Dict[str, List[Dict]] = {}  # Curriculum ID -> its versions, oldest first
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+        self._load()
+
+    def __contains__(self, version: str) -> bool:
+        return version in self._objects
+
+    def commit(self, cid: str, text: str, note: str = "", parent: Optional[str] = None) -> str:
+        """Record text as the latest version of a curriculum and return its ID.
+
+        parent defaults to the curriculum's current version; give it to
+        link a new curriculum to the one it was derived from.
+        """
+        version = version_of(text)
+        with self._lock:
+            head = self.head(cid)
+            if version == head:
+                return version
+            parent = parent or head
+            if version not in self._objects:
+                self._write_object(version, text, parent)
+            entry = {"curriculum_id": cid, "version": version, "parent": parent,
+                     "created": datetime.now().isoformat(timespec="seconds"), "note": note}
+            self._append(self.refs_path, entry)
+            self._history.setdefault(cid, []).append(entry)
+        logger.debug(f"Committed version {version} of {cid}" + (f" ({note})" if note else ""))
+        return version
+
+    def head(self, cid: str) -> Optional[str]:
+        """The curriculum's current version, if it has any."""
+        history = self._history.get(cid)
+        return history[-1]["version"] if history else None
+
+    def history(self, cid: str) -> List[Dict]:
+        """The curriculum's versions, newest first."""
+        with self._lock:
+            return [dict(entry) for entry in reversed(self._history.get(cid, []))]
+
+    def checkout(self, version: str) -> str:
+        """The text of a version; raises ValueError for an unknown one."""
+        with self._lock:
+            if version in self._texts:
+                self._texts.move_to_end(version)
+                return self._texts[version]
+            records = []
+            current = version
+            while current not in self._texts:
+                record = self._read(current)
+                records.append(record)
+                if "text" in record:
+                    break
+                current = record["base"]
+            lines = (records.pop() if "text" in records[-1] else {"text": self._texts[current]})["text"].split("\n")
+            for record in reversed(records):
+                for edit in record["edits"]:
+                    apply_line_edit(lines, edit)
+            text = "\n".join(lines)
+            self._remember(version, text)
+            return text
+
+    def diff(self, old: str, new: str) -> List[Dict]:
+        """Line edits (see curriculum.line_edits) that turn version old into version new.
+
+        When new is stored as a delta on old, the stored edits are returned
+        without comparing the texts.
+        """
+        with self._lock:
+            if new in self._objects and self._objects[new][1] == old:
+                return self._read(new)["edits"]
+            return line_edits(self.checkout(old).split("\n"), self.checkout(new).split("\n"))
+
+    def map_nodes(self, old: str, new: str) -> Dict[str, Optional[str]]:
+        """{node ID in version old: its ID in version new, or None if it was removed}."""
+        return map_node_ids(self.checkout(old), self.checkout(new), self.diff(old, new))
+
+    def _write_object(self, version: str, text: str, base: Optional[str]) -> None:
+        record = {"id": version, "text": text}
+        if base in self._objects and self._objects[base][2] < MAX_CHAIN:
+            edits = line_edits(self.checkout(base).split("\n"), text.split("\n"))
+            if len(json.dumps(edits, ensure_ascii=False)) < MAX_DELTA_SHARE * len(text):
+                record = {"id": version, "base": base, "edits": edits}
+        offset = self._append(self.pack_path, record)
+        chain = self._objects[base][2] + 1 if "base" in record else 0
+        self._objects[version] = (offset, record.get("base"), chain)
+        self._remember(version, text)
+
+    def _read(self, version: str) -> Dict:
+        if version not in self._objects:
+            raise ValueError(f"Curriculum version {version} not found")
+        with open(self.pack_path, "rb") as f:
+            f.seek(self._objects[version][0])
+            return json.loads(f.readline())
+
+    def _remember(self, version: str, text: str) -> None:
+        self._texts[version] = text
+        self._texts.move_to_end(version)
+        if len(self._texts) > CACHED_TEXTS:
+            self._texts.popitem(last=False)
+
+    def _append(self, path: str, record: Dict) -> int:
+        """Append a JSON line to a log and return its offset."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        return offset
+
+    def _load(self) -> None:
+        for offset, record in self._scan(self.pack_path):
+            base = record.get("base")
+            if base is not None and base not in self._objects:
+                logger.error(f"Skipping version {record.get('id')} whose base is missing")
+                continue
+            chain = self._objects[base][2] + 1 if base is not None else 0
+            self._objects[record["id"]] = (offset, base, chain)
+        for _, entry in self._scan(self.refs_path):
+            if entry.get("version") in self._objects:
+                self._history.setdefault(entry["curriculum_id"], []).append(entry)
+        logger.debug(f"Version store loaded with {len(self._objects)} versions of {len(self._history)} curricula")
+
+    @staticmethod
+    def _scan(path: str):
+        """Yield (offset, record) for each line of a log, cutting off a line left partial by a crash."""
+        if not os.path.exists(path):
+            return
+        offset = 0
+        with open(path, "rb+") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    logger.error(f"Dropping a partly written line at the end of {path}")
+                    f.truncate(offset)
+                    return
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.error(f"Skipping an unreadable line of {path}")
+                else:
+                    yield offset, record
+                offset += len(line)
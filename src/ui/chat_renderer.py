@@ -0,0 +1,142 @@
+import re
+import logging
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import markdown
+from PyQt5.QtGui import QTextDocument
+
+from .styles import COLORS
+
+logger = logging.getLogger(__name__)
+
+MARKDOWN_EXTENSIONS = ["fenced_code", "sane_lists"]
+MAX_CACHED_MESSAGES = 2000  # Rendered messages kept; the rest are re-rendered when scrolled back to
+
+FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+LIST_ITEM = re.compile(r" {0,3}([-*+]|\d+[.)])\s")
+
+DOCUMENT_STYLE = f"""
+    pre {{ background-color: {COLORS['background']}; }}
+    code {{ font-family: Menlo, Consolas, "DejaVu Sans Mono", monospace; color: {COLORS['accent_hover']}; }}
+    a {{ color: {COLORS['accent_hover']}; }}
+"""
+
+
+def render_block(block: str) -> str:
+    return markdown.markdown(block, extensions=MARKDOWN_EXTENSIONS)
+
+
+class IncrementalMarkdown:
+    """Markdown to HTML for a message that grows, e.g. while it streams in.
+
+    The text is split into top-level blocks (paragraphs, lists, fenced code,
+    headings). A block is rendered once when the next one starts and its
+    HTML is frozen; only the trailing open block is rendered again as text
+    arrives, so a long answer costs about one render of its text overall.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._frozen = ""  # HTML of the completed blocks
+        self._start = 0  # Offset of the open block
+        self._scanned = 0  # Offset of the first line not yet scanned
+        self._fence = None  # Marker of the open fenced code block
+        self._has_content = False  # The open block has a non-blank line
+        self._is_list = False  # The open block starts with a list item
+        self._blank = False  # A blank line followed the open block's last line
+        self._tail = ""  # Text of the open block at its last render
+        self._tail_html = ""
+        self.html = ""
+
+    def feed(self, text: str) -> str:
+        """Render text, reusing frozen blocks when it extends the previous text."""
+        if not text.startswith(self.text):
+            self.__init__()
+        self.text = text
+        end = text.rfind("\n") + 1  # Only complete lines are split; the last one may still grow
+        while self._scanned < end:
+            line_end = text.index("\n", self._scanned) + 1
+            self._scan_line(self._scanned, text[self._scanned:line_end])
+            self._scanned = line_end
+
+        tail = text[self._start:]
+        if tail != self._tail:
+            self._tail = tail
+            self._tail_html = render_block(tail) if tail.strip() else ""
+            self.html = self._frozen + self._tail_html
+        return self.html
+
+    def _scan_line(self, offset: int, line: str):
+        stripped = line.strip()
+        if self._fence is not None:
+            if stripped.startswith(self._fence) and not stripped.strip(self._fence[0]):
+                self._freeze(offset + len(line))  # The code block is complete
+            return
+        if not stripped:
+            self._blank = self._has_content
+            return
+        fence = FENCE.match(line)
+        if self._has_content and (fence or self._blank):
+            # A blank line inside a list continues it when an item or indented text follows
+            continues = (not fence and self._is_list
+                         and (LIST_ITEM.match(line) is not None or line[0] in " \t"))
+            if not continues:
+                self._freeze(offset)
+        self._blank = False
+        if not self._has_content:
+            self._has_content = True
+            self._is_list = LIST_ITEM.match(line) is not None
+        if fence:
+            self._fence = fence.group(1)
+
+    def _freeze(self, offset: int):
+        """Render the open block up to offset once, and start a new block there."""
+        block = self.text[self._start:offset]
+        if block.strip():
+            self._frozen += render_block(block)
+        self._start = offset
+        self._fence = None
+        self._has_content = self._is_list = self._blank = False
+        self._tail = None
+
+
+class MessageRenderCache:
+    """Rendered chat messages, most recently used last.
+
+    Each entry keeps the message's incremental markdown and a QTextDocument
+    laid out at the last width it was drawn at, so painting and sizing a
+    message that has not changed does no markdown or HTML parsing.
+    """
+
+    def __init__(self, capacity: int = MAX_CACHED_MESSAGES):
+        self.capacity = capacity
+        self._entries: "OrderedDict[Hashable, dict]" = OrderedDict()
+
+    def document(self, key: Hashable, content: str, width: int) -> QTextDocument:
+        """The laid-out document for a message's current content."""
+        entry = self._entries.get(key)
+        if entry is None:
+            document = QTextDocument()
+            document.setDefaultStyleSheet(DOCUMENT_STYLE)
+            document.setDocumentMargin(0)
+            entry = {"markdown": IncrementalMarkdown(), "document": document, "html": None}
+            self._entries[key] = entry
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        html = entry["markdown"].feed(content)
+        document = entry["document"]
+        if html is not entry["html"]:
+            entry["html"] = html
+            document.setHtml(f"<div style='color: {COLORS['text']};'>{html}</div>")
+        if document.textWidth() != width:
+            document.setTextWidth(width)
+        return document
+
+    def adopt(self, old: Hashable, new: Optional[Hashable]):
+        """Move a message's rendering to a new key, e.g. a streamed answer once it is stored."""
+        entry = self._entries.pop(old, None)
+        if entry is not None and new is not None:
+            self._entries[new] = entry
@@ -0,0 +1,195 @@
+from PyQt5.QtWidgets import QShortcut
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtGui import QKeySequence
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_MS = 50
+DEFAULT_STALL_MS = 250
+DEFAULT_SAMPLE_MS = 5
+STALL_SHORTCUT = "Ctrl+Alt+Shift+W"
+PROFILE_SHORTCUT = "Ctrl+Alt+Shift+P"
+
+
+def collapse_stack(frame) -> str:
+    """Render a frame's stack as 'outer;...;inner' for folded flamegraph input."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StallWatchdog(QObject):
+    """Detects main-thread stalls by watching a Qt timer from a helper thread.
+
+    A timer on the GUI thread records a heartbeat every HEARTBEAT_MS. The
+    helper thread checks it and, when the event loop has not run for longer
+    than the threshold, logs the main thread's stack once per stall and
+    appends it to stalls.log. The heartbeat's own lateness is the
+    event-loop latency reported by stats().
+    """
+
+    def __init__(self, parent, directory: str, threshold_ms: int = DEFAULT_STALL_MS):
+        super().__init__(parent)
+        self.directory = directory
+        self.threshold = threshold_ms / 1000
+        self.main_thread_id = threading.main_thread().ident
+        self.stalls = 0
+        self.max_latency = 0.0
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._beat)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self.timer.start(HEARTBEAT_MS)
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Stall watchdog started (threshold={self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.timer.stop()
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        logger.info(f"Stall watchdog stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {"stalls": self.stalls, "max_latency_ms": int(self.max_latency * 1000)}
+
+    def _beat(self):
+        now = time.monotonic()
+        self.max_latency = max(self.max_latency, now - self._last_beat - HEARTBEAT_MS / 1000)
+        self._last_beat = now
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat  # One report per stall, however long it lasts
+            frame = sys._current_frames().get(self.main_thread_id)
+            if frame is None:
+                continue
+            self.stalls += 1
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(f"Main thread stalled for over {stalled * 1000:.0f}ms:\n{stack}")
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, "stalls.log"), "a", encoding="utf-8") as f:
+                f.write(f"{datetime.now().isoformat()} stalled over {stalled * 1000:.0f}ms\n{stack}\n")
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads and writes folded stacks.
+
+    The output (one 'thread;frame;...;frame count' line per distinct stack)
+    feeds flamegraph.pl, speedscope or similar tools directly. Nothing runs
+    unless the profiler is started.
+    """
+
+    def __init__(self, directory: str, interval_ms: int = DEFAULT_SAMPLE_MS):
+        self.directory = directory
+        self.interval = interval_ms / 1000
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.running:
+            return
+        self.samples.clear()
+        self._stop.clear()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler started ({self.interval * 1000:.0f}ms interval)")
+
+    def stop(self) -> str:
+        """Stop sampling and write the folded stacks; returns the output path."""
+        if not self.running:
+            return ""
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"profile-{datetime.now():%Y%m%d-%H%M%S}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        duration = time.monotonic() - self._started
+        logger.info(f"Wrote {sum(self.samples.values())} samples over {duration:.1f}s to {path}")
+        return path
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.samples[f"{names.get(thread_id, thread_id)};{collapse_stack(frame)}"] += 1
+
+
+class Diagnostics(QObject):
+    """Wires the stall watchdog and profiler to environment variables and hidden shortcuts.
+
+    GPTLEARNER_STALL_MS enables the watchdog with that threshold and
+    GPTLEARNER_PROFILE=1 profiles the whole run. Either can be toggled at
+    any time with STALL_SHORTCUT and PROFILE_SHORTCUT. Output goes to the
+    diagnostics data directory.
+    """
+
+    def __init__(self, window, directory: str):
+        super().__init__(window)
+        stall_ms = os.getenv("GPTLEARNER_STALL_MS")
+        self.watchdog = StallWatchdog(self, directory, int(stall_ms) if stall_ms else DEFAULT_STALL_MS)
+        self.profiler = SamplingProfiler(directory)
+        QShortcut(QKeySequence(STALL_SHORTCUT), window, self.toggle_watchdog)
+        QShortcut(QKeySequence(PROFILE_SHORTCUT), window, self.toggle_profiler)
+        if stall_ms:
+            self.watchdog.start()
+        if os.getenv("GPTLEARNER_PROFILE") == "1":
+            self.profiler.start()
+
+    def toggle_watchdog(self):
+        if self.watchdog.running:
+            self.watchdog.stop()
+        else:
+            self.watchdog.start()
+
+    def toggle_profiler(self):
+        if self.profiler.running:
+            self.profiler.stop()
+        else:
+            self.profiler.start()
+
+    def shutdown(self):
+        self.watchdog.stop()
+        self.profiler.stop()
@@ -0,0 +1,210 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+from typing import Any, Callable, Dict, Optional, Tuple
+import functools
+import itertools
+import logging
+import os
+from services.cancellation import CancelToken, RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class _JobSignals(QObject):
+    """Signals used by a pooled job to report back to the executor."""
+    finished = pyqtSignal(int, object)
+    error = pyqtSignal(int, str)
+    progress = pyqtSignal(int, object)
+
+
+class _Job(QRunnable):
+    """Runnable wrapping a single call submitted to the executor."""
+
+    def __init__(self, request_id: int, fn: Callable, args: tuple, kwargs: dict,
+                 cancel_token: CancelToken):
+        super().__init__()
+        self.setAutoDelete(False)  # The executor keeps the reference until dispatch
+        self.request_id = request_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancel_token = cancel_token
+        self.signals = _JobSignals()
+
+    def run(self):
+        try:
+            self.cancel_token.raise_if_cancelled()
+            logger.debug(f"Job {self.request_id} starting")
+            result = self.fn(*self.args, **self.kwargs)
+            self.signals.finished.emit(self.request_id, result)
+        except RequestCancelled:
+            logger.debug(f"Job {self.request_id} cancelled")
+            self.signals.error.emit(self.request_id, "Request was cancelled")
+        except Exception as e:
+            logger.error(f"Job {self.request_id} failed: {str(e)}")
+            self.signals.error.emit(self.request_id, str(e))
+
+
+class TaskExecutor(QObject):
+    """Bounded thread pool shared by all tabs for background AI work.
+
+    Every submitted job gets a request ID and belongs to an owner (usually a
+    tab) and a channel within that owner. Submitting a new job on the same
+    owner/channel supersedes the previous one, and releasing an owner drops
+    all of its outstanding results, so callbacks only ever see the reply to
+    the latest request of a live owner. Superseded and released jobs also have
+    their cancel token triggered; jobs submitted with cancellable=True receive
+    it as a cancel_token keyword so the API call itself can be aborted. Jobs
+    submitted with on_progress receive a progress keyword: a callable that
+    can be called from the pool thread, delivering each value to on_progress
+    on the GUI thread while the request is current.
+    """
+    utilization_changed = pyqtSignal(dict)
+
+    def __init__(self, parent=None, max_workers: Optional[int] = None):
+        super().__init__(parent)
+        if max_workers is None:
+            max_workers = int(os.getenv("GPTLEARNER_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, max_workers))
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, Dict[str, Any]] = {}
+        self._current: Dict[Tuple[int, str], int] = {}
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.cancelled = 0
+        logger.debug(f"TaskExecutor initialized with max_workers={self.pool.maxThreadCount()}")
+
+    def submit(self, owner, fn: Callable, *args,
+               on_result: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[str], None]] = None,
+               on_progress: Optional[Callable[[Any], None]] = None,
+               channel: str = "default", cancellable: bool = False, **kwargs) -> int:
+        """Queue fn(*args, **kwargs) on the pool and return its request ID."""
+        request_id = next(self._ids)
+        cancel_token = CancelToken()
+        if cancellable:
+            kwargs["cancel_token"] = cancel_token
+        key = (id(owner), channel)
+
+        previous = self._current.get(key)
+        if previous is not None:
+            logger.debug(f"Request {request_id} supersedes request {previous} on channel '{channel}'")
+            self._discard(previous)
+
+        job = _Job(request_id, fn, args, kwargs, cancel_token)
+        job.signals.finished.connect(self._handle_finished)
+        job.signals.error.connect(self._handle_error)
+        if on_progress is not None:
+            job.signals.progress.connect(self._handle_progress)
+            kwargs["progress"] = functools.partial(job.signals.progress.emit, request_id)
+        self._jobs[request_id] = {
+            "job": job,
+            "key": key,
+            "on_result": on_result,
+            "on_error": on_error,
+            "on_progress": on_progress,
+        }
+        self._current[key] = request_id
+        self.submitted += 1
+        self.pool.start(job)
+        self._report()
+        return request_id
+
+    def is_current(self, request_id: int) -> bool:
+        """Return True if the request's result would still be delivered."""
+        record = self._jobs.get(request_id)
+        return record is not None and self._current.get(record["key"]) == request_id
+
+    def cancel(self, owner, channel: str = "default") -> None:
+        """Drop and cancel an owner's outstanding request on one channel, if any."""
+        request_id = self._current.get((id(owner), channel))
+        if request_id is not None:
+            self._discard(request_id)
+            self._report()
+
+    def release(self, owner) -> None:
+        """Drop every outstanding result for an owner that is going away."""
+        owner_id = id(owner)
+        for key in [key for key in self._current if key[0] == owner_id]:
+            self._discard(self._current.pop(key))
+        self._report()
+
+    def shutdown(self) -> None:
+        """Drop all outstanding results and remove queued jobs from the pool."""
+        for request_id in list(self._current.values()):
+            self._discard(request_id)
+        self._current.clear()
+        self._report()
+
+    def stats(self) -> Dict[str, int]:
+        """Return a snapshot of pool utilisation and job counters."""
+        return {
+            "active": self.pool.activeThreadCount(),
+            "max_workers": self.pool.maxThreadCount(),
+            "pending": len(self._jobs),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "cancelled": self.cancelled,
+        }
+
+    def _discard(self, request_id: int) -> None:
+        """Mark a request stale and cancel it, dequeuing it if it has not started."""
+        record = self._jobs.get(request_id)
+        if record is None:
+            return
+        if self._current.get(record["key"]) == request_id:
+            del self._current[record["key"]]
+        job = record["job"]
+        if not job.cancel_token.cancelled:
+            job.cancel_token.cancel()
+            self.cancelled += 1
+        if self.pool.tryTake(job):
+            # Never started, so no signal will ever arrive for it
+            logger.debug(f"Request {request_id} removed from queue before starting")
+            del self._jobs[request_id]
+            self.dropped += 1
+
+    def _take(self, request_id: int) -> Optional[Dict[str, Any]]:
+        """Pop a finished job, returning its record only if it is still current."""
+        record = self._jobs.pop(request_id, None)
+        if record is None:
+            return None
+        self.completed += 1
+        if self._current.get(record["key"]) != request_id:
+            logger.debug(f"Dropping stale result for request {request_id}")
+            self.dropped += 1
+            return None
+        del self._current[record["key"]]
+        return record
+
+    @pyqtSlot(int, object)
+    def _handle_finished(self, request_id: int, result):
+        record = self._take(request_id)
+        self._report()
+        if record is not None and record["on_result"] is not None:
+            record["on_result"](result)
+
+    @pyqtSlot(int, object)
+    def _handle_progress(self, request_id: int, value):
+        if self.is_current(request_id):
+            self._jobs[request_id]["on_progress"](value)
+
+    @pyqtSlot(int, str)
+    def _handle_error(self, request_id: int, error: str):
+        record = self._take(request_id)
+        self._report()
+        if record is not None and record["on_error"] is not None:
+            record["on_error"](error)
+
+    def _report(self) -> None:
+        stats = self.stats()
+        logger.debug(
+            f"Pool utilisation: {stats['active']}/{stats['max_workers']} active, "
+            f"{stats['pending']} pending, {stats['dropped']} dropped, "
+            f"{stats['cancelled']} cancelled"
+        )
+        self.utilization_changed.emit(stats)
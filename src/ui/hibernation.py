@@ -0,0 +1,119 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
+from PyQt5.QtCore import QObject, QTimer, Qt
+import logging
+import os
+import time
+from .tabs.learning_session_tab import LearningSessionTab
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_MINUTES = 20
+DEFAULT_MEMORY_BUDGET_MB = 256
+CHECK_INTERVAL_MS = 60 * 1000
+
+
+class HibernatedSessionTab(QWidget):
+    """Lightweight placeholder kept in the tab bar for a hibernated session."""
+
+    def __init__(self, parent=None, session_id="", topic="", expertise_level=""):
+        super().__init__(parent)
+        self.session_id = session_id
+        self.topic = topic
+        self.expertise_level = expertise_level
+        layout = QVBoxLayout()
+        label = QLabel("Restoring session...")
+        label.setAlignment(Qt.AlignCenter)
+        label.setProperty("role", "muted")
+        label.setObjectName("restoringLabel")
+        layout.addWidget(label)
+        self.setLayout(layout)
+
+
+class SessionHibernator(QObject):
+    """Serializes idle learning sessions to disk and restores them on demand.
+
+    Sessions idle for longer than the idle threshold are hibernated, and when
+    the estimated memory of all live sessions exceeds the budget the least
+    recently used ones go first. The active tab and sessions with a request
+    in flight are never hibernated.
+    """
+
+    def __init__(self, window, store, idle_minutes=None, memory_budget_mb=None):
+        super().__init__(window)
+        self.window = window
+        self.store = store
+        if idle_minutes is None:
+            idle_minutes = float(os.getenv("GPTLEARNER_IDLE_MINUTES", DEFAULT_IDLE_MINUTES))
+        if memory_budget_mb is None:
+            memory_budget_mb = float(os.getenv("GPTLEARNER_SESSION_MEMORY_MB", DEFAULT_MEMORY_BUDGET_MB))
+        self.idle_seconds = idle_minutes * 60
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.swapping = False  # True while tabs are being replaced
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.check)
+        self.timer.start(CHECK_INTERVAL_MS)
+        logger.debug(f"SessionHibernator idle={idle_minutes}min, budget={memory_budget_mb}MB")
+
+    def check(self):
+        """Hibernate sessions that are idle or over the memory budget."""
+        current = self.window.currentWidget()
+        candidates = [
+            tab for tab in self.window.learning_sessions.values()
+            if isinstance(tab, LearningSessionTab) and tab is not current and not tab.is_busy()
+        ]
+        now = time.monotonic()
+        for tab in [tab for tab in candidates if now - tab.last_active > self.idle_seconds]:
+            logger.info(f"Hibernating idle session '{tab.topic}'")
+            self.hibernate(tab)
+            candidates.remove(tab)
+
+        live = [tab for tab in self.window.learning_sessions.values() if isinstance(tab, LearningSessionTab)]
+        total = sum(tab.estimated_memory() for tab in live)
+        candidates.sort(key=lambda tab: tab.last_active)
+        while total > self.memory_budget and candidates:
+            tab = candidates.pop(0)
+            total -= tab.estimated_memory()
+            logger.info(f"Hibernating session '{tab.topic}' to stay within memory budget")
+            self.hibernate(tab)
+
+    def hibernate(self, tab: LearningSessionTab) -> HibernatedSessionTab:
+        """Save a session to disk and replace its widgets with a placeholder."""
+        self.store.save_session(tab.export_state())
+        placeholder = HibernatedSessionTab(self.window, tab.session_id, tab.topic, tab.expertise_level)
+        self._replace(tab, placeholder)
+        self.window.executor.release(tab)
+        tab.deleteLater()
+        return placeholder
+
+    def restore(self, placeholder: HibernatedSessionTab) -> LearningSessionTab:
+        """Rebuild a hibernated session in place of its placeholder."""
+        logger.info(f"Restoring hibernated session '{placeholder.topic}'")
+        state = self.store.load_session(placeholder.session_id)
+        tab = LearningSessionTab.from_state(self.window, state)
+        self._replace(placeholder, tab)
+        self.window.setCurrentWidget(tab)
+        placeholder.deleteLater()
+        return tab
+
+    def save_all(self):
+        """Persist every live session, e.g. before the application exits."""
+        for tab in self.window.learning_sessions.values():
+            if isinstance(tab, LearningSessionTab):
+                self.store.save_session(tab.export_state())
+
+    def _replace(self, old: QWidget, new: QWidget):
+        """Swap a widget for another at the same tab index and title."""
+        index = self.window.indexOf(old)
+        title = self.window.tabText(index)
+        self.swapping = True
+        try:
+            was_current = self.window.currentIndex() == index
+            self.window.removeTab(index)
+            self.window.insertTab(index, new, title)
+            if was_current:
+                self.window.setCurrentIndex(index)
+        finally:
+            self.swapping = False
+        for key, tab in list(self.window.learning_sessions.items()):
+            if tab is old:
+                self.window.learning_sessions[key] = new
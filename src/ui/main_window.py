@@ -1,9 +1,25 @@
-from PyQt5.QtWidgets import (QTabWidget, QWidget)
+from PyQt5.QtWidgets import (QTabWidget, QTabBar, QWidget)
+import os
+from typing import List, Optional
+from services.ai_service import AIService
+from services.remote_ai_service import RemoteAIService
+from services.session_store import SessionStore
+from services.search_index import SearchIndex
+from services.topic_similarity import TopicIndex
+from services.answer_cache import AnswerCache
+from services.quiz import QuizService
+from services.review_scheduler import ReviewScheduler
+from services.link_checker import LinkChecker
+from services.version_store import VersionStore
 from .tabs.curriculum_tab import CurriculumTab
 from .tabs.learning_session_tab import LearningSessionTab
 from .tabs.history_tab import HistoryTab
 from .tabs.curriculum_review_tab import CurriculumReviewTab
-from .styles import apply_styles
+from .tabs.review_tab import ReviewTab
+from .styles import apply_theme
+from .executor import TaskExecutor
+from .hibernation import SessionHibernator, HibernatedSessionTab
+from .diagnostics import Diagnostics
 
 
 class MainWindow(QTabWidget):
@@ -12,54 +28,178 @@ class MainWindow(QTabWidget):
         self.setWindowTitle("Agentic Learning Assistant")
         self.learning_sessions = {}  # Keep track of active learning sessions
         self.review_tabs = {}  # Keep track of review tabs
+        # Shared by all tabs; a local AI server can stand in for the direct client
+        server_url = os.getenv("GPTLEARNER_SERVER_URL")
+        self.ai_service = RemoteAIService(server_url) if server_url else AIService()
+        self.executor = TaskExecutor(self)  # Shared pool for background AI work
+        self.session_store = SessionStore()
+        self.diagnostics = Diagnostics(self, self.session_store.path("diagnostics"))
+        self.hibernator = SessionHibernator(self, self.session_store)
+        self.search_index = SearchIndex(os.path.join(self.session_store.path("search"), "index.jsonl"))
+        self.executor.submit(self, self.search_index.load, channel="search-index")
+        self.topic_index = TopicIndex(os.path.join(self.session_store.path("topics"), "index.json"))
+        self.answer_cache = AnswerCache(self.session_store.path("answers"))
+        self.quiz_service = QuizService(self.ai_service, self.session_store.path("quizzes"))
+        self.review_scheduler = ReviewScheduler(os.path.join(self.session_store.path("reviews"), "schedule.jsonl"))
+        self.link_checker = LinkChecker(os.path.join(self.session_store.path("links"), "cache.json"))
+        self.version_store = VersionStore(self.session_store.path("versions"))
+        apply_theme()  # Styles live on the application, so new tabs need no stylesheet of their own
         self.init_ui()
-        apply_styles(self)
         self.resize(1200, 900)
 
     def init_ui(self):
         # Initialize permanent tabs
         self.curriculum_tab = CurriculumTab(self)
         self.history_tab = HistoryTab(self)
+        self.review_tab = ReviewTab(self)
 
         # Add permanent tabs
         self.addTab(self.curriculum_tab, "New Curriculum")
         self.addTab(self.history_tab, "History")
+        self.addTab(self.review_tab, "Due for Review")
+        self.review_tab.refresh()  # Show the due count in the tab title
 
-    def create_curriculum_review(self, topic: str, expertise_level: str, curriculum: str) -> None:
-        """Create a new curriculum review tab."""
+        # Session and review tabs can be closed; the permanent tabs cannot
+        self.setTabsClosable(True)
+        for index in range(self.count()):
+            self.tabBar().setTabButton(index, QTabBar.RightSide, None)
+            self.tabBar().setTabButton(index, QTabBar.LeftSide, None)
+        self.tabCloseRequested.connect(self.close_tab)
+        self.currentChanged.connect(self._handle_current_changed)
+
+    def store_curriculum(self, topic: str, expertise_level: str, curriculum: str,
+                         changed_sections: Optional[List[str]] = None, note: str = "",
+                         parent: Optional[str] = None) -> str:
+        """Persist a generated curriculum and add it to the topic index.
+
+        For a revision, changed_sections lists the quiz sections it touched
+        (see curriculum.changed_quiz_sections); questions for the other
+        sections are kept. The
+        curriculum is also committed to the version store with note,
+        derived from the version parent if given (else the previous
+        version). Safe to call from pool threads; returns the curriculum ID.
+        """
+        cid = self.session_store.save_curriculum(topic, expertise_level, curriculum)
+        self.version_store.commit(cid, curriculum, note, parent)
+        self.topic_index.add(cid, topic, expertise_level, curriculum)
+        # Cached answers and questions were written against the previous version
+        self.answer_cache.invalidate(cid)
+        self.quiz_service.invalidate(cid, changed_sections)
+        return cid
+
+    def create_curriculum_review(self, topic: str, expertise_level: str, curriculum: str,
+                                 activate: bool = True) -> None:
+        """Create a new curriculum review tab, switching to it unless activate is False."""
         # If a review tab already exists for this topic, remove it
-        if topic in self.review_tabs:
-            review_tab = self.review_tabs[topic]
-            index = self.indexOf(review_tab)
-            self.removeTab(index)
-            review_tab.deleteLater()
-            del self.review_tabs[topic]
+        self._remove_review_tab(topic)
 
         # Create and add the new review tab
         review_tab = CurriculumReviewTab(self, topic, expertise_level)
         self.review_tabs[topic] = review_tab
         index = self.addTab(review_tab, f"Review: {topic}")
-        self.setCurrentIndex(index)
-        
+        if activate:
+            self.setCurrentIndex(index)
+
         # Set the curriculum content
         review_tab.set_curriculum_content(curriculum)
 
     def create_learning_session(self, topic, expertise_level, curriculum):
-        """Create a new learning session tab."""
+        """Create a new learning session tab and return it."""
         if topic in self.learning_sessions:
-            # Switch to existing session
+            # Switch to existing session; hibernated ones restore on activation
             self.setCurrentWidget(self.learning_sessions[topic])
-            return
+            return self.learning_sessions[topic]
 
         # Remove the review tab if it exists
-        if topic in self.review_tabs:
-            review_tab = self.review_tabs[topic]
-            index = self.indexOf(review_tab)
-            self.removeTab(index)
-            review_tab.deleteLater()
-            del self.review_tabs[topic]
+        self._remove_review_tab(topic)
 
         session_tab = LearningSessionTab(self, topic, expertise_level, curriculum)
+        previous = self._previous_session(topic)
+        if previous is not None:
+            session_tab.carry_progress(previous)
         self.learning_sessions[topic] = session_tab
         index = self.addTab(session_tab, f"Learning: {topic}")
         self.setCurrentIndex(index)
+        return session_tab
+
+    def _previous_session(self, topic: str) -> Optional[dict]:
+        """The latest stored session on a topic that is not open, if any."""
+        for summary in self.session_store.list_sessions():
+            if summary["topic"] == topic and self.find_session(summary["session_id"]) is None:
+                try:
+                    return self.session_store.load_session(summary["session_id"])
+                except (OSError, ValueError):
+                    return None
+        return None
+
+    def open_session(self, session_id: str):
+        """Open a stored learning session, switching to it if already open."""
+        tab = self.find_session(session_id)
+        if tab is not None:
+            # Hibernated sessions restore as they become current
+            self.setCurrentWidget(tab)
+            return self.find_session(session_id)
+        if not self.session_store.has_session(session_id):
+            return None
+
+        state = self.session_store.load_session(session_id)
+        key = state["topic"] if state["topic"] not in self.learning_sessions else session_id
+        session_tab = LearningSessionTab.from_state(self, state)
+        self.learning_sessions[key] = session_tab
+        index = self.addTab(session_tab, f"Learning: {state['topic']}")
+        self.setCurrentIndex(index)
+        return session_tab
+
+    def find_session(self, session_id: str):
+        """Return the open (or hibernated) tab for a session, if any."""
+        for tab in self.learning_sessions.values():
+            if tab.session_id == session_id:
+                return tab
+        return None
+
+    def close_tab(self, index: int):
+        """Close a review or learning session tab, saving sessions to disk."""
+        widget = self.widget(index)
+        if widget in (self.curriculum_tab, self.history_tab, self.review_tab):
+            return
+        if isinstance(widget, CurriculumReviewTab):
+            self._remove_review_tab(widget.topic)
+            return
+        if isinstance(widget, LearningSessionTab):
+            state = widget.export_state()
+            self.session_store.save_session(state)
+            self.history_tab.add_session(state)
+        for key, tab in list(self.learning_sessions.items()):
+            if tab is widget:
+                del self.learning_sessions[key]
+        self.removeTab(index)
+        self.executor.release(widget)
+        widget.deleteLater()
+
+    def _remove_review_tab(self, topic: str):
+        """Remove and dispose of the review tab for a topic, if any."""
+        if topic not in self.review_tabs:
+            return
+        review_tab = self.review_tabs.pop(topic)
+        self.removeTab(self.indexOf(review_tab))
+        self.executor.release(review_tab)
+        review_tab.deleteLater()
+
+    def _handle_current_changed(self, index: int):
+        """Restore hibernated sessions and record activity on tab switches."""
+        if self.hibernator.swapping:
+            return
+        widget = self.widget(index)
+        if isinstance(widget, HibernatedSessionTab):
+            self.hibernator.restore(widget)
+        elif isinstance(widget, LearningSessionTab):
+            widget.touch()
+        elif widget is self.review_tab:
+            widget.refresh()
+
+    def closeEvent(self, event):
+        """Drop outstanding background work and persist sessions before closing."""
+        self.executor.shutdown()
+        self.hibernator.save_all()
+        self.diagnostics.shutdown()
+        super().closeEvent(event)
@@ -1,65 +1,367 @@
-def apply_styles(widget):
-    """Apply the application-wide styles to the widget."""
-    widget.setStyleSheet("""
-        QTabWidget {
-            background-color: #1e1e1e;
-        }
-        QTabWidget::pane {
-            border: none;
-            background-color: #1e1e1e;
-        }
-        QTabBar::tab {
-            background-color: #2b2b2b;
-            color: #808080;
-            padding: 8px 20px;
-            border: none;
-            min-width: 120px;
-        }
-        QTabBar::tab:selected {
-            background-color: #3d3d3d;
-            color: #ffffff;
-        }
-        QPushButton {
-            background-color: #0078d4;
-            color: white;
-            border: none;
-            border-radius: 5px;
-            padding: 8px 15px;
-            font-size: 13px;
-        }
-        QPushButton:hover {
-            background-color: #1984d8;
-        }
-        QPushButton:pressed {
-            background-color: #006cbd;
-        }
-        QLineEdit {
-            background-color: #2b2b2b;
-            color: #ffffff;
-            border: 1px solid #3d3d3d;
-            border-radius: 5px;
-            padding: 5px 10px;
-            font-size: 13px;
-        }
-        QLineEdit:focus {
-            border: 1px solid #0078d4;
-        }
-        QComboBox {
-            background-color: #2b2b2b;
-            color: #ffffff;
-            border: 1px solid #3d3d3d;
-            border-radius: 5px;
-            padding: 5px 10px;
-            font-size: 13px;
-        }
-        QComboBox::drop-down {
-            border: none;
-        }
-        QComboBox::down-arrow {
-            image: none;
-            border-left: 5px solid transparent;
-            border-right: 5px solid transparent;
-            border-top: 5px solid #ffffff;
-            margin-right: 10px;
-        }
-    """)
+from PyQt5.QtWidgets import QApplication, QWidget
+from PyQt5.QtGui import QPalette, QColor
+from string import Template
+
+# Every color the UI uses; widgets and delegates read these instead of hard-coding hex values
+COLORS = {
+    "background": "#1e1e1e",
+    "surface": "#2b2b2b",
+    "raised": "#3d3d3d",
+    "hover": "#2d2d2d",
+    "selection": "#2c4159",
+    "text": "#ffffff",
+    "secondary_text": "#cccccc",
+    "muted": "#808080",
+    "code": "#2d2d2d",
+    "accent": "#58a6ff",
+    "accent_hover": "#6cb0ff",
+    "accent_pressed": "#4a8cd9",
+    "primary": "#0078d4",
+    "primary_hover": "#1984d8",
+    "primary_pressed": "#006cbd",
+    "success": "#2ea043",
+    "success_hover": "#3fb950",
+    "error": "#f85149",
+}
+
+# Widgets opt into variants with an object name (one-off widgets) or a dynamic
+# property: role on labels and frames, variant on buttons and progress bars,
+# state on labels whose look changes at runtime (see set_variant).
+_STYLESHEET = Template("""
+    QTabWidget {
+        background-color: $background;
+    }
+    QTabWidget::pane {
+        border: none;
+        background-color: $background;
+    }
+    QTabBar::tab {
+        background-color: $surface;
+        color: $muted;
+        padding: 8px 20px;
+        border: none;
+        min-width: 120px;
+    }
+    QTabBar::tab:selected {
+        background-color: $raised;
+        color: $text;
+    }
+
+    QLabel[role="title"] {
+        font-size: 18px;
+        font-weight: bold;
+    }
+    QLabel[role="heading"] {
+        font-size: 14px;
+        font-weight: bold;
+    }
+    QLabel[role="field"] {
+        font-size: 14px;
+    }
+    QLabel[role="section"] {
+        color: $accent;
+        font-size: 13px;
+        font-weight: bold;
+    }
+    QLabel[role="muted"] {
+        color: $muted;
+        font-size: 12px;
+    }
+    QLabel[state="pending"] {
+        color: $muted;
+    }
+    QLabel[state="correct"] {
+        color: $success;
+    }
+    QLabel[state="incorrect"] {
+        color: $error;
+    }
+    QLabel#progressLabel {
+        color: $accent;
+        font-size: 14px;
+    }
+    QLabel#levelDescription {
+        font-style: italic;
+    }
+    QLabel#restoringLabel {
+        font-size: 14px;
+    }
+
+    QFrame[role="panel"] {
+        background-color: $surface;
+        border-radius: 10px;
+        padding: 15px;
+    }
+    QFrame#curriculumForm {
+        padding: 20px;
+    }
+    QFrame#levelPanel {
+        padding: 12px;
+    }
+    QFrame#chatInputBar {
+        padding: 10px;
+    }
+    QFrame#generationJob {
+        background-color: $background;
+        border-radius: 5px;
+        padding: 8px 12px;
+    }
+    QFrame#generationJob QPushButton {
+        padding: 4px 12px;
+    }
+
+    QPushButton {
+        background-color: $primary;
+        color: white;
+        border: none;
+        border-radius: 5px;
+        padding: 8px 15px;
+        font-size: 13px;
+    }
+    QPushButton:hover {
+        background-color: $primary_hover;
+    }
+    QPushButton:pressed {
+        background-color: $primary_pressed;
+    }
+    QPushButton[variant="success"] {
+        background-color: $success;
+    }
+    QPushButton[variant="success"]:hover {
+        background-color: $success_hover;
+    }
+    QPushButton#regenerateButton {
+        padding: 5px 15px;
+    }
+    QPushButton#sendButton {
+        background-color: $accent;
+        border-radius: 20px;
+        padding: 0 20px;
+        font-weight: bold;
+    }
+    QPushButton#sendButton:hover {
+        background-color: $accent_hover;
+    }
+    QPushButton#sendButton:pressed {
+        background-color: $accent_pressed;
+    }
+    QPushButton#sendButton:disabled {
+        background-color: $selection;
+        color: rgba(255, 255, 255, 0.5);
+    }
+
+    QLineEdit {
+        background-color: $surface;
+        color: $text;
+        border: 1px solid $raised;
+        border-radius: 5px;
+        padding: 5px 10px;
+        font-size: 13px;
+    }
+    QLineEdit:focus {
+        border: 1px solid $primary;
+    }
+    QLineEdit#chatInput {
+        background-color: $background;
+        border-radius: 20px;
+        padding: 0 15px;
+    }
+    QLineEdit#chatInput:focus {
+        border: 1px solid $accent;
+    }
+
+    QComboBox {
+        background-color: $surface;
+        color: $text;
+        border: 1px solid $raised;
+        border-radius: 5px;
+        padding: 5px 10px;
+        font-size: 13px;
+    }
+    QComboBox::drop-down {
+        border: none;
+    }
+    QComboBox::down-arrow {
+        image: none;
+        border-left: 5px solid transparent;
+        border-right: 5px solid transparent;
+        border-top: 5px solid $text;
+        margin-right: 10px;
+    }
+    QComboBox#levelCombo {
+        background-color: $background;
+        min-width: 120px;
+    }
+
+    QProgressBar {
+        border: 1px solid $raised;
+        border-radius: 5px;
+        text-align: center;
+        height: 4px;
+        background-color: $background;
+    }
+    QProgressBar::chunk {
+        background-color: $accent;
+    }
+    QProgressBar[variant="success"]::chunk {
+        background-color: $success;
+    }
+
+    QTextEdit#chatLog {
+        background-color: $surface;
+        color: $text;
+        border: 1px solid $raised;
+        border-radius: 5px;
+        padding: 10px;
+    }
+    QTextBrowser {
+        background-color: $background;
+        color: $text;
+        border: 1px solid $raised;
+        border-radius: 5px;
+        padding: 10px;
+    }
+    QPlainTextEdit#curriculumEditor {
+        background-color: $background;
+        color: $text;
+        border: 1px solid $raised;
+        border-radius: 5px;
+        padding: 10px;
+        font-family: Monaco, "Courier New", monospace;
+    }
+    QTextBrowser#sectionContent {
+        margin-top: 10px;
+    }
+
+    QListWidget#historyList, QListWidget#searchResults, QListWidget#reviewList {
+        background-color: $surface;
+        border: 1px solid $raised;
+        border-radius: 5px;
+        padding: 10px;
+        color: $text;
+    }
+    QListWidget#historyList::item, QListWidget#searchResults::item, QListWidget#reviewList::item {
+        padding: 10px;
+        border-bottom: 1px solid $raised;
+    }
+    QListWidget#historyList::item:selected, QListWidget#searchResults::item:selected,
+    QListWidget#reviewList::item:selected {
+        background-color: $raised;
+    }
+    QListWidget#chatDisplay {
+        background-color: $surface;
+        border: 1px solid $raised;
+        border-radius: 5px;
+        padding: 10px;
+    }
+    QListWidget#chatDisplay QScrollBar:vertical {
+        border: none;
+        background: $surface;
+        width: 10px;
+        margin: 0;
+    }
+    QListWidget#chatDisplay QScrollBar::handle:vertical {
+        background: $raised;
+        min-height: 20px;
+        border-radius: 5px;
+    }
+    QListWidget#chatDisplay QScrollBar::add-line:vertical,
+    QListWidget#chatDisplay QScrollBar::sub-line:vertical {
+        border: none;
+        background: none;
+    }
+
+    QTreeWidget#curriculumTree {
+        background-color: $background;
+        color: $text;
+        border: 1px solid $raised;
+        border-radius: 5px;
+        padding: 10px;
+    }
+    QTreeWidget#curriculumTree::item {
+        padding: 8px;
+        border-radius: 4px;
+    }
+    QTreeWidget#curriculumTree::item:hover {
+        background-color: $hover;
+    }
+    QTreeWidget#curriculumTree::item:selected {
+        background-color: $selection;
+        color: $text;
+    }
+    QTreeWidget#curriculumTree::branch {
+        background-color: transparent;
+    }
+    QTreeWidget#curriculumTree::branch:has-children:!has-siblings:closed,
+    QTreeWidget#curriculumTree::branch:closed:has-children:has-siblings,
+    QTreeWidget#curriculumTree::branch:open:has-children:!has-siblings,
+    QTreeWidget#curriculumTree::branch:open:has-children:has-siblings {
+        image: url(none);
+        border-image: none;
+        padding-top: 2px;
+    }
+    QTreeWidget#curriculumTree::branch:has-siblings {
+        border-left: 1px solid $raised;
+    }
+    QTreeWidget#curriculumTree::branch:!has-children:!has-siblings:adjoins-item {
+        border-image: none;
+    }
+
+    QDialog#quizDialog {
+        background-color: $background;
+    }
+    QLabel#quizScore {
+        color: $accent;
+        font-size: 12px;
+    }
+    QLabel#quizQuestion {
+        font-size: 15px;
+    }
+""")
+
+# Built once at import; Qt parses it once when it is set on the application
+STYLESHEET = _STYLESHEET.substitute(COLORS)
+
+
+def dark_palette() -> QPalette:
+    """Palette matching the stylesheet, for everything the stylesheet does not cover."""
+    palette = QPalette()
+    roles = {
+        QPalette.Window: "background",
+        QPalette.WindowText: "text",
+        QPalette.Base: "background",
+        QPalette.AlternateBase: "surface",
+        QPalette.Text: "text",
+        QPalette.Button: "surface",
+        QPalette.ButtonText: "text",
+        QPalette.ToolTipBase: "surface",
+        QPalette.ToolTipText: "text",
+        QPalette.PlaceholderText: "muted",
+        QPalette.Highlight: "selection",
+        QPalette.HighlightedText: "text",
+        QPalette.Link: "accent",
+    }
+    for role, name in roles.items():
+        palette.setColor(role, QColor(COLORS[name]))
+    palette.setColor(QPalette.Disabled, QPalette.Text, QColor(COLORS["muted"]))
+    palette.setColor(QPalette.Disabled, QPalette.ButtonText, QColor(COLORS["muted"]))
+    return palette
+
+
+def apply_theme(app: QApplication = None):
+    """Install the palette and stylesheet on the application, once."""
+    app = app or QApplication.instance()
+    if app.property("themed"):
+        return
+    app.setPalette(dark_palette())
+    app.setStyleSheet(STYLESHEET)
+    app.setProperty("themed", True)
+
+
+def set_variant(widget: QWidget, name: str, value):
+    """Change a styling property and re-polish just this widget."""
+    if widget.property(name) == value:
+        return
+    widget.setProperty(name, value)
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)
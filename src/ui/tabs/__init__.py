@@ -2,5 +2,6 @@ from .curriculum_tab import CurriculumTab
 from .chat_tab import ChatTab
 from .history_tab import HistoryTab
 from .curriculum_review_tab import CurriculumReviewTab
+from .review_tab import ReviewTab
 
-__all__ = ['CurriculumTab', 'ChatTab', 'HistoryTab', 'CurriculumReviewTab']
+__all__ = ['CurriculumTab', 'ChatTab', 'HistoryTab', 'CurriculumReviewTab', 'ReviewTab']
@@ -16,15 +16,7 @@ class ChatTab(QWidget):
         self.chat_display = QTextEdit()
         self.chat_display.setReadOnly(True)
         self.chat_display.setMinimumHeight(400)
-        self.chat_display.setStyleSheet("""
-            QTextEdit {
-                background-color: #2b2b2b;
-                color: #ffffff;
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                padding: 10px;
-            }
-        """)
+        self.chat_display.setObjectName("chatLog")
         chat_layout.addWidget(self.chat_display)
         
         chat_input_layout = QHBoxLayout()
@@ -1,19 +1,64 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
-                            QLabel, QPushButton, QTextBrowser, QFrame, QComboBox)
-from PyQt5.QtCore import Qt
+                            QLabel, QPushButton, QTextBrowser, QFrame, QComboBox,
+                            QPlainTextEdit, QSplitter, QStackedWidget, QMessageBox)
+from PyQt5.QtCore import Qt, QTimer
+from datetime import datetime
 import markdown
 import logging
-from .curriculum_worker import CurriculumWorker
+from services.curriculum import (CurriculumDocument, revise_curriculum, changed_quiz_sections,
+                                 generate_curriculum_in_parallel)
+from services.session_store import curriculum_id
+from services.version_store import version_of
+from services.budget import budget_scope, BudgetExceeded
+from .learning_session_tab import CurriculumTreeView
+from ..styles import COLORS
 
 logger = logging.getLogger(__name__)
 
+EDIT_DELAY_MS = 300  # Typing pause before an edit is applied to the outline
+
+# The rendered curriculum is a QTextDocument, which the application stylesheet does not reach
+CURRICULUM_STYLE = f"""
+    body {{
+        line-height: 1.6;
+        font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
+    }}
+    h1 {{
+        color: {COLORS['accent']};
+        font-size: 24px;
+        margin-top: 20px;
+        margin-bottom: 10px;
+        padding-bottom: 5px;
+        border-bottom: 1px solid {COLORS['raised']};
+    }}
+    h2 {{ color: {COLORS['accent']}; font-size: 20px; margin-top: 15px; margin-bottom: 8px; }}
+    h3 {{ color: {COLORS['accent']}; font-size: 16px; margin-top: 12px; margin-bottom: 6px; }}
+    p {{ margin: 8px 0; }}
+    ul, ol {{ margin: 8px 0 8px 25px; padding: 0; }}
+    li {{ margin: 4px 0; }}
+    li > ul, li > ol {{ margin: 4px 0 4px 20px; }}
+    code {{
+        background-color: {COLORS['code']};
+        padding: 2px 4px;
+        border-radius: 3px;
+        font-family: Monaco, "Courier New", monospace;
+    }}
+    pre {{ background-color: {COLORS['code']}; padding: 12px; border-radius: 5px; overflow-x: auto; }}
+    pre code {{ padding: 0; background-color: transparent; }}
+"""
+
 class CurriculumReviewTab(QWidget):
     def __init__(self, parent=None, topic="", expertise_level=""):
         super().__init__(parent)
         self.parent = parent
         self.topic = topic
         self.expertise_level = expertise_level
-        self.worker = None
+        self.request_id = None
+        self.curriculum = ""  # Markdown source of the displayed curriculum
+        self.document = None  # Parsed for editing on first use
+        self.pending_edits = []  # Line edits not yet saved
+        self.base_text = ""  # The text pending_edits apply to, as it was last stored
+        self.partial = False  # Showing a curriculum whose topics are still being written
         logger.debug(f"Initializing CurriculumReviewTab for topic='{topic}', level='{expertise_level}'")
         self.init_ui()
 
@@ -24,52 +69,49 @@ class CurriculumReviewTab(QWidget):
 
         # Header
         header = QLabel(f"Review Curriculum: {self.topic}")
-        header.setStyleSheet("color: #ffffff; font-size: 18px; font-weight: bold;")
+        header.setProperty("role", "title")
         layout.addWidget(header)
 
         # Curriculum content
         content_container = QFrame()
-        content_container.setStyleSheet("""
-            QFrame {
-                background-color: #2b2b2b;
-                border-radius: 10px;
-                padding: 15px;
-            }
-        """)
+        content_container.setProperty("role", "panel")
         content_layout = QVBoxLayout()
         
         self.curriculum_content = QTextBrowser()
-        self.curriculum_content.setStyleSheet("""
-            QTextBrowser {
-                background-color: #1e1e1e;
-                color: #ffffff;
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                padding: 10px;
-            }
-            QTextBrowser a {
-                color: #58a6ff;
-            }
-        """)
         self.curriculum_content.setOpenExternalLinks(True)
         self.curriculum_content.setPlaceholderText("Loading curriculum...")
         self.curriculum_content.setTextInteractionFlags(
             Qt.TextSelectableByMouse | Qt.LinksAccessibleByMouse
         )
-        content_layout.addWidget(self.curriculum_content)
+
+        # Edit mode: markdown source next to the outline it parses to
+        self.editor = QPlainTextEdit()
+        self.editor.setObjectName("curriculumEditor")
+        self.editor.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.editor.textChanged.connect(self._schedule_edit)
+        self.outline = CurriculumTreeView()
+        edit_view = QSplitter(Qt.Horizontal)
+        edit_view.addWidget(self.editor)
+        edit_view.addWidget(self.outline)
+        edit_view.setSizes([600, 300])
+
+        self.edit_timer = QTimer(self)
+        self.edit_timer.setSingleShot(True)
+        self.edit_timer.setInterval(EDIT_DELAY_MS)
+        self.edit_timer.timeout.connect(self._apply_edit)
+
+        self.content_stack = QStackedWidget()
+        self.content_stack.addWidget(self.curriculum_content)
+        self.content_stack.addWidget(edit_view)
+        content_layout.addWidget(self.content_stack)
         
         content_container.setLayout(content_layout)
         layout.addWidget(content_container)
 
         # Info section with expertise level
         info_container = QFrame()
-        info_container.setStyleSheet("""
-            QFrame {
-                background-color: #2b2b2b;
-                border-radius: 10px;
-                padding: 12px;
-            }
-        """)
+        info_container.setProperty("role", "panel")
+        info_container.setObjectName("levelPanel")
         info_layout = QHBoxLayout()
         info_layout.setSpacing(10)
         
@@ -78,44 +120,18 @@ class CurriculumReviewTab(QWidget):
         level_group.setSpacing(8)
         
         level_header = QLabel("Expertise Level:")
-        level_header.setStyleSheet("color: #58a6ff; font-size: 13px; font-weight: bold;")
+        level_header.setProperty("role", "section")
         level_group.addWidget(level_header)
         
         self.expertise_combo = QComboBox()
         self.expertise_combo.addItems(["Beginner", "Intermediate", "Advanced"])
         self.expertise_combo.setCurrentText(self.expertise_level)
-        self.expertise_combo.setStyleSheet("""
-            QComboBox {
-                background-color: #1e1e1e;
-                color: #ffffff;
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                padding: 5px 10px;
-                min-width: 120px;
-            }
-            QComboBox::drop-down {
-                border: none;
-            }
-            QComboBox::down-arrow {
-                image: none;
-                border-left: 5px solid transparent;
-                border-right: 5px solid transparent;
-                border-top: 5px solid #ffffff;
-                margin-right: 10px;
-            }
-        """)
+        self.expertise_combo.setObjectName("levelCombo")
         level_group.addWidget(self.expertise_combo)
         
         self.regenerate_button = QPushButton("Regenerate")
-        self.regenerate_button.setStyleSheet("""
-            QPushButton {
-                background-color: #2ea043;
-                padding: 5px 15px;
-            }
-            QPushButton:hover {
-                background-color: #3fb950;
-            }
-        """)
+        self.regenerate_button.setProperty("variant", "success")
+        self.regenerate_button.setObjectName("regenerateButton")
         self.regenerate_button.clicked.connect(self.regenerate_curriculum)
         level_group.addWidget(self.regenerate_button)
         
@@ -128,7 +144,8 @@ class CurriculumReviewTab(QWidget):
             "Advanced": "Designed for experienced learners ready for complex concepts and applications."
         }
         self.level_description = QLabel(level_descriptions[self.expertise_level])
-        self.level_description.setStyleSheet("color: #808080; font-size: 12px; font-style: italic;")
+        self.level_description.setProperty("role", "muted")
+        self.level_description.setObjectName("levelDescription")
         self.level_description.setWordWrap(True)
         info_layout.addWidget(self.level_description, 1)  # Give description more space
         
@@ -142,17 +159,22 @@ class CurriculumReviewTab(QWidget):
 
         # Bottom buttons
         button_layout = QHBoxLayout()
+        self.edit_button = QPushButton("Edit")
+        self.edit_button.setCheckable(True)
         self.modify_button = QPushButton("Save Changes")
+        self.modify_button.setEnabled(False)
         self.start_button = QPushButton("Start Learning")
-        self.start_button.setStyleSheet("""
-            QPushButton {
-                background-color: #2ea043;
-            }
-            QPushButton:hover {
-                background-color: #3fb950;
-            }
-        """)
+        self.start_button.setProperty("variant", "success")
+        self.save_status = QLabel()
+        self.save_status.setProperty("role", "muted")
+        self.version_combo = QComboBox()
+        self.version_combo.setObjectName("versionCombo")
+        self.version_combo.setToolTip("Earlier versions of this curriculum; choosing one restores it")
+        self.version_combo.hide()
         
+        button_layout.addWidget(self.save_status, 1)
+        button_layout.addWidget(self.version_combo)
+        button_layout.addWidget(self.edit_button)
         button_layout.addWidget(self.modify_button)
         button_layout.addWidget(self.start_button)
         layout.addLayout(button_layout)
@@ -161,10 +183,38 @@ class CurriculumReviewTab(QWidget):
 
         # Connect signals
         self.start_button.clicked.connect(self.start_learning)
+        self.edit_button.toggled.connect(self.set_editing)
         self.modify_button.clicked.connect(self.save_changes)
+        self.version_combo.activated.connect(self.restore_version)
 
     def set_curriculum_content(self, content):
+        """Show a new curriculum, replacing the one being edited."""
+        self.edit_timer.stop()
+        self.document = None
+        self.pending_edits = []
+        self.save_status.clear()
+        self.modify_button.setEnabled(False)
+        self._render(content)
+        if self.partial:
+            self.partial = False
+            self._set_buttons_enabled(True)
+        self._load_versions()
+        if self.edit_button.isChecked():
+            self.set_editing(True)
+
+    def show_partial(self, content: str, done: int, total: int):
+        """Show a curriculum still being generated, keeping the reader's place as topics fill in."""
+        self.partial = True
+        self._set_buttons_enabled(False)
+        scroll_bar = self.curriculum_content.verticalScrollBar()
+        position = scroll_bar.value()
+        self._render(content)
+        scroll_bar.setValue(position)
+        self.save_status.setText(f"Writing topics: {done} of {total} done")
+
+    def _render(self, content):
         """Update the curriculum content with markdown rendering."""
+        self.curriculum = content
         try:
             # Convert markdown to HTML with extensions
             html = markdown.markdown(
@@ -177,105 +227,139 @@ class CurriculumReviewTab(QWidget):
                 ]
             )
             
-            # Add comprehensive styling
-            styled_html = f"""
-            <style>
-                body {{
-                    line-height: 1.6;
-                    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
-                }}
-                h1 {{ 
-                    color: #58a6ff;
-                    font-size: 24px;
-                    margin-top: 20px;
-                    margin-bottom: 10px;
-                    padding-bottom: 5px;
-                    border-bottom: 1px solid #3d3d3d;
-                }}
-                h2 {{ 
-                    color: #58a6ff;
-                    font-size: 20px;
-                    margin-top: 15px;
-                    margin-bottom: 8px;
-                }}
-                h3 {{ 
-                    color: #58a6ff;
-                    font-size: 16px;
-                    margin-top: 12px;
-                    margin-bottom: 6px;
-                }}
-                p {{
-                    margin: 8px 0;
-                }}
-                ul, ol {{
-                    margin: 8px 0 8px 25px;
-                    padding: 0;
-                }}
-                li {{
-                    margin: 4px 0;
-                }}
-                li > ul, li > ol {{
-                    margin: 4px 0 4px 20px;
-                }}
-                code {{
-                    background-color: #2d2d2d;
-                    padding: 2px 4px;
-                    border-radius: 3px;
-                    font-family: Monaco, "Courier New", monospace;
-                }}
-                pre {{
-                    background-color: #2d2d2d;
-                    padding: 12px;
-                    border-radius: 5px;
-                    overflow-x: auto;
-                }}
-                pre code {{
-                    padding: 0;
-                    background-color: transparent;
-                }}
-            </style>
-            {html}
-            """
-            self.curriculum_content.setHtml(styled_html)
+            self.curriculum_content.setHtml(f"<style>{CURRICULUM_STYLE}</style>{html}")
         except Exception as e:
             self.curriculum_content.setHtml(
                 f"""
-                <div style='color: #ff6b6b; padding: 20px;'>
+                <div style='color: {COLORS['error']}; padding: 20px;'>
                     <h3>Error Displaying Curriculum</h3>
                     <p>There was an error processing the curriculum content: {str(e)}</p>
                 </div>
                 """
             )
 
+    def _load_versions(self):
+        """List the stored versions of this curriculum, newest first, selecting the one shown."""
+        history = self.parent.version_store.history(curriculum_id(self.topic, self.expertise_level))
+        shown = version_of(self.document.text() if self.document else self.curriculum)
+        self.version_combo.clear()
+        for entry in history:
+            created = datetime.fromisoformat(entry["created"]).strftime("%b %d %H:%M")
+            self.version_combo.addItem(f"{created} · {entry['note'] or 'Saved'}", entry["version"])
+            if entry["version"] == shown and self.version_combo.currentData() != shown:
+                self.version_combo.setCurrentIndex(self.version_combo.count() - 1)
+        self.version_combo.setVisible(len(history) > 1)
+
+    def restore_version(self, index: int):
+        """Make a stored version the current curriculum again."""
+        version = self.version_combo.itemData(index)
+        store = self.parent.version_store
+        current = store.head(curriculum_id(self.topic, self.expertise_level))
+        if version == current:
+            return
+        if self.pending_edits and QMessageBox.question(
+                self, "Discard Changes", "Restoring this version discards your unsaved changes. Continue?",
+                QMessageBox.Yes | QMessageBox.No) != QMessageBox.Yes:
+            self._load_versions()
+            return
+        try:
+            text = store.checkout(version)
+            current_text = store.checkout(current)
+            edits = store.diff(current, version)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not check out version {version}: {str(e)}")
+            self.save_status.setText(f"Could not restore this version: {str(e)}")
+            return
+        # Questions survive for the sections the restored version has unchanged
+        changed = changed_quiz_sections(current_text, text)
+        label = self.version_combo.itemText(index).split(" · ")[0]
+        self.parent.store_curriculum(self.topic, self.expertise_level, text, changed, note=f"Restored {label}")
+        self.set_curriculum_content(text)
+        self.save_status.setText(f"Restored the version of {label}: "
+                                 f"{sum(len(edit['lines']) for edit in edits)} lines added, "
+                                 f"{sum(edit['removed'] for edit in edits)} removed")
+        logger.info(f"Restored version {version} of '{self.topic}'")
+
+    def set_editing(self, editing: bool):
+        """Switch between the rendered curriculum and the markdown editor."""
+        if editing and self.document is None:
+            self.document = CurriculumDocument(self.curriculum)
+            self.base_text = self.document.text()
+            self.editor.blockSignals(True)
+            self.editor.setPlainText(self.document.text())
+            self.editor.blockSignals(False)
+            self.outline.load(self.document.curriculum())
+        elif not editing and self.document is not None:
+            self._apply_edit()
+            if self.document.text() != self.curriculum:
+                self._render(self.document.text())
+        self.content_stack.setCurrentIndex(1 if editing else 0)
+        self.edit_button.setChecked(editing)
+
+    def _schedule_edit(self):
+        self.edit_timer.start()  # Restarts on every keystroke
+
+    def _apply_edit(self):
+        """Bring the document and outline in line with the editor.
+
+        Only the changed lines are re-parsed, and only the outline items
+        whose place in the tree changed are touched.
+        """
+        self.edit_timer.stop()
+        if self.document is None:
+            return
+        update = self.document.update(self.editor.toPlainText())
+        if update is None:
+            return
+        edit, changes = update
+        self.outline.apply_changes(self.document.curriculum(), changes)
+        self.pending_edits.append(edit)
+        self.save_status.setText("Unsaved changes")
+        self.modify_button.setEnabled(True)
+
     def save_changes(self):
-        """Save modifications to the curriculum."""
+        """Save modifications to the curriculum as line edits against the stored copy."""
+        self._apply_edit()
+        if not self.pending_edits:
+            return
+        text = self.document.text()
+        if not text.strip():
+            self.save_status.setText("Curriculum content cannot be empty")
+            return
+        cid = curriculum_id(self.topic, self.expertise_level)
+        store = self.parent.session_store
         try:
-            content = self.curriculum_content.toPlainText()
-            if not content.strip():
-                raise ValueError("Curriculum content cannot be empty")
-                
-            print(f"Saving changes to curriculum for {self.topic}")
-            # TODO: Save changes to backend
-            
-            # Show success message
-            self.curriculum_content.setHtml(
-                f"""
-                <div style='color: #2ea043; padding: 20px;'>
-                    <p>Changes saved successfully!</p>
-                </div>
-                {self.curriculum_content.toHtml()}
-                """
-            )
-        except Exception as e:
-            self.curriculum_content.setHtml(
-                f"""
-                <div style='color: #ff6b6b; padding: 20px;'>
-                    <h3>Error Saving Changes</h3>
-                    <p>{str(e)}</p>
-                </div>
-                {self.curriculum_content.toHtml()}
-                """
-            )
+            if not store.has_curriculum(cid):
+                # Nothing stored yet to apply the edits to
+                self.parent.store_curriculum(self.topic, self.expertise_level, text, note="Edited")
+            else:
+                stored = store.load_curriculum(cid)["curriculum"]
+                if stored != self.base_text:
+                    # Stored again since editing began (e.g. regenerated elsewhere):
+                    # the edits no longer apply to it
+                    if QMessageBox.question(
+                            self, "Curriculum Changed",
+                            "This curriculum was saved elsewhere since you started editing. "
+                            "Save your version over it? The other version stays in the version history.",
+                            QMessageBox.Yes | QMessageBox.No) != QMessageBox.Yes:
+                        return
+                    self.parent.store_curriculum(self.topic, self.expertise_level, text,
+                                                 changed_quiz_sections(stored, text), note="Edited")
+                else:
+                    store.save_curriculum_edits(cid, self.pending_edits)
+                    self.parent.version_store.commit(cid, text, "Edited")
+                    self.parent.answer_cache.invalidate(cid)
+                    self.parent.quiz_service.invalidate(cid, changed_quiz_sections(stored, text))
+        except (OSError, ValueError) as e:
+            logger.error(f"Error saving curriculum edits: {str(e)}")
+            self.save_status.setText(f"Error saving changes: {str(e)}")
+            return
+        logger.info(f"Saved {len(self.pending_edits)} curriculum edits for '{self.topic}'")
+        self.pending_edits = []
+        self.base_text = text
+        self._load_versions()
+        self.save_status.setText("Changes saved")
+        self.modify_button.setEnabled(False)
 
     def start_learning(self):
         """Start the learning session with this curriculum."""
@@ -283,7 +367,7 @@ class CurriculumReviewTab(QWidget):
         self.parent.create_learning_session(
             self.topic, 
             self.expertise_level,
-            self.curriculum_content.toPlainText()
+            self.document.text() if self.document else self.curriculum or self.curriculum_content.toPlainText()
         )
 
     def regenerate_curriculum(self):
@@ -291,51 +375,85 @@ class CurriculumReviewTab(QWidget):
         new_level = self.expertise_combo.currentText()
         if new_level != self.expertise_level:
             logger.info(f"Regenerating curriculum for topic='{self.topic}' with new level='{new_level}'")
-            self.expertise_level = new_level
+            self.set_editing(False)  # Revise the curriculum as edited
+            old_level, self.expertise_level = self.expertise_level, new_level
             
-            # Clean up previous worker if it exists
-            self._cleanup_worker()
-            
-            # Create new worker
-            self.worker = CurriculumWorker(self.parent.curriculum_tab.ai_service, self.topic, new_level)
-            self.worker.finished.connect(self.handle_regenerated_curriculum)
-            self.worker.error.connect(self.handle_regeneration_error)
-            self.worker.start()
+            # Submit to the shared pool; this supersedes any earlier regeneration
+            self.request_id = self.parent.executor.submit(
+                self, self._regenerate_curriculum,
+                self.topic, old_level, new_level,
+                on_result=self.handle_regenerated_curriculum,
+                on_error=self.handle_regeneration_error,
+                channel="regenerate",
+                cancellable=True
+            )
             
             # Show loading state
             self.curriculum_content.setPlaceholderText("Regenerating curriculum...")
             self._set_buttons_enabled(False)
 
-    def _cleanup_worker(self):
-        """Clean up the worker thread safely."""
-        if self.worker is not None:
-            logger.debug("Cleaning up previous worker")
+    def _regenerate_curriculum(self, topic: str, old_level: str, new_level: str, cancel_token=None) -> str:
+        """Adapt the current curriculum to a new level (runs on the pool).
+
+        The curriculum is revised through an edit script, which costs far
+        fewer output tokens than a new curriculum; a full generation is the
+        fallback when there is nothing to revise or the edits are unusable.
+        """
+        if self.curriculum.strip():
             try:
-                self.worker.finished.disconnect()
-                self.worker.error.disconnect()
-                self.worker.deleteLater()
-            except Exception as e:
-                logger.error(f"Error cleaning up worker: {e}")
-            self.worker = None
+                with budget_scope(curriculum=curriculum_id(topic, new_level)):
+                    curriculum, _ = revise_curriculum(
+                        self.parent.ai_service, topic, old_level, self.curriculum,
+                        f"adapt it for {new_level} learners instead of {old_level} learners",
+                        cancel_token=cancel_token
+                    )
+                self.parent.store_curriculum(topic, new_level, curriculum, note=f"Adapted from {old_level}",
+                                             parent=version_of(self.curriculum))
+                return curriculum
+            except BudgetExceeded:
+                raise
+            except ValueError as e:
+                logger.warning(f"Revision failed, generating a new curriculum instead: {str(e)}")
+        return self._generate_curriculum(topic, new_level, cancel_token=cancel_token)
+
+    def _generate_curriculum(self, topic: str, expertise_level: str, cancel_token=None) -> str:
+        """Generate and store a curriculum (runs on the pool)."""
+        with budget_scope(curriculum=curriculum_id(topic, expertise_level)):
+            curriculum = generate_curriculum_in_parallel(
+                self.parent.ai_service, topic, expertise_level, cancel_token=cancel_token
+            )
+        self.parent.store_curriculum(topic, expertise_level, curriculum, note="Generated")
+        return curriculum
+
+    def _cleanup_worker(self):
+        """Drop any outstanding background request for this tab."""
+        if self.request_id is not None:
+            logger.debug(f"Releasing request {self.request_id}")
+            self.parent.executor.release(self)
+            self.request_id = None
 
     def _set_buttons_enabled(self, enabled: bool):
         """Enable or disable all buttons."""
         self.regenerate_button.setEnabled(enabled)
         self.start_button.setEnabled(enabled)
-        self.modify_button.setEnabled(enabled)
+        self.edit_button.setEnabled(enabled)
+        self.version_combo.setEnabled(enabled)
+        self.modify_button.setEnabled(enabled and bool(self.pending_edits))
 
     def handle_regenerated_curriculum(self, new_curriculum: str):
         """Handle the regenerated curriculum."""
         logger.debug("Received regenerated curriculum")
+        self.request_id = None
         self.set_curriculum_content(new_curriculum)
         self._set_buttons_enabled(True)
 
     def handle_regeneration_error(self, error: str):
         """Handle errors during curriculum regeneration."""
         logger.error(f"Error regenerating curriculum: {error}")
+        self.request_id = None
         self.curriculum_content.setHtml(
             f"""
-            <div style='color: #ff6b6b; padding: 20px;'>
+            <div style='color: {COLORS['error']}; padding: 20px;'>
                 <h3>Error Regenerating Curriculum</h3>
                 <p>{error}</p>
                 <p>Please try again or choose a different expertise level.</p>
@@ -1,18 +1,86 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
                             QLabel, QLineEdit, QPushButton, QComboBox, 
                             QFrame, QProgressBar, QMessageBox)
-from services.ai_service import AIService
-from .curriculum_worker import CurriculumWorker
+from collections import deque
+from typing import Optional
+from functools import partial
+import itertools
 import logging
+import os
+from services.budget import budget_scope
+from services.curriculum import generate_curriculum_in_parallel
+from services.session_store import curriculum_id
+from ..styles import set_variant
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_GENERATIONS = 3  # Concurrent curriculum generations; the rest of the pool stays free for chat
+
+
+class GenerationJobRow(QFrame):
+    """One curriculum generation in the queue panel: its status, progress and actions."""
+
+    def __init__(self, topic: str, expertise: str, parent=None):
+        super().__init__(parent)
+        self.setObjectName("generationJob")
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(10)
+
+        title = QLabel(f"{topic} ({expertise})")
+        title.setProperty("role", "field")
+        self.status_label = QLabel()
+        self.status_label.setProperty("role", "muted")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setProperty("variant", "success")
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setFixedWidth(160)
+        self.action_button = QPushButton()
+        self.remove_button = QPushButton()
+
+        layout.addWidget(title, 1)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.action_button)
+        layout.addWidget(self.remove_button)
+        self.setLayout(layout)
+
+    def show_state(self, state: str, detail: str = "", progress: Optional[int] = None):
+        """Show a job state: queued, running, done, failed or cancelled.
+
+        A running job without progress yet shows a busy indicator.
+        """
+        self.status_label.setText(detail or state.capitalize())
+        set_variant(self.status_label, "state", {"done": "correct", "failed": "incorrect"}.get(state))
+        if state == "running" and progress is None:
+            self.progress_bar.setRange(0, 0)
+        else:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(progress or 0)
+        self.progress_bar.setVisible(state in ("queued", "running"))
+        action = {"done": "Open", "failed": "Retry", "cancelled": "Retry"}.get(state)
+        self.action_button.setText(action or "")
+        self.action_button.setVisible(action is not None)
+        self.remove_button.setText("Cancel" if state in ("queued", "running") else "Remove")
+
+
 class CurriculumTab(QWidget):
+    """Form for new curricula, with a queue of generations that run concurrently.
+
+    Each submitted topic becomes a job; up to a limit (GPTLEARNER_MAX_GENERATIONS)
+    run at once on the shared pool, each on its own executor channel. A job
+    opens its review tab as soon as its outline arrives and fills in main
+    topics there as they are expanded.
+    """
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
-        self.ai_service = AIService()
-        self.worker = None  # Keep reference to worker
+        self.ai_service = parent.ai_service
+        self.max_generations = max(1, int(os.getenv("GPTLEARNER_MAX_GENERATIONS", DEFAULT_MAX_GENERATIONS)))
+        self.jobs = {}  # Job ID -> topic, expertise, state and row
+        self.queue = deque()  # IDs of jobs waiting for a free slot
+        self._job_ids = itertools.count(1)
         logger.debug("Initializing CurriculumTab")
         self.init_ui()
 
@@ -23,24 +91,19 @@ class CurriculumTab(QWidget):
         
         # Create a form-like container
         form_container = QFrame()
-        form_container.setStyleSheet("""
-            QFrame {
-                background-color: #2b2b2b;
-                border-radius: 10px;
-                padding: 20px;
-            }
-        """)
+        form_container.setProperty("role", "panel")
+        form_container.setObjectName("curriculumForm")
         form_layout = QVBoxLayout()
         form_layout.setSpacing(15)
         
         self.topic_label = QLabel("Enter topic for new curriculum:")
-        self.topic_label.setStyleSheet("color: #ffffff; font-size: 14px;")
+        self.topic_label.setProperty("role", "field")
         self.topic_input = QLineEdit()
         self.topic_input.setMinimumHeight(40)
         self.topic_input.setPlaceholderText("e.g., Python Programming, Machine Learning, Web Development...")
         
         self.expertise_label = QLabel("Select your expertise level:")
-        self.expertise_label.setStyleSheet("color: #ffffff; font-size: 14px;")
+        self.expertise_label.setProperty("role", "field")
         self.expertise_combo = QComboBox()
         self.expertise_combo.setMinimumHeight(40)
         self.expertise_combo.addItems(["Beginner", "Intermediate", "Advanced"])
@@ -52,27 +115,26 @@ class CurriculumTab(QWidget):
         form_layout.addWidget(self.topic_input)
         form_layout.addWidget(self.expertise_label)
         form_layout.addWidget(self.expertise_combo)
-        # Progress bar
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setStyleSheet("""
-            QProgressBar {
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                text-align: center;
-                height: 4px;
-            }
-            QProgressBar::chunk {
-                background-color: #2ea043;
-            }
-        """)
-        self.progress_bar.setTextVisible(False)
-        self.progress_bar.hide()
-        form_layout.addWidget(self.progress_bar)
-        
         form_layout.addWidget(self.start_curriculum_button)
         form_container.setLayout(form_layout)
         
         curriculum_layout.addWidget(form_container)
+
+        # Generation queue, shown once something is submitted
+        self.queue_panel = QFrame()
+        self.queue_panel.setProperty("role", "panel")
+        queue_layout = QVBoxLayout()
+        queue_layout.setSpacing(10)
+        self.queue_header = QLabel()
+        self.queue_header.setProperty("role", "section")
+        queue_layout.addWidget(self.queue_header)
+        self.job_layout = QVBoxLayout()
+        self.job_layout.setSpacing(8)
+        queue_layout.addLayout(self.job_layout)
+        self.queue_panel.setLayout(queue_layout)
+        self.queue_panel.hide()
+        curriculum_layout.addWidget(self.queue_panel)
+
         curriculum_layout.addStretch()
         self.setLayout(curriculum_layout)
 
@@ -80,86 +142,230 @@ class CurriculumTab(QWidget):
         self.start_curriculum_button.clicked.connect(self.handle_new_curriculum)
         self.topic_input.returnPressed.connect(self.handle_new_curriculum)  # Add Enter key support
 
-    def _enable_input(self, enabled: bool):
-        """Enable or disable input controls."""
-        self.topic_input.setEnabled(enabled)
-        self.expertise_combo.setEnabled(enabled)
-        self.start_curriculum_button.setEnabled(enabled)
+    def handle_new_curriculum(self):
+        """Queue a curriculum generation for the entered topic."""
+        topic = self.topic_input.text().strip()
+        expertise = self.expertise_combo.currentText()
+        
+        if not topic:
+            QMessageBox.warning(
+                self,
+                "Missing Topic",
+                "Please enter a topic for the curriculum.",
+                QMessageBox.Ok
+            )
+            return
 
-    def _show_error(self, error_message: str):
-        """Display an error in the UI."""
-        logger.error(f"Error in curriculum generation: {error_message}")
-        QMessageBox.critical(
+        if self._refuse_duplicate(topic):
+            return
+
+        # Offer an existing curriculum for a near-duplicate topic first
+        if self._reuse_similar_curriculum(topic, expertise):
+            return
+
+        job_id = next(self._job_ids)
+        row = GenerationJobRow(topic, expertise)
+        row.action_button.clicked.connect(partial(self._job_action, job_id))
+        row.remove_button.clicked.connect(partial(self._remove_job, job_id))
+        self.jobs[job_id] = {"topic": topic, "expertise": expertise, "state": "queued", "row": row}
+        self.job_layout.addWidget(row)
+        self.topic_input.clear()
+        logger.info(f"Queued curriculum generation for topic='{topic}', level='{expertise}'")
+        self._set_state(job_id, "queued")
+        self.queue.append(job_id)
+        self._start_next()
+
+    def _refuse_duplicate(self, topic: str, job_id: Optional[int] = None) -> bool:
+        """Refuse a topic that another job is generating, at any level; returns True if refused.
+
+        Review and learning tabs are keyed by topic, so two jobs on the same
+        topic would close each other's review tab.
+        """
+        active = self._active_job(topic, job_id)
+        if active is None:
+            return False
+        QMessageBox.information(
             self,
-            "Error Generating Curriculum",
-            f"An error occurred while generating the curriculum:\n\n{error_message}",
+            "Already Generating",
+            f"A {active['expertise']} curriculum for \"{topic}\" is already in the queue. "
+            "Wait for it to finish before generating another one for this topic.",
             QMessageBox.Ok
         )
-        self.progress_bar.hide()
-        self._enable_input(True)
+        return True
+
+    def _active_job(self, topic: str, job_id: Optional[int] = None) -> Optional[dict]:
+        """A queued or running job on topic other than job_id, if any."""
+        return next((job for other, job in self.jobs.items() if other != job_id and job["topic"] == topic
+                     and job["state"] in ("queued", "running")), None)
+
+    def _start_next(self):
+        """Start queued jobs while there are free generation slots."""
+        while self.queue and self._running() < self.max_generations:
+            job_id = self.queue.popleft()
+            job = self.jobs[job_id]
+            logger.info(f"Starting curriculum generation for topic='{job['topic']}', level='{job['expertise']}'")
+            self._set_state(job_id, "running", "Generating...")
+            self.parent.executor.submit(
+                self, self._generate_curriculum, job["topic"], job["expertise"],
+                on_result=partial(self._handle_curriculum_generated, job_id),
+                on_error=partial(self._show_error, job_id),
+                on_progress=partial(self._handle_progress, job_id),
+                channel=f"generate-{job_id}",
+                cancellable=True
+            )
+
+    def _running(self) -> int:
+        return sum(1 for job in self.jobs.values() if job["state"] == "running")
 
-    def _handle_curriculum_generated(self, curriculum: str):
-        """Handle the generated curriculum."""
+    def _set_state(self, job_id: int, state: str, detail: str = "", progress: Optional[int] = None):
+        self.jobs[job_id]["state"] = state
+        self.jobs[job_id]["row"].show_state(state, detail, progress)
+        self._update_header()
+
+    def _update_header(self):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job["state"]] = counts.get(job["state"], 0) + 1
+        parts = [f"{counts[state]} {state}" for state in ("running", "queued", "done", "failed") if counts.get(state)]
+        self.queue_header.setText("Generation queue" + (f": {', '.join(parts)}" if parts else ""))
+        self.queue_panel.setVisible(bool(self.jobs))
+
+    def _handle_progress(self, job_id: int, update: tuple):
+        """Show the curriculum so far in the job's review tab, opening it once the outline is in."""
+        job = self.jobs.get(job_id)
+        if job is None or job["state"] != "running":
+            return
+        curriculum, done, total = update
+        self._set_state(job_id, "running", f"Writing topics... {done} of {total}", 10 + 85 * done // total)
+        review_tab = self.parent.review_tabs.get(job["topic"])
+        if "review" not in job:
+            # Switch to it only when nothing else is generating
+            idle = not self.queue and self._running() == 1
+            self.parent.create_curriculum_review(job["topic"], job["expertise"], curriculum, activate=idle)
+            review_tab = job["review"] = self.parent.review_tabs[job["topic"]]
+        elif review_tab is not job["review"]:
+            return  # Closed or replaced meanwhile; the finished curriculum opens a new one
+        review_tab.show_partial(curriculum, done, total)
+
+    def _handle_curriculum_generated(self, job_id: int, curriculum: str):
+        """Open the review tab for a finished job."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        topic, expertise = job["topic"], job["expertise"]
         try:
-            topic = self.topic_input.text()
-            expertise = self.expertise_combo.currentText()
             logger.info(f"Curriculum generated successfully for topic='{topic}', level='{expertise}'")
+            self._set_state(job_id, "done", "Ready for review")
 
-            # Create review tab
-            self.parent.create_curriculum_review(topic, expertise, curriculum)
-            
-            # Add to history
+            review_tab = job.pop("review", None)
+            if review_tab is not None and self.parent.review_tabs.get(topic) is review_tab:
+                review_tab.set_curriculum_content(curriculum)
+            else:
+                # Switch to the review only when nothing else is still generating
+                idle = not self.queue and not self._running()
+                self.parent.create_curriculum_review(topic, expertise, curriculum, activate=idle)
             self.parent.history_tab.add_curriculum(topic, expertise)
-            
-            # Reset UI
-            self.topic_input.clear()
-            self.progress_bar.hide()
-            self._enable_input(True)
         except Exception as e:
             logger.error(f"Error handling generated curriculum: {str(e)}", exc_info=True)
-            self._show_error(f"Error setting up curriculum: {str(e)}")
+            self._show_error(job_id, f"Error setting up curriculum: {str(e)}")
+        self._start_next()
 
-    def handle_new_curriculum(self):
-        """Handle request for new curriculum generation."""
-        topic = self.topic_input.text().strip()
-        expertise = self.expertise_combo.currentText()
-        
-        if not topic:
-            QMessageBox.warning(
-                self,
-                "Missing Topic",
-                "Please enter a topic for the curriculum.",
-                QMessageBox.Ok
-            )
+    def _show_error(self, job_id: int, error_message: str):
+        """Show a failed generation in its row and move on to the next job."""
+        if job_id not in self.jobs:
             return
+        logger.error(f"Error in curriculum generation: {error_message}")
+        self._close_partial(job_id)
+        self._set_state(job_id, "failed", f"Failed: {error_message}")
+        self.jobs[job_id]["row"].status_label.setToolTip(error_message)
+        self._start_next()
 
-        logger.info(f"Starting curriculum generation for topic='{topic}', level='{expertise}'")
-        
-        # Clean up previous worker if it exists
-        if self.worker is not None:
-            self.worker.finished.disconnect()
-            self.worker.error.disconnect()
-            self.worker.deleteLater()
-
-        # Disable input and show progress
-        self._enable_input(False)
-        self.progress_bar.setRange(0, 0)
-        self.progress_bar.show()
-
-        # Generate curriculum in background
-        self.worker = CurriculumWorker(self.ai_service, topic, expertise)
-        self.worker.finished.connect(self._handle_curriculum_generated)
-        self.worker.error.connect(self._show_error)
-        self.worker.start()
+    def _job_action(self, job_id: int):
+        """Open a finished job's review tab, or retry a failed or cancelled one."""
+        job = self.jobs[job_id]
+        if job["state"] == "done":
+            review_tab = self.parent.review_tabs.get(job["topic"])
+            if review_tab is not None:
+                self.parent.setCurrentWidget(review_tab)
+            return
+        if self._refuse_duplicate(job["topic"], job_id):
+            return
+        self._set_state(job_id, "queued")
+        self.queue.append(job_id)
+        self._start_next()
+
+    def _remove_job(self, job_id: int):
+        """Cancel a queued or running job, or remove a finished one from the panel."""
+        job = self.jobs[job_id]
+        if job["state"] in ("queued", "running"):
+            if job_id in self.queue:
+                self.queue.remove(job_id)
+            self.parent.executor.cancel(self, f"generate-{job_id}")
+            self._close_partial(job_id)
+            logger.info(f"Cancelled curriculum generation for topic='{job['topic']}'")
+            self._set_state(job_id, "cancelled")
+            self._start_next()
+            return
+        del self.jobs[job_id]
+        job["row"].deleteLater()
+        self._update_header()
+
+    def _close_partial(self, job_id: int):
+        """Close the review tab showing a job's unfinished curriculum, if it is still open."""
+        review_tab = self.jobs[job_id].pop("review", None)
+        if review_tab is not None and self.parent.review_tabs.get(review_tab.topic) is review_tab:
+            self.parent.close_tab(self.parent.indexOf(review_tab))
+
+    def _generate_curriculum(self, topic: str, expertise: str, cancel_token=None, progress=None) -> str:
+        """Generate and store a curriculum (runs on the pool), reporting it as topics are expanded."""
+        with budget_scope(curriculum=curriculum_id(topic, expertise)):
+            curriculum = generate_curriculum_in_parallel(
+                self.ai_service, topic, expertise, cancel_token=cancel_token,
+                on_update=(lambda text, done, total: progress((text, done, total))) if progress else None
+            )
+        self.parent.store_curriculum(topic, expertise, curriculum, note="Generated")
+        return curriculum
+
+    def _reuse_similar_curriculum(self, topic: str, expertise: str) -> bool:
+        """Offer a stored curriculum for a similar topic; returns True if reused.
+
+        The curriculum opens under its own topic, and so its own curriculum
+        ID, sharing that curriculum's progress, quiz bank, cached answers
+        and version history rather than starting a copy.
+        """
+        match = self.parent.topic_index.find_similar(topic, expertise)
+        if match is None or self._active_job(match["topic"]) is not None:
+            return False
+        try:
+            curriculum = self.parent.session_store.load_curriculum(match["curriculum_id"])["curriculum"]
+        except ValueError as e:
+            logger.error(f"Similar curriculum could not be loaded: {str(e)}")
+            return False
+
+        answer = QMessageBox.question(
+            self,
+            "Similar Curriculum Found",
+            f"A {expertise} curriculum for \"{match['topic']}\" already exists "
+            f"({int(match['score'] * 100)}% similar).\n\n"
+            f"Continue with \"{match['topic']}\" instead of generating a new curriculum?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes
+        )
+        if answer != QMessageBox.Yes:
+            return False
+
+        self.parent.topic_index.record_reuse()
+        logger.info(f"Reusing curriculum {match['curriculum_id']} ('{match['topic']}') for topic='{topic}'")
+        self.parent.create_curriculum_review(match["topic"], expertise, curriculum)
+        self.parent.history_tab.add_curriculum(match["topic"], expertise)
+        self.topic_input.clear()
+        return True
 
     def closeEvent(self, event):
         """Handle cleanup when the tab is closed."""
-        if self.worker is not None:
-            logger.debug("Cleaning up worker in CurriculumTab closeEvent")
-            self.worker.finished.disconnect()
-            self.worker.error.disconnect()
-            self.worker.deleteLater()
-            self.worker = None
+        logger.debug("Releasing background requests in CurriculumTab closeEvent")
+        self.parent.executor.release(self)
+        self.queue.clear()
         super().closeEvent(event)
 
     def generate_placeholder_curriculum(self, topic, expertise):
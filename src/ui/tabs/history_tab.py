@@ -1,36 +1,180 @@
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QListWidget)
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
+                            QListWidgetItem, QPushButton, QFileDialog, QMessageBox,
+                            QLineEdit)
+from PyQt5.QtCore import Qt, QTimer
+from services.session_archive import export_sessions, import_archives
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DELAY_MS = 150  # Debounce between keystrokes and querying the index
 
 
 class HistoryTab(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
+        self.session_items = {}  # session_id -> list item
         self.init_ui()
+        self.load_sessions()
 
     def init_ui(self):
         history_layout = QVBoxLayout()
         history_layout.setContentsMargins(20, 20, 20, 20)
         history_layout.setSpacing(10)
+
+        # Search across curricula and chat messages
+        self.search_input = QLineEdit()
+        self.search_input.setMinimumHeight(40)
+        self.search_input.setPlaceholderText('Search sessions... (use "quotes" for phrases, prefix* for prefixes)')
+        self.search_input.setClearButtonEnabled(True)
+        history_layout.addWidget(self.search_input)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
+
         self.history_list = QListWidget()
-        self.history_list.setStyleSheet("""
-            QListWidget {
-                background-color: #2b2b2b;
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                padding: 10px;
-                color: #ffffff;
-            }
-            QListWidget::item {
-                padding: 10px;
-                border-bottom: 1px solid #3d3d3d;
-            }
-            QListWidget::item:selected {
-                background-color: #3d3d3d;
-            }
-        """)
+        self.history_list.setObjectName("historyList")
+        self.history_list.itemDoubleClicked.connect(self._handle_item_activated)
         history_layout.addWidget(self.history_list)
+
+        self.search_results = QListWidget()
+        self.search_results.setObjectName("searchResults")
+        self.search_results.setWordWrap(True)
+        self.search_results.itemActivated.connect(self._handle_result_activated)
+        self.search_results.itemClicked.connect(self._handle_result_activated)
+        self.search_results.hide()
+        history_layout.addWidget(self.search_results)
+
+        button_layout = QHBoxLayout()
+        self.export_button = QPushButton("Export Sessions...")
+        self.import_button = QPushButton("Import Archives...")
+        button_layout.addStretch()
+        button_layout.addWidget(self.export_button)
+        button_layout.addWidget(self.import_button)
+        history_layout.addLayout(button_layout)
         self.setLayout(history_layout)
 
+        self.export_button.clicked.connect(self.export_sessions)
+        self.import_button.clicked.connect(self.import_archives)
+
     def add_curriculum(self, topic, expertise):
         """Add a new curriculum to the history list."""
         self.history_list.addItem(f"📚 {topic} - {expertise} Level")
+
+    def add_session(self, summary: dict):
+        """Add a stored learning session to the history list."""
+        if summary["session_id"] in self.session_items:
+            return
+        item = QListWidgetItem(f"💬 {summary['topic']} - {summary['expertise_level']} Level")
+        item.setData(Qt.UserRole, summary["session_id"])
+        self.history_list.addItem(item)
+        self.session_items[summary["session_id"]] = item
+
+    def load_sessions(self):
+        """List the sessions saved in the session store."""
+        for summary in self.parent.session_store.list_sessions():
+            self.add_session(summary)
+
+    def _handle_item_activated(self, item: QListWidgetItem):
+        """Open the session behind a history entry."""
+        session_id = item.data(Qt.UserRole)
+        if session_id:
+            self.parent.open_session(session_id)
+
+    def run_search(self):
+        """Query the search index and show ranked results."""
+        query = self.search_input.text().strip()
+        self.search_results.clear()
+        if not query:
+            self.search_results.hide()
+            self.history_list.show()
+            return
+        hits = self.parent.search_index.search(query)
+        for hit in hits:
+            if hit["kind"] == "section":
+                label = f"📖 {hit['topic']} › {hit['ref']}"
+            else:
+                label = f"💬 {hit['topic']} › {hit['role']}"
+            item = QListWidgetItem(f"{label}\n{hit['preview']}")
+            item.setData(Qt.UserRole, hit)
+            self.search_results.addItem(item)
+        if self.search_results.count() == 0:
+            self.search_results.addItem("No matches")
+        if hits.truncated:
+            self.search_results.addItem("Only the most recent matches were ranked; "
+                                        "add a less common word to search everything")
+        self.history_list.hide()
+        self.search_results.show()
+
+    def _handle_result_activated(self, item: QListWidgetItem):
+        """Jump to the session and message or section behind a result."""
+        hit = item.data(Qt.UserRole)
+        if not hit:
+            return
+        tab = self.parent.open_session(hit["session_id"])
+        if tab is None:
+            QMessageBox.warning(self, "Session Not Found",
+                                "This session is no longer stored.", QMessageBox.Ok)
+            return
+        if hit["kind"] == "section":
+            tab.show_section(hit["ref"])
+        else:
+            tab.scroll_to_message(hit["ref"])
+
+    def export_sessions(self):
+        """Export all saved sessions to a single archive file."""
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Sessions", "sessions.gla", "Session Archives (*.gla)"
+        )
+        if not path:
+            return
+        self.parent.hibernator.save_all()  # Include the latest state of open sessions
+        self.export_button.setEnabled(False)
+        self.parent.executor.submit(
+            self, export_sessions, self.parent.session_store, path,
+            on_result=lambda count: self._handle_transfer_done(f"Exported {count} sessions."),
+            on_error=self._handle_transfer_error,
+            channel="export"
+        )
+
+    def import_archives(self):
+        """Import sessions from one or more archive files in parallel."""
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "Import Archives", "", "Session Archives (*.gla)"
+        )
+        if not paths:
+            return
+        self.import_button.setEnabled(False)
+        self.parent.executor.submit(
+            self, self._import_and_index, paths,
+            on_result=self._handle_imported,
+            on_error=self._handle_transfer_error,
+            channel="import"
+        )
+
+    def _import_and_index(self, paths: list) -> list:
+        """Import archives and index their conversations (runs on the pool)."""
+        store = self.parent.session_store
+        summaries = import_archives(store, paths)
+        for summary in summaries:
+            self.parent.search_index.index_session(store.load_session(summary["session_id"]))
+        return summaries
+
+    def _handle_imported(self, summaries: list):
+        for summary in summaries:
+            self.add_session(summary)
+        self._handle_transfer_done(f"Imported {len(summaries)} sessions.")
+
+    def _handle_transfer_done(self, message: str):
+        self.export_button.setEnabled(True)
+        self.import_button.setEnabled(True)
+        QMessageBox.information(self, "Session Archive", message, QMessageBox.Ok)
+
+    def _handle_transfer_error(self, error: str):
+        logger.error(f"Session archive error: {error}")
+        self.export_button.setEnabled(True)
+        self.import_button.setEnabled(True)
+        QMessageBox.critical(self, "Session Archive", f"An error occurred:\n\n{error}", QMessageBox.Ok)
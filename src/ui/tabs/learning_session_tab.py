@@ -2,13 +2,47 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
                             QLabel, QLineEdit, QPushButton, QTextBrowser,
                             QFrame, QSplitter, QProgressBar, QListWidget,
                             QStyledItemDelegate, QStyle, QListWidgetItem,
-                            QTreeWidget, QTreeWidgetItem)
-from PyQt5.QtCore import Qt, QSize, QRect, QPoint, QRectF
+                            QTreeWidget, QTreeWidgetItem, QMessageBox, QMenu,
+                            QInputDialog)
+from PyQt5.QtCore import Qt, QSize, QRect, QPoint, QRectF, QTimer
 from PyQt5.QtGui import QTextDocument, QPalette, QColor, QPainter, QPainterPath, QIcon
 import markdown
+import html as html_lib
+import time
+import logging
+import uuid
 from datetime import datetime
-from services.ai_service import AIService
-from .chat_worker import ChatWorker
+from services.session_store import curriculum_id
+from services.quiz import QuizService
+from services.review_scheduler import quality_from_result
+from services.link_checker import extract_links
+from services.budget import budget_scope
+from services.conversation import ConversationTree, CHAT_ROLES
+from services.version_store import map_node_ids, version_of
+from services.offline_pack import OfflinePack, build_pack, pack_path, explain_section, render_explanation
+from services.curriculum import Curriculum, revise_curriculum, quiz_sections, changed_quiz_sections
+from .quiz_dialog import QuizDialog
+from ..chat_renderer import MessageRenderCache
+from ..styles import COLORS
+
+logger = logging.getLogger(__name__)
+
+NODE_ID_ROLE = Qt.UserRole + 1  # Curriculum node ID on tree items
+STREAM_RENDER_MS = 50  # Streamed text is shown at most this often
+BULK_TAKE = 8  # Replaced slices of children longer than this are re-inserted in one go
+EXPLAIN_RETRY_SECONDS = 60  # Wait before asking again for an explanation that failed; doubles per failure
+MAX_EXPLAIN_RETRY_SECONDS = 30 * 60
+
+# Section documents are rendered by QTextDocument, which the application stylesheet does not reach
+SECTION_STYLE = f"""
+    body {{
+        color: {COLORS['text']};
+        font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
+    }}
+    h1 {{ color: {COLORS['accent']}; font-size: 18px; margin: 0 0 10px 0; }}
+    ul {{ margin: 0; padding-left: 20px; }}
+    li {{ color: {COLORS['secondary_text']}; margin: 5px 0; }}
+"""
 
 
 class CurriculumTreeView(QTreeWidget):
@@ -17,147 +51,119 @@ class CurriculumTreeView(QTreeWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.init_ui()
-        self.progress = {}  # Track progress for each item
+        self.progress = {}  # Node ID -> completion and tree item
+        self.curriculum = Curriculum()
         
     def init_ui(self):
         """Initialize the tree view UI."""
         self.setHeaderHidden(True)
         self.setAnimated(True)
-        self.setStyleSheet("""
-            QTreeWidget {
-                background-color: #1e1e1e;
-                color: #ffffff;
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                padding: 10px;
-            }
-            QTreeWidget::item {
-                padding: 8px;
-                border-radius: 4px;
-            }
-            QTreeWidget::item:hover {
-                background-color: #2d2d2d;
-            }
-            QTreeWidget::item:selected {
-                background-color: #2c4159;
-                color: #ffffff;
-            }
-            QTreeWidget::branch {
-                background-color: transparent;
-            }
-            QTreeWidget::branch:has-children:!has-siblings:closed,
-            QTreeWidget::branch:closed:has-children:has-siblings {
-                image: url(none);
-                border-image: none;
-                padding-top: 2px;
-            }
-            QTreeWidget::branch:open:has-children:!has-siblings,
-            QTreeWidget::branch:open:has-children:has-siblings {
-                image: url(none);
-                border-image: none;
-                padding-top: 2px;
-            }
-            QTreeWidget::branch:has-children:!has-siblings:closed::indicator,
-            QTreeWidget::branch:closed:has-children:has-siblings::indicator {
-                position: absolute;
-                content: "+";
-                color: #58a6ff;
-            }
-            QTreeWidget::branch:open:has-children:!has-siblings::indicator,
-            QTreeWidget::branch:open:has-children:has-siblings::indicator {
-                position: absolute;
-                content: "-";
-                color: #58a6ff;
-            }
-            QTreeWidget::branch:has-siblings {
-                border-left: 1px solid #3d3d3d;
-            }
-            QTreeWidget::branch:!has-children:!has-siblings:adjoins-item {
-                border-image: none;
-            }
-        """)
+        self.setObjectName("curriculumTree")
         
     def parse_curriculum(self, curriculum: str):
         """Parse markdown curriculum into tree structure with progress tracking."""
-        print(f"Parsing curriculum content: {curriculum[:200]}...")  # Debug print
+        self.load(Curriculum.parse(curriculum))
+
+    def load(self, curriculum: Curriculum, completed=()):
+        """Show a parsed curriculum; nodes whose IDs are in completed start checked off."""
         self.clear()
         self.progress.clear()
-        
-        # Parse markdown to extract structure
-        lines = curriculum.split('\n')
-        current_items = {}  # Level -> Parent item mapping
-        current_level = 0
-        current_indent = 0
-        
-        for line in lines:
-            # Skip empty lines
-            if not line.strip():
-                continue
-            
-            # Calculate indentation level
-            indent = len(line) - len(line.lstrip())
-            if indent > current_indent:
-                current_level += 1
-            elif indent < current_indent:
-                current_level = max(1, current_level - 1)
-            current_indent = indent
-            
-            # Clean the line
-            line = line.strip()
-            
-            # Calculate heading level and text
-            level = current_level
-            text = line.strip()
-            
-            if line.startswith('#'):
-                level = 1  # All headers are top level
-                text = line.lstrip('#').strip()
-            elif line.startswith('-') or line.startswith('*'):
-                text = line.lstrip('-').lstrip('*').strip()
-            elif line[0].isdigit() and '.' in line:
-                text = line.split('.', 1)[1].strip()
-            
-            print(f"Processing line: indent={indent}, level={level}, text={text}")  # Debug print
-                
-            # Create tree item
-            item = QTreeWidgetItem()
-            item.setText(0, text)
-            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-            item.setCheckState(0, Qt.Unchecked)
-            
-            # Store in progress tracking
-            self.progress[text] = {
-                'completed': False,
-                'item': item,
-                'level': level
+        stack = [(node, None) for node in reversed(curriculum.roots)]
+        while stack:
+            node, parent = stack.pop()
+            item = self._make_item(node)
+
+            # Progress is tracked per node ID, so it survives curriculum revisions
+            self.progress[node.id] = {
+                'completed': node.id in completed,
+                'item': item
             }
-            
-            # Add to appropriate parent
-            if level == 1 or not current_items:
-                # Top level item
-                print(f"Adding top level item: {text}")  # Debug print
+            if parent is None:
                 self.addTopLevelItem(item)
-                current_items = {1: item}
             else:
-                # Find appropriate parent
-                parent_level = level - 1
-                while parent_level > 0 and parent_level not in current_items:
-                    parent_level -= 1
-                
-                if parent_level > 0 and parent_level in current_items:
-                    print(f"Adding child item: {text} to parent: {current_items[parent_level].text(0)}")  # Debug print
-                    current_items[parent_level].addChild(item)
-                    current_items[level] = item
-                else:
-                    # If no parent found, add as top level item
-                    print(f"No parent found, adding as top level: {text}")  # Debug print
-                    self.addTopLevelItem(item)
-                    current_items = {1: item}
-            
-        print(f"Total items added: {len(self.progress)}")  # Debug print
+                parent.addChild(item)
+            stack.extend((child, item) for child in reversed(node.children))
+
+        self.curriculum = curriculum
+        logger.debug(f"Curriculum tree loaded with {len(self.progress)} items")
         self.expandAll()
         self.update_progress()
-        
+
+    def apply_changes(self, curriculum: Curriculum, changes: dict) -> list:
+        """Follow an edit of the shown curriculum (see CurriculumDocument.apply).
+
+        Only the replaced slices of children are taken out and put back, so
+        the work follows the size of the edit rather than of the curriculum.
+        Returns the titles of removed and retitled nodes as they were.
+        """
+        # Take slices out while items are still keyed by their old IDs. Each
+        # takeChild costs about as much as taking all children, so large
+        # slices take everything and put the rest back with the new items.
+        bulk = {}  # Range index -> parent item and the children to put back around the new ones
+        for index, change in enumerate(changes["ranges"]):
+            if change["removed"]:
+                parent = self._item(change["before"])
+                if change["removed"] > BULK_TAKE:
+                    children = parent.takeChildren()
+                    bulk[index] = parent, children[:change["first"]] + children[change["first"] + change["removed"]:]
+                else:
+                    for _ in range(change["removed"]):
+                        parent.takeChild(change["first"])
+        for node_id, _ in changes["removed"]:
+            del self.progress[node_id]
+        renamed = {old: self.progress.pop(old) for old in changes["renamed"]}
+        for old, new in changes["renamed"].items():
+            self.progress[new] = renamed[old]
+            renamed[old]['item'].setData(0, NODE_ID_ROLE, new)
+        for node_id in changes["retitled"]:
+            self.progress[node_id]['item'].setText(0, curriculum.node(node_id).title)
+
+        for change in changes["ranges"]:
+            for node_id in change["children"]:
+                if node_id not in self.progress:
+                    item = self._make_item(curriculum.node(node_id))
+                    item.setForeground(0, QColor(COLORS['text']))
+                    self.progress[node_id] = {'completed': False, 'item': item}
+        inserted = []
+        for index, change in enumerate(changes["ranges"]):
+            items = [self.progress[node_id]['item'] for node_id in change["children"]]
+            if index in bulk:
+                parent, around = bulk[index]
+                items = around[:change["first"]] + items + around[change["first"]:]
+                first = 0
+            elif items:
+                parent, first = self._item(change["after"]), change["first"]
+            if items:
+                parent.insertChildren(first, items)
+                parent.setExpanded(True)
+                inserted.extend(items)
+
+        # Items put back into the tree come back collapsed
+        while inserted:
+            item = inserted.pop()
+            if item.childCount():
+                item.setExpanded(True)
+                inserted.extend(item.child(i) for i in range(item.childCount()))
+        self.curriculum = curriculum
+        return [title for _, title in changes["removed"]] + list(changes["retitled"].values())
+
+    def _item(self, node_id) -> QTreeWidgetItem:
+        """The item for a node ID; the invisible root item for None (the top level)."""
+        return self.invisibleRootItem() if node_id is None else self.progress[node_id]['item']
+
+    @staticmethod
+    def _make_item(node) -> QTreeWidgetItem:
+        item = QTreeWidgetItem()
+        item.setText(0, node.title)
+        item.setData(0, NODE_ID_ROLE, node.id)
+        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+        item.setCheckState(0, Qt.Unchecked)
+        return item
+
+    def find(self, title: str):
+        """Node ID of the section with this title, if any."""
+        return self.curriculum.find(title)
+
     def update_progress(self):
         """Update progress indicators for all items."""
         total_items = len(self.progress)
@@ -165,31 +171,35 @@ class CurriculumTreeView(QTreeWidget):
         overall_progress = (completed_items / total_items) * 100 if total_items > 0 else 0
         
         # Update individual items
-        for text, info in self.progress.items():
+        for info in self.progress.values():
             item = info['item']
             if info['completed']:
                 item.setIcon(0, self.style().standardIcon(QStyle.SP_DialogApplyButton))
-                item.setForeground(0, QColor('#2ea043'))
+                item.setForeground(0, QColor(COLORS['success']))
             else:
                 item.setIcon(0, QIcon())
-                item.setForeground(0, QColor('#ffffff'))
+                item.setForeground(0, QColor(COLORS['text']))
                 
         return overall_progress
         
-    def mark_completed(self, text: str):
+    def mark_completed(self, node_id: str):
         """Mark a curriculum item as completed."""
-        if text in self.progress:
-            self.progress[text]['completed'] = True
+        if node_id in self.progress:
+            self.progress[node_id]['completed'] = True
             self.update_progress()
+
+    def completed(self) -> set:
+        """IDs of the completed nodes."""
+        return {node_id for node_id, info in self.progress.items() if info['completed']}
             
-    def get_section_content(self, text: str) -> str:
+    def get_section_content(self, node_id: str) -> str:
         """Get the detailed content for a section."""
-        if text in self.progress:
-            item = self.progress[text]['item']
+        if node_id in self.progress:
+            item = self.progress[node_id]['item']
             content = []
             child_count = item.childCount()
             
-            content.append(f"# {text}")
+            content.append(f"# {item.text(0)}")
             
             # Add description if it exists
             description = item.data(0, Qt.UserRole)
@@ -211,13 +221,22 @@ class CurriculumTreeView(QTreeWidget):
 
 
 class MessageDelegate(QStyledItemDelegate):
-    """Custom delegate for rendering chat messages."""
+    """Custom delegate for rendering chat messages as markdown.
+
+    Rendered messages are cached per message (see MessageRenderCache), so
+    repainting or streaming into a message only renders what changed.
+    """
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.doc = QTextDocument()
+        self.cache = MessageRenderCache()
         self.max_width = 600  # Maximum message width
 
+    def _document(self, msg_data: dict, width: int) -> QTextDocument:
+        # Stored messages never change, so a node ID (or the text itself) identifies the rendering
+        key = msg_data.get('node') or msg_data.get('stream') or (msg_data.get('type'), msg_data.get('content', ''))
+        return self.cache.document(key, msg_data.get('content', ''), width)
+
     def paint(self, painter: QPainter, option, index):
         """Paint the message item."""
         # Get message data
@@ -226,8 +245,9 @@ class MessageDelegate(QStyledItemDelegate):
             return
 
         msg_type = msg_data.get('type', '')
-        content = msg_data.get('content', '')
         timestamp = msg_data.get('timestamp', '')
+        if msg_data.get('branch'):
+            timestamp = f"{timestamp}  ·  {msg_data['branch']}" if timestamp else msg_data['branch']
         
         # Prepare painter
         painter.save()
@@ -238,11 +258,10 @@ class MessageDelegate(QStyledItemDelegate):
         msg_width = int(min(self.max_width, available_width))
         
         # Prepare text document for content
-        self.doc.setTextWidth(msg_width - 30)  # Subtract padding
-        self.doc.setHtml(f"<span style='color: white;'>{content}</span>")
+        doc = self._document(msg_data, msg_width - 30)  # Subtract padding
         
         # Calculate heights
-        msg_height = int(self.doc.size().height())
+        msg_height = int(doc.size().height())
         total_height = int(msg_height + 25)  # Add space for timestamp
         
         # Create message bubble path
@@ -259,10 +278,10 @@ class MessageDelegate(QStyledItemDelegate):
         path = QPainterPath()
         if msg_type == 'user':
             path.addRoundedRect(bubble_rect, 15, 15)
-            painter.setBrush(QColor("#58a6ff"))
+            painter.setBrush(QColor(COLORS["accent"]))
         elif msg_type == 'assistant':
             path.addRoundedRect(bubble_rect, 15, 15)
-            painter.setBrush(QColor("#3d3d3d"))
+            painter.setBrush(QColor(COLORS["raised"]))
         else:  # system message
             painter.setBrush(Qt.transparent)
         
@@ -277,12 +296,12 @@ class MessageDelegate(QStyledItemDelegate):
             int(msg_height)
         )
         painter.translate(content_rect.topLeft())
-        self.doc.drawContents(painter)
+        doc.drawContents(painter)
         painter.translate(-content_rect.topLeft())
         
         # Draw timestamp
         if timestamp and msg_type != 'system':
-            painter.setPen(QColor("#808080"))
+            painter.setPen(QColor(COLORS["muted"]))
             timestamp_rect = QRect(
                 int(bubble_rect.left()),
                 int(bubble_rect.bottom() + 4),
@@ -303,13 +322,11 @@ class MessageDelegate(QStyledItemDelegate):
             return QSize()
         
         # Calculate width
-        available_width = option.rect.width() * 0.85
-        msg_width = min(self.max_width, available_width)
+        available_width = int(option.rect.width() * 0.85)
+        msg_width = int(min(self.max_width, available_width))
         
         # Calculate height
-        self.doc.setTextWidth(msg_width - 30)
-        self.doc.setHtml(msg_data.get('content', ''))
-        msg_height = self.doc.size().height()
+        msg_height = self._document(msg_data, msg_width - 30).size().height()
         
         # Add padding and timestamp space and convert to integer
         total_height = int(msg_height + 35)
@@ -317,16 +334,58 @@ class MessageDelegate(QStyledItemDelegate):
         return QSize(int(option.rect.width()), total_height)
 
 
+# Rough per-object costs used to estimate a session's memory footprint
+SESSION_BASE_BYTES = 2 * 1024 * 1024  # Widgets, layouts and style data
+MESSAGE_ITEM_BYTES = 12 * 1024  # List item plus its rendered document per message
+TREE_ITEM_BYTES = 1024  # Tree item with icon and check state
+
+
 class LearningSessionTab(QWidget):
-    def __init__(self, parent=None, topic="", expertise_level="", curriculum=""):
+    def __init__(self, parent=None, topic="", expertise_level="", curriculum="", state=None):
         super().__init__(parent)
         self.parent = parent
         self.topic = topic
         self.expertise_level = expertise_level
         self.curriculum = curriculum
-        self.chat_history = []
-        self.ai_service = AIService()
+        self.curriculum_id = curriculum_id(topic, expertise_level)
+        self.session_id = uuid.uuid4().hex
+        self.conversation = ConversationTree()  # Chat messages as a tree of branches
+        self.reply_parent = None  # Message the in-flight chat request answers
+        self.edit_parent = None  # Parent of a message being edited and resent
+        self.request_id = None  # ID of the in-flight chat request
+        self.stream = None  # Chunks and list item of the answer being streamed
+        self.quiz_request_id = None  # ID of the in-flight question bank request
+        self.revise_request_id = None  # ID of the in-flight curriculum revision
+        self.pack_request_id = None  # ID of the in-flight offline pack build
+        self.pack = None  # Offline pack for the current curriculum, if built
+        self.explanations = {}  # Section node ID -> explanation HTML fetched because the pack lacked it
+        self.explain_failures = {}  # Section node ID -> (failures, time to retry, error) of explanation requests
+        self.explaining = None  # Section node ID of the in-flight explanation request
+        self.links = {}  # URL -> link check result for the curriculum's links
+        self.shown_node = None  # Node whose content the section view shows
+        self.last_cached_question = None  # Last question answered from the cache
+        self.last_answered_question = None  # Last question the tutor answered
+        self.last_active = time.monotonic()
+        self.ai_service = parent.ai_service  # Shared client and connection pool
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setSingleShot(True)
+        self.stream_timer.setInterval(STREAM_RENDER_MS)
+        self.stream_timer.timeout.connect(self._show_stream)
         self.init_ui()
+        self._open_pack()
+        if state is not None:
+            self._restore_state(state)
+        else:
+            # Add welcome messages
+            self._add_system_message("Welcome to your learning session!")
+            self._add_assistant_message("I'm here to help you learn about " + self.topic + ". What would you like to know first?")
+            self._index_sections()
+        self._check_links()
+
+    @classmethod
+    def from_state(cls, parent, state):
+        """Recreate a session tab from a state produced by export_state."""
+        return cls(parent, state["topic"], state["expertise_level"], state["curriculum"], state=state)
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -343,46 +402,41 @@ class LearningSessionTab(QWidget):
 
         # Topic header
         header = QLabel(f"Learning: {self.topic}")
-        header.setStyleSheet("color: #ffffff; font-size: 18px; font-weight: bold;")
+        header.setProperty("role", "title")
         left_layout.addWidget(header)
 
         # Curriculum container
         curriculum_container = QFrame()
-        curriculum_container.setStyleSheet("""
-            QFrame {
-                background-color: #2b2b2b;
-                border-radius: 10px;
-                padding: 15px;
-            }
-        """)
+        curriculum_container.setProperty("role", "panel")
         curriculum_layout = QVBoxLayout()
         
         # Header with progress
         header_layout = QHBoxLayout()
         curriculum_label = QLabel("Curriculum")
-        curriculum_label.setStyleSheet("color: #ffffff; font-size: 14px; font-weight: bold;")
+        curriculum_label.setProperty("role", "heading")
         header_layout.addWidget(curriculum_label)
         
         self.progress_label = QLabel("0%")
-        self.progress_label.setStyleSheet("color: #58a6ff; font-size: 14px;")
+        self.progress_label.setObjectName("progressLabel")
         header_layout.addWidget(self.progress_label)
         header_layout.addStretch()
+
+        self.revise_button = QPushButton("Revise...")
+        self.revise_button.setToolTip("Ask for changes; sections that stay the same keep their progress")
+        self.revise_button.clicked.connect(self.revise_curriculum)
+        header_layout.addWidget(self.revise_button)
+
+        self.quiz_button = QPushButton("Practice Quiz")
+        self.quiz_button.clicked.connect(self.start_quiz)
+        header_layout.addWidget(self.quiz_button)
+
+        self.pack_button = QPushButton("Offline Pack")
+        self.pack_button.clicked.connect(self.build_offline_pack)
+        header_layout.addWidget(self.pack_button)
         curriculum_layout.addLayout(header_layout)
         
         # Progress bar
         self.curriculum_progress = QProgressBar()
-        self.curriculum_progress.setStyleSheet("""
-            QProgressBar {
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                text-align: center;
-                height: 4px;
-                background-color: #1e1e1e;
-            }
-            QProgressBar::chunk {
-                background-color: #58a6ff;
-            }
-        """)
         self.curriculum_progress.setTextVisible(False)
         curriculum_layout.addWidget(self.curriculum_progress)
         
@@ -393,19 +447,8 @@ class LearningSessionTab(QWidget):
         
         # Section content view
         self.section_content = QTextBrowser()
-        self.section_content.setStyleSheet("""
-            QTextBrowser {
-                background-color: #1e1e1e;
-                color: #ffffff;
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                padding: 10px;
-                margin-top: 10px;
-            }
-            QTextBrowser a {
-                color: #58a6ff;
-            }
-        """)
+        self.section_content.setObjectName("sectionContent")
+        self.section_content.setOpenExternalLinks(True)
         self.section_content.setMaximumHeight(200)
         curriculum_layout.addWidget(self.section_content)
         
@@ -426,29 +469,7 @@ class LearningSessionTab(QWidget):
         self.chat_display.setVerticalScrollMode(QListWidget.ScrollPerPixel)
         self.chat_display.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.chat_display.setWordWrap(True)
-        self.chat_display.setStyleSheet("""
-            QListWidget {
-                background-color: #2b2b2b;
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                padding: 10px;
-            }
-            QScrollBar:vertical {
-                border: none;
-                background: #2b2b2b;
-                width: 10px;
-                margin: 0;
-            }
-            QScrollBar::handle:vertical {
-                background: #3d3d3d;
-                min-height: 20px;
-                border-radius: 5px;
-            }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
-                border: none;
-                background: none;
-            }
-        """)
+        self.chat_display.setObjectName("chatDisplay")
         
         # Set custom delegate for message rendering
         self.message_delegate = MessageDelegate(self.chat_display)
@@ -458,73 +479,26 @@ class LearningSessionTab(QWidget):
 
         # Progress bar for loading state
         self.progress_bar = QProgressBar()
-        self.progress_bar.setStyleSheet("""
-            QProgressBar {
-                border: 1px solid #3d3d3d;
-                border-radius: 5px;
-                text-align: center;
-                height: 4px;
-            }
-            QProgressBar::chunk {
-                background-color: #58a6ff;
-            }
-        """)
         self.progress_bar.setTextVisible(False)
         self.progress_bar.hide()
         right_layout.addWidget(self.progress_bar)
 
         # Chat input area with modern styling
         input_container = QFrame()
-        input_container.setStyleSheet("""
-            QFrame {
-                background-color: #2b2b2b;
-                border-radius: 10px;
-                padding: 10px;
-            }
-        """)
+        input_container.setProperty("role", "panel")
+        input_container.setObjectName("chatInputBar")
         chat_input_layout = QHBoxLayout()
         chat_input_layout.setSpacing(10)
         
         self.chat_input = QLineEdit()
         self.chat_input.setPlaceholderText("Type your message here...")
         self.chat_input.setMinimumHeight(40)
-        self.chat_input.setStyleSheet("""
-            QLineEdit {
-                background-color: #1e1e1e;
-                color: #ffffff;
-                border: 1px solid #3d3d3d;
-                border-radius: 20px;
-                padding: 0 15px;
-                font-size: 13px;
-            }
-            QLineEdit:focus {
-                border: 1px solid #58a6ff;
-            }
-        """)
+        self.chat_input.setObjectName("chatInput")
         
         self.send_button = QPushButton("Send")
         self.send_button.setMinimumHeight(40)
         self.send_button.setMinimumWidth(100)
-        self.send_button.setStyleSheet("""
-            QPushButton {
-                background-color: #58a6ff;
-                border-radius: 20px;
-                padding: 0 20px;
-                color: white;
-                font-weight: bold;
-                font-size: 13px;
-            }
-            QPushButton:hover {
-                background-color: #6cb0ff;
-            }
-            QPushButton:pressed {
-                background-color: #4a8cd9;
-            }
-            QPushButton:disabled {
-                background-color: #2c4159;
-                color: rgba(255, 255, 255, 0.5);
-            }
-        """)
+        self.send_button.setObjectName("sendButton")
         
         chat_input_layout.addWidget(self.chat_input)
         chat_input_layout.addWidget(self.send_button)
@@ -544,51 +518,478 @@ class LearningSessionTab(QWidget):
         self.send_button.clicked.connect(self.handle_send)
         self.chat_input.returnPressed.connect(self.handle_send)
         self.chat_input.textChanged.connect(self._handle_input_change)
-
-        # Add welcome messages
-        self._add_system_message("Welcome to your learning session!")
-        self._add_assistant_message("I'm here to help you learn about " + self.topic + ". What would you like to know first?")
+        self.chat_display.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.chat_display.customContextMenuRequested.connect(self._show_message_menu)
 
         # Parse and display curriculum
         self.curriculum_tree.parse_curriculum(self.curriculum)
         self._update_progress(0)
 
-    def _add_message_item(self, content: str, msg_type: str):
+    def export_state(self) -> dict:
+        """Serialize chat, progress and curriculum so the tab can be rebuilt."""
+        messages = []
+        for row in range(self.chat_display.count()):
+            data = self.chat_display.item(row).data(Qt.UserRole)
+            if not data.get('stream'):  # A partly streamed answer is not a message yet
+                messages.append(dict(data))
+        return {
+            "session_id": self.session_id,
+            "topic": self.topic,
+            "expertise_level": self.expertise_level,
+            "curriculum": self.curriculum,
+            "conversation": self.conversation.to_dict(),
+            "messages": messages,  # The displayed branch, for search and archive readers
+            "progress": {  # Keyed by curriculum node ID
+                node_id: info['completed'] for node_id, info in self.curriculum_tree.progress.items()
+            },
+        }
+
+    def _restore_state(self, state: dict):
+        """Replay chat messages and progress from a saved state."""
+        self.session_id = state["session_id"]
+        if "conversation" in state:
+            self.conversation = ConversationTree.from_dict(state["conversation"])
+        else:
+            self.conversation = ConversationTree.from_messages(state.get("messages", []))
+        self._render_branch()
+        for key, completed in state.get("progress", {}).items():
+            # Older sessions keyed progress by section title
+            node_id = key if key in self.curriculum_tree.progress else self.curriculum_tree.find(key)
+            if completed and node_id is not None:
+                self.curriculum_tree.progress[node_id]['completed'] = True
+        self._update_progress(self.curriculum_tree.update_progress())
+
+    def carry_progress(self, state: dict):
+        """Mark the sections completed in an earlier session on this topic, as far as they survive.
+
+        Nodes are followed from that session's curriculum to this one (see
+        version_store.map_node_ids), so progress outlives regenerations and
+        edits that keep or retitle a section.
+        """
+        completed = [node_id for node_id, done in state.get("progress", {}).items() if done]
+        if not completed:
+            return
+        if state["curriculum"] != self.curriculum:
+            mapping = map_node_ids(state["curriculum"], self.curriculum)
+            completed = [mapping.get(node_id) for node_id in completed]
+        carried = set(completed)
+        carried &= set(self.curriculum_tree.progress)
+        if not carried:
+            return
+        for node_id in carried:
+            self.curriculum_tree.progress[node_id]['completed'] = True
+        self._update_progress(self.curriculum_tree.update_progress())
+        self._add_system_message(
+            f"Carried over your progress on {len(carried)} section{'s' if len(carried) != 1 else ''} "
+            "from your previous session."
+        )
+
+    def _index_sections(self):
+        """Add the curriculum's top-level sections to the search index."""
+        for i in range(self.curriculum_tree.topLevelItemCount()):
+            item = self.curriculum_tree.topLevelItem(i)
+            self.parent.search_index.add_section(
+                self.session_id, self.topic, item.text(0),
+                self.curriculum_tree.get_section_content(item.data(0, NODE_ID_ROLE))
+            )
+
+    def scroll_to_message(self, ref):
+        """Scroll the chat to a message and select it.
+
+        ref is a conversation node ID; rows are accepted for older index entries.
+        """
+        row = ref
+        if isinstance(ref, str):
+            if ref not in self.conversation:
+                return
+            if ref not in [node.id for node in self.conversation.path()]:
+                # The message is on another branch: show that branch first
+                self.conversation.checkout(self.conversation.leaf(ref))
+                self._render_branch()
+            row = next(row for row in range(self.chat_display.count())
+                       if self.chat_display.item(row).data(Qt.UserRole).get('node') == ref)
+        item = self.chat_display.item(row)
+        if item is not None:
+            self.chat_display.setCurrentItem(item)
+            self.chat_display.scrollToItem(item, QListWidget.PositionAtCenter)
+
+    def show_section(self, title: str):
+        """Select a curriculum section and display its content."""
+        node_id = self.curriculum_tree.find(title)
+        if node_id is not None:
+            self.show_node(node_id)
+
+    def show_node(self, node_id: str) -> bool:
+        """Select a curriculum node by ID and display it; False if it is not in the curriculum."""
+        if node_id not in self.curriculum_tree.progress:
+            return False
+        item = self.curriculum_tree.progress[node_id]['item']
+        self.curriculum_tree.setCurrentItem(item)
+        self.curriculum_tree.scrollToItem(item)
+        self._display_section(node_id)
+        return True
+
+    def start_quiz(self, focus: str = None):
+        """Open a practice quiz, generating the question bank first if needed.
+
+        With focus (a node ID), the quiz asks about the quiz section that
+        contains the node, if the bank has questions for it.
+        """
+        self.touch()
+        quiz_service = self.parent.quiz_service
+        sections = self._quiz_sections()
+        focus = self._quiz_section_of(focus, sections) if focus else None
+        bank = quiz_service.load_bank(self.curriculum_id)
+        if bank and not QuizService.missing_sections(bank, sections):
+            self._open_quiz(bank, focus)
+            return
+        bank = self.pack.quiz() if self.pack is not None else []
+        if bank and not QuizService.missing_sections(bank, sections):
+            self._open_quiz(bank, focus)
+            return
+        self.quiz_button.setEnabled(False)
+        self.quiz_button.setText("Preparing quiz...")
+        self.quiz_request_id = self.parent.executor.submit(
+            self, self._in_budget, quiz_service.get_bank, self.curriculum_id, self.topic, self.expertise_level,
+            self.curriculum, sections,
+            on_result=lambda bank: self._open_quiz(bank, focus),
+            on_error=self._quiz_failed,
+            channel="quiz"
+        )
+
+    def _quiz_sections(self) -> list:
+        """Titles of the sections to write questions for: main topics, else top-level sections."""
+        return [section.title for section in quiz_sections(self.curriculum_tree.curriculum)]
+
+    def _quiz_section_of(self, node_id: str, sections: list):
+        """Title of the quiz section a node belongs to, if any."""
+        if node_id not in self.curriculum_tree.progress:
+            return None
+        item = self.curriculum_tree.progress[node_id]['item']
+        while item is not None and item.text(0) not in sections:
+            item = item.parent()
+        return item.text(0) if item is not None else None
+
+    def _open_quiz(self, bank: list, focus: str = None):
+        self._reset_quiz_button()
+        focused = [question for question in bank if question.get("section") == focus]
+        questions = QuizService.build_quiz(focused or bank)
+        QuizDialog(self, self.parent.quiz_service, self.parent.executor, questions,
+                   on_finished=self._record_reviews, run=self._in_budget).exec_()
+
+    def _record_reviews(self, graded: list):
+        """Reschedule each quizzed section and the studied nodes under it, once per sitting.
+
+        A section's grades are averaged into one SM-2 quality, so answering
+        several of its questions counts as a single review.
+        """
+        qualities = {}
+        for question, result in graded:
+            node_id = self.curriculum_tree.find(question.get("section", ""))
+            if node_id is not None:
+                qualities.setdefault(node_id, []).append(quality_from_result(result))
+        if not qualities:
+            return
+        scheduler = self.parent.review_scheduler
+        for node_id, grades in qualities.items():
+            self._schedule_review(node_id)
+            quality = round(sum(grades) / len(grades))
+            stack = [self.curriculum_tree.progress[node_id]['item']]
+            while stack:
+                item = stack.pop()
+                if scheduler.is_tracked(self.curriculum_id, item.data(0, NODE_ID_ROLE)):
+                    scheduler.review(self.curriculum_id, item.data(0, NODE_ID_ROLE), quality)
+                stack.extend(item.child(i) for i in range(item.childCount()))
+        self.parent.review_tab.schedule_refresh()
+
+    def _schedule_review(self, node_id: str):
+        """Put a studied node on the spaced-repetition schedule."""
+        self.parent.review_scheduler.track(
+            self.curriculum_id, node_id, self.curriculum_tree.curriculum.node(node_id).title,
+            self.topic, self.expertise_level, self.session_id
+        )
+
+    def _quiz_failed(self, error_message: str):
+        self._reset_quiz_button()
+        self._add_system_message(f"Error: could not prepare a quiz: {error_message}")
+
+    def _reset_quiz_button(self):
+        self.quiz_request_id = None
+        self.quiz_button.setEnabled(True)
+        self.quiz_button.setText("Practice Quiz")
+
+    def revise_curriculum(self):
+        """Ask what should change and apply it to the curriculum as an edit script."""
+        self.touch()
+        instruction, ok = QInputDialog.getText(
+            self, "Revise Curriculum", "What should change? (e.g. add a section on testing)")
+        if not ok or not instruction.strip():
+            return
+        self.revise_button.setEnabled(False)
+        self.revise_button.setText("Revising...")
+        self.revise_request_id = self.parent.executor.submit(
+            self, self._revise_curriculum, instruction.strip(),
+            on_result=self._apply_revision,
+            on_error=self._revision_failed,
+            channel="revise",
+            cancellable=True
+        )
+
+    def _revise_curriculum(self, instruction: str, cancel_token=None):
+        """Revise and store the curriculum (runs on the pool)."""
+        curriculum, changes = self._in_budget(
+            revise_curriculum, self.ai_service, self.topic, self.expertise_level, self.curriculum, instruction,
+            cancel_token=cancel_token
+        )
+        self.parent.store_curriculum(self.topic, self.expertise_level, curriculum,
+                                     changed_quiz_sections(self.curriculum, curriculum),
+                                     note=f"Revised: {instruction}")
+        return curriculum, changes
+
+    def _apply_revision(self, result):
+        """Show the revised curriculum; unchanged nodes keep their IDs and progress."""
+        curriculum, changes = result
+        self._reset_revise_button()
+        self.curriculum = curriculum
+        self.curriculum_tree.load(Curriculum.parse(curriculum), self.curriculum_tree.completed())
+        self._update_progress(self.curriculum_tree.update_progress())
+        self.section_content.clear()
+        self.shown_node = None
+        self.explanations.clear()
+        self.explain_failures.clear()
+        self._open_pack()  # A pack for the previous curriculum no longer applies
+        self._index_sections()
+        self._check_links()
+        self._add_system_message(
+            f"Curriculum revised: {len(changes['added'])} added, {len(changes['removed'])} removed, "
+            f"{len(changes['rewritten'])} rewritten."
+        )
+
+    def _revision_failed(self, error_message: str):
+        self._reset_revise_button()
+        self._add_system_message(f"Error: could not revise the curriculum: {error_message}")
+
+    def _reset_revise_button(self):
+        self.revise_request_id = None
+        self.revise_button.setEnabled(True)
+        self.revise_button.setText("Revise...")
+
+    def build_offline_pack(self):
+        """Precompute explanations, the quiz and common answers into a local pack."""
+        self.touch()
+        self.pack_button.setEnabled(False)
+        self.pack_button.setText("Building pack...")
+        self.pack_request_id = self.parent.executor.submit(
+            self, self._in_budget, build_pack, self._pack_path(), self.ai_service, self.parent.quiz_service,
+            self.curriculum_id, self.topic, self.expertise_level, self.curriculum, self._quiz_sections(),
+            on_result=self._pack_built,
+            on_error=self._pack_failed,
+            on_progress=self._show_pack_progress,
+            channel="pack",
+            cancellable=True
+        )
+
+    def _show_pack_progress(self, value):
+        done, total = value
+        self.pack_button.setText(f"Building pack {done}/{total}...")
+
+    def _pack_built(self, summary: dict):
+        self._reset_pack_button()
+        self._open_pack()
+        self.explanations.clear()
+        self.explain_failures.clear()
+        if self.shown_node is not None and self.shown_node in self.curriculum_tree.progress:
+            self._display_section(self.shown_node)
+        self._add_system_message(
+            f"Offline pack ready: {summary['sections']} section explanations, {summary['questions']} quiz "
+            f"questions and {summary['answers']} answers, {summary['bytes'] // 1024} KB. "
+            "They are now shown without waiting for the tutor."
+        )
+
+    def _pack_failed(self, error_message: str):
+        self._reset_pack_button()
+        self._add_system_message(f"Error: could not build an offline pack: {error_message}")
+
+    def _reset_pack_button(self):
+        self.pack_request_id = None
+        self.pack_button.setEnabled(True)
+        self.pack_button.setText("Offline Pack")
+
+    def _pack_path(self) -> str:
+        return pack_path(self.parent.session_store.path("packs"), self.curriculum_id)
+
+    def _open_pack(self):
+        """Load this curriculum's offline pack, if one was built for its current version."""
+        pack = OfflinePack.open(self._pack_path())
+        if pack is not None and pack.curriculum_version != version_of(self.curriculum):
+            logger.info(f"Offline pack for '{self.topic}' is for an earlier curriculum; not using it")
+            pack = None
+        self.pack = pack
+        if pack is not None:
+            added = self.parent.answer_cache.seed(self.curriculum_id, self.topic, pack.answers())
+            if added:
+                logger.info(f"Seeded {added} answers for '{self.topic}' from its offline pack")
+            self.pack_button.setToolTip(f"Built {pack.built.replace('T', ' ')}; click to rebuild")
+        else:
+            self.pack_button.setToolTip("Prepare explanations, a quiz and common answers to use offline")
+
+    def _explain(self, section_id: str, title: str, cancel_token=None) -> tuple:
+        """Explain a section the pack lacks (runs on the pool)."""
+        text = self._in_budget(explain_section, self.ai_service, self.topic, self.expertise_level,
+                               self.curriculum, title, cancel_token=cancel_token)
+        return section_id, render_explanation(text)
+
+    def _show_explanation(self, result: tuple):
+        section_id, html = result
+        self.explaining = None
+        self.explanations[section_id] = html
+        self.explain_failures.pop(section_id, None)
+        if self.shown_node is not None and self.shown_node in self.curriculum_tree.progress:
+            self._display_section(self.shown_node)
+
+    def _explanation_failed(self, section_id: str, title: str, error_message: str):
+        """Back off before asking again, e.g. while offline, and say so in the section view."""
+        self.explaining = None
+        failures = self.explain_failures.get(section_id, (0,))[0] + 1
+        wait = min(EXPLAIN_RETRY_SECONDS * 2 ** (failures - 1), MAX_EXPLAIN_RETRY_SECONDS)
+        self.explain_failures[section_id] = (failures, time.monotonic() + wait, error_message)
+        logger.error(f"Explaining '{title}' failed ({failures} times); retrying in {wait}s: {error_message}")
+        if self.shown_node is not None and self.shown_node in self.curriculum_tree.progress:
+            self._display_section(self.shown_node)
+
+    def _explanation_html(self, node_id: str) -> str:
+        """The explanation of the quiz section a node is in: from the pack, else fetched once.
+
+        Without a pack, sections show only their curriculum content. With
+        one, a section it lacks is explained by the tutor in the background.
+        """
+        if self.pack is None:
+            return ""
+        title = self._quiz_section_of(node_id, self._quiz_sections())
+        if title is None:
+            return ""
+        section_id = self.curriculum_tree.find(title)
+        entry = self.pack.section(section_id)
+        html = entry["html"] if entry is not None else self.explanations.get(section_id)
+        if html is not None:
+            return f"<h3>{html_lib.escape(title)}</h3>{html}"
+        failure = self.explain_failures.get(section_id)
+        if failure is not None and time.monotonic() < failure[1]:
+            minutes = max(1, round((failure[1] - time.monotonic()) / 60))
+            return (f"<p style='color: {COLORS['muted']};'>The offline pack has no explanation of "
+                    f"{html_lib.escape(title)}, and it could not be fetched ({html_lib.escape(failure[2])}). "
+                    f"It will be requested again when you open this section in about {minutes} "
+                    f"minute{'s' if minutes != 1 else ''}.</p>")
+        if self.explaining != section_id:
+            self.explaining = section_id
+            self.parent.executor.submit(
+                self, self._explain, section_id, title,
+                on_result=self._show_explanation,
+                on_error=lambda error: self._explanation_failed(section_id, title, error),
+                channel="explain",
+                cancellable=True
+            )
+        return f"<p style='color: {COLORS['muted']};'>Preparing an explanation of {html_lib.escape(title)}...</p>"
+
+    def _in_budget(self, fn, *args, **kwargs):
+        """Call fn, charging its requests to this session and curriculum (runs on the pool)."""
+        with budget_scope(session=self.session_id, curriculum=self.curriculum_id):
+            return fn(*args, **kwargs)
+
+    def is_busy(self) -> bool:
+        """Return True while a chat, quiz, revision or pack request is in flight."""
+        return (self.request_id is not None or self.quiz_request_id is not None
+                or self.revise_request_id is not None or self.pack_request_id is not None)
+
+    def touch(self):
+        """Record user activity for idle tracking."""
+        self.last_active = time.monotonic()
+
+    def estimated_memory(self) -> int:
+        """Estimate the bytes held by this tab's widgets and data."""
+        text_bytes = 2 * (len(self.curriculum) + self.conversation.content_chars())
+        return (SESSION_BASE_BYTES
+                + text_bytes
+                + MESSAGE_ITEM_BYTES * self.chat_display.count()
+                + TREE_ITEM_BYTES * len(self.curriculum_tree.progress))
+
+    def _add_message_item(self, content: str, msg_type: str, timestamp: str = None,
+                          node: str = None, branch: str = None, scroll: bool = True):
         """Add a message item to the chat display."""
-        timestamp = datetime.now().strftime("%H:%M")
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%H:%M")
         
         # Create list item with message data
         item = QListWidgetItem()
         item.setData(Qt.UserRole, {
             'type': msg_type,
             'content': content,
-            'timestamp': timestamp
+            'timestamp': timestamp,
+            'node': node,
+            'branch': branch
         })
         
         # Add to list widget
         self.chat_display.addItem(item)
-        self.chat_display.scrollToBottom()
+        if scroll:
+            self.chat_display.scrollToBottom()
         
-        # Force layout update
+            # Force layout update
+            self.chat_display.updateGeometry()
+
+    def _append_message(self, role: str, content: str, parent="head") -> str:
+        """Add a message to the conversation and display it; returns its node ID."""
+        previous_head = self.conversation.head
+        node_id = self.conversation.append(role, content, datetime.now().strftime("%H:%M"), parent=parent)
+        node = self.conversation.node(node_id)
+        if node.parent is not None and node.parent.id == previous_head:
+            self._add_message_item(node.content, node.role, node.timestamp, node.id, self._branch_label(node.id))
+        else:
+            # The message starts the conversation or lands on another branch
+            self._render_branch()
+        return node_id
+
+    def _render_branch(self):
+        """Show the messages from the root of the conversation to its head."""
+        self.chat_display.clear()
+        if self.stream is not None:
+            self.stream['item'] = None  # Shown again with the next chunk if it answers this branch
+        for node in self.conversation.path():
+            # Scrolling lays out every item, so do it once rather than per message
+            self._add_message_item(node.content, node.role, node.timestamp, node.id,
+                                   self._branch_label(node.id), scroll=False)
+        self.chat_display.scrollToBottom()
         self.chat_display.updateGeometry()
 
-    def _add_user_message(self, message: str):
-        """Add a user message to the chat display and history."""
-        self._add_message_item(message, 'user')
-        self.chat_history.append({"role": "user", "content": message})
+    def _branch_label(self, node_id: str) -> str:
+        """'version i of n' for messages that have alternatives, else an empty string."""
+        siblings = self.conversation.siblings(node_id)
+        if len(siblings) < 2:
+            return ""
+        return f"version {siblings.index(node_id) + 1} of {len(siblings)}"
+
+    def _add_user_message(self, message: str, parent="head"):
+        """Add a user message to the conversation."""
+        self._index_message(self._append_message('user', message, parent))
+
+    def _add_assistant_message(self, message: str, parent="head"):
+        """Add an assistant message to the conversation."""
+        self._index_message(self._append_message('assistant', message, parent))
 
-    def _add_assistant_message(self, message: str):
-        """Add an assistant message to the chat display and history."""
-        self._add_message_item(message, 'assistant')
-        self.chat_history.append({"role": "assistant", "content": message})
+    def _index_message(self, node_id: str):
+        """Add a chat message to the search index."""
+        node = self.conversation.node(node_id)
+        self.parent.search_index.add_message(self.session_id, self.topic, node_id, node.role, node.content)
 
     def _add_system_message(self, message: str):
-        """Add a system message to the chat display."""
-        self._add_message_item(message, 'system')
+        """Add a system message to the conversation."""
+        self._append_message('system', message)
 
     def _show_error(self, error_message: str):
         """Display an error message in the chat."""
-        self._add_message_item(f"Error: {error_message}", 'system')
+        self.request_id = None
+        self.message_delegate.cache.adopt(self._end_stream(), None)
+        self._add_system_message(f"Error: {error_message}")
         self.progress_bar.hide()
         self._enable_input(True)
 
@@ -607,65 +1008,259 @@ class LearningSessionTab(QWidget):
         message = self.chat_input.text().strip()
         if not message:
             return
+        self.touch()
 
-        # Display user message and update history
-        self._add_user_message(message)
+        # Display user message; an edited message starts a new branch
+        self._add_user_message(message, self.edit_parent or "head")
+        self.edit_parent = None
         
-        # Clear input and disable controls
+        # Clear input but keep it enabled: sending again while a reply is
+        # pending supersedes and cancels the earlier request
         self.chat_input.clear()
-        self._enable_input(False)
-        
+
+        model = None
+        if message == self.last_answered_question:
+            # Asking again right after an answer asks the more capable model
+            model = "large"
+            self._add_system_message("Asking the more capable model...")
+        elif self._answer_from_cache(message):
+            return
+        self._request_answer(message, model)
+
+    def _request_answer(self, question: str, model: str = None):
+        """Ask the tutor to answer the conversation up to its head."""
         # Show progress bar
         self.progress_bar.setRange(0, 0)  # Indeterminate mode
         self.progress_bar.show()
 
-        # Create worker thread for AI response
-        self.worker = ChatWorker(self.ai_service, self.chat_history, self.curriculum)
-        self.worker.finished.connect(self._handle_ai_response)
-        self.worker.error.connect(self._show_error)
-        self.worker.start()
+        # The snapshot is immutable, so the UI thread can keep adding
+        # messages or switch branches while the request runs
+        self.message_delegate.cache.adopt(self._end_stream(), None)
+        self.reply_parent = self.conversation.head
+        self.stream = {'chunks': [], 'item': None, 'key': f"stream-{uuid.uuid4().hex}"}
+        self.request_id = self.parent.executor.submit(
+            self, self._stream_answer, self.conversation.snapshot(), self.curriculum,
+            on_result=lambda response: self._handle_ai_response(response, question),
+            on_error=self._show_error,
+            on_progress=self._handle_answer_text,
+            channel="chat",
+            cancellable=True,
+            model=model
+        )
+
+    def _stream_answer(self, messages, curriculum: str, model: str = None, cancel_token=None, progress=None):
+        """Ask the tutor, passing each chunk of the answer to progress (runs on the pool)."""
+        return self._in_budget(self.ai_service.chat, messages, curriculum,
+                               cancel_token=cancel_token, on_text=progress, model=model)
+
+    def _handle_answer_text(self, chunk: str):
+        """Collect a streamed chunk; the bubble is updated at most every STREAM_RENDER_MS."""
+        if self.stream is None:
+            return
+        self.stream['chunks'].append(chunk)
+        if not self.stream_timer.isActive():
+            self.stream_timer.start()
+
+    def _show_stream(self):
+        """Show the answer streamed so far in a bubble below the question it answers."""
+        if self.stream is None:
+            return
+        content = "".join(self.stream['chunks'])
+        item = self.stream['item']
+        scrollbar = self.chat_display.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 10
+        if item is None:
+            if self.reply_parent != self.conversation.head:
+                return  # The learner is looking at another branch
+            item = QListWidgetItem()
+            self.chat_display.addItem(item)
+            self.stream['item'] = item
+        item.setData(Qt.UserRole, {
+            'type': 'assistant',
+            'content': content,
+            'timestamp': datetime.now().strftime("%H:%M"),
+            'node': None,
+            'branch': "",
+            'stream': self.stream['key'],
+        })
+        if at_bottom:
+            self.chat_display.scrollToBottom()
+
+    def _end_stream(self):
+        """Remove the streaming bubble; returns its render cache key, if any."""
+        self.stream_timer.stop()
+        if self.stream is None:
+            return None
+        stream, self.stream = self.stream, None
+        if stream['item'] is not None:
+            self.chat_display.takeItem(self.chat_display.row(stream['item']))
+        return stream['key']
+
+    def _show_message_menu(self, pos):
+        """Offer branching actions for the chat message under the cursor."""
+        item = self.chat_display.itemAt(pos)
+        node_id = item.data(Qt.UserRole).get('node') if item else None
+        if node_id not in self.conversation:
+            return
+        node = self.conversation.node(node_id)
+        menu = QMenu(self)
+        if node.role == 'user':
+            menu.addAction("Edit and resend", lambda: self._edit_message(node_id))
+        elif node.role == 'assistant' and node.parent is not None and node.parent.role == 'user':
+            menu.addAction("Try another answer", lambda: self._regenerate(node_id))
+        siblings = self.conversation.siblings(node_id)
+        if len(siblings) > 1:
+            menu.addSeparator()
+            for index, sibling in enumerate(siblings, 1):
+                action = menu.addAction(f"Show version {index} of {len(siblings)}",
+                                        lambda sibling=sibling: self._switch_branch(sibling))
+                action.setEnabled(sibling != node_id)
+        if not menu.isEmpty():
+            menu.exec_(self.chat_display.viewport().mapToGlobal(pos))
+
+    def _edit_message(self, node_id: str):
+        """Put a message in the input box; sending it branches from its parent."""
+        node = self.conversation.node(node_id)
+        self.edit_parent = node.parent.id if node.parent else None
+        self.chat_input.setText(node.content)
+        self.chat_input.setFocus()
+
+    def _regenerate(self, node_id: str):
+        """Ask for a new answer to the question an assistant message answered."""
+        self.touch()
+        question = self.conversation.node(node_id).parent
+        self.conversation.checkout(question.id)
+        self._render_branch()
+        self._request_answer(question.content)
+
+    def _switch_branch(self, node_id: str):
+        """Show the newest branch that goes through a message."""
+        self.touch()
+        self.conversation.checkout(self.conversation.leaf(node_id))
+        self._render_branch()
+
+    def _answer_from_cache(self, message: str) -> bool:
+        """Answer from the per-curriculum answer cache; returns True if answered."""
+        if message == self.last_cached_question:
+            # Repeating a question right after a cached answer asks for a fresh one
+            self.last_cached_question = None
+            return False
+        hit = self.parent.answer_cache.lookup(self.curriculum_id, self.topic, message,
+                                              self._preceding_turn(self.conversation.head))
+        if hit is None:
+            return False
+        if hit["action"] == "offer":
+            answer = QMessageBox.question(
+                self,
+                "Similar Question Answered Before",
+                f"A similar question was answered earlier:\n\n\"{hit['question']}\"\n\n"
+                "Show that answer instead of asking the tutor?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.Yes
+            )
+            if answer != QMessageBox.Yes:
+                return False
+            self.parent.answer_cache.record_accepted()
 
-    def _handle_ai_response(self, response: str):
+        self.last_cached_question = message
+        self._add_assistant_message(hit["answer"])
+        self._add_system_message(
+            f"Answered from an earlier session ({int(hit['score'] * 100)}% match). "
+            "Send the question again for a fresh answer."
+        )
+        return True
+
+    def _preceding_turn(self, node_id: str) -> str:
+        """The chat message a question follows, "" for the first question; the answer cache's context."""
+        node = self.conversation.node(node_id).parent if node_id in self.conversation else None
+        while node is not None and node.role not in CHAT_ROLES:
+            node = node.parent
+        return node.content if node is not None else ""
+
+    def _handle_ai_response(self, response: str, question: str = None):
         """Handle the AI response."""
-        self._add_assistant_message(response)
+        self.request_id = None
+        self.last_answered_question = question
+        if question is not None and self.reply_parent is not None:
+            self.parent.answer_cache.add(self.curriculum_id, self.topic, question, response,
+                                         self._preceding_turn(self.reply_parent))
+        # Attach the answer to the question it answers, even if the learner
+        # switched branches while it was being generated. The streamed bubble
+        # gives way to the stored message, which keeps its rendering.
+        stream_key = self._end_stream()
+        node_id = self._append_message('assistant', response, self.reply_parent or "head")
+        self.message_delegate.cache.adopt(stream_key, node_id)
+        self._index_message(node_id)
+        self.reply_parent = None
         self.progress_bar.hide()
         self._enable_input(True)
 
     def _handle_section_click(self, item: QTreeWidgetItem, column: int):
         """Handle clicking on a curriculum section."""
-        text = item.text(0)
-        content = self.curriculum_tree.get_section_content(text)
-        if content:
-            # Convert to HTML with styling
-            html = markdown.markdown(content)
-            styled_html = f"""
-            <style>
-                body {{
-                    color: #ffffff;
-                    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
-                }}
-                h1 {{ 
-                    color: #58a6ff;
-                    font-size: 18px;
-                    margin: 0 0 10px 0;
-                }}
-                ul {{
-                    margin: 0;
-                    padding-left: 20px;
-                }}
-                li {{
-                    color: #cccccc;
-                    margin: 5px 0;
-                }}
-            </style>
-            {html}
-            """
-            self.section_content.setHtml(styled_html)
-            
-            # Mark as completed when clicked
-            self.curriculum_tree.mark_completed(text)
+        self.touch()
+        node_id = item.data(0, NODE_ID_ROLE)
+        if self._display_section(node_id):
+            # Mark as completed when clicked, and come back to it for review later
+            self.curriculum_tree.mark_completed(node_id)
             progress = self.curriculum_tree.update_progress()
             self._update_progress(progress)
+            self._schedule_review(node_id)
+
+    def _display_section(self, node_id: str) -> bool:
+        """Render a section's content; returns False if it has none."""
+        content = self.curriculum_tree.get_section_content(node_id)
+        if not content:
+            return False
+        self.shown_node = node_id
+        # Convert to HTML with styling
+        html = (markdown.markdown(content) + self._explanation_html(node_id)
+                + self._links_html(extract_links(content)))
+        self.section_content.setHtml(f"<style>{SECTION_STYLE}</style>{html}")
+        return True
+
+    def _links_html(self, urls: list) -> str:
+        """A list of a section's links with their check status and prefetched summaries."""
+        if not urls:
+            return ""
+        rows = []
+        for url in urls:
+            result = self.links.get(url)
+            if result is None:
+                status, color = "checking...", COLORS['muted']
+            elif result["ok"]:
+                status, color = "✓ reachable", COLORS['success']
+            else:
+                status, color = f"✗ {result['status'] or result['error']}", COLORS['error']
+            label = html_lib.escape((result or {}).get("title") or url)
+            row = (f'<li><a href="{html_lib.escape(url, quote=True)}" style="color: {COLORS["accent"]};">{label}</a> '
+                   f'<span style="color: {color};">{html_lib.escape(str(status))}</span>')
+            if (result or {}).get("summary"):
+                row += f'<br><span style="color: {COLORS["muted"]};">{html_lib.escape(result["summary"])}</span>'
+            rows.append(row + "</li>")
+        return "<h3>Links</h3><ul>" + "".join(rows) + "</ul>"
+
+    def _check_links(self):
+        """Validate the curriculum's links in the background, showing cached results meanwhile."""
+        urls = extract_links(self.curriculum)
+        checker = self.parent.link_checker
+        self.links = {url: result for url, result in ((url, checker.cached(url)) for url in urls) if result}
+        if urls:
+            self.parent.executor.submit(
+                self, checker.check, urls,
+                on_result=self._handle_links_checked,
+                on_error=lambda error: logger.error(f"Link check for '{self.topic}' failed: {error}"),
+                channel="links",
+                cancellable=True,
+                prefetch=True
+            )
+
+    def _handle_links_checked(self, results: dict):
+        self.links = results
+        broken = [url for url, result in results.items() if not result["ok"]]
+        if broken:
+            logger.info(f"{len(broken)} of {len(results)} links in '{self.topic}' are broken")
+        if self.shown_node is not None and self.shown_node in self.curriculum_tree.progress:
+            self._display_section(self.shown_node)
             
     def _update_progress(self, progress: float):
         """Update progress indicators."""
@@ -0,0 +1,218 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                            QLineEdit, QTextEdit, QRadioButton, QButtonGroup, QWidget)
+from PyQt5.QtCore import Qt
+import logging
+from services.quiz import grade_locally
+from ..styles import set_variant
+
+logger = logging.getLogger(__name__)
+
+
+class QuizDialog(QDialog):
+    """Runs a practice quiz from a prepared question list.
+
+    Objective answers are graded on the spot. Open-ended answers are graded
+    on the shared executor in the background, so the learner can move on
+    to the next question straight away. on_graded, if given, is called
+    with each question and its grading result, and on_finished once, when
+    the dialog closes, with the (question, result) pairs graded by then;
+    run, if given, wraps the background grading calls (e.g. to charge
+    them to a budget scope).
+    """
+
+    def __init__(self, parent, quiz_service, executor, questions, on_graded=None, on_finished=None, run=None):
+        super().__init__(parent)
+        self.quiz_service = quiz_service
+        self.executor = executor
+        self.questions = questions
+        self.on_graded = on_graded
+        self.on_finished = on_finished
+        self.run = run or (lambda fn, *args: fn(*args))
+        self.index = 0
+        self.results = {}  # Question index -> grading result
+        self.pending = set()  # Question indexes waiting for a model grade
+        self.complete = False
+        self.answer_widget = None
+        self.choice_group = None
+        self.setWindowTitle("Practice Quiz")
+        self.setMinimumSize(600, 420)
+        self.init_ui()
+        self._show_question()
+
+    def init_ui(self):
+        self.setObjectName("quizDialog")
+        layout = QVBoxLayout()
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(12)
+
+        header_layout = QHBoxLayout()
+        self.position_label = QLabel()
+        self.position_label.setProperty("role", "muted")
+        header_layout.addWidget(self.position_label)
+        header_layout.addStretch()
+        self.score_label = QLabel()
+        self.score_label.setObjectName("quizScore")
+        header_layout.addWidget(self.score_label)
+        layout.addLayout(header_layout)
+
+        self.section_label = QLabel()
+        self.section_label.setProperty("role", "section")
+        layout.addWidget(self.section_label)
+
+        self.question_label = QLabel()
+        self.question_label.setWordWrap(True)
+        self.question_label.setObjectName("quizQuestion")
+        layout.addWidget(self.question_label)
+
+        self.answer_container = QVBoxLayout()
+        layout.addLayout(self.answer_container)
+
+        self.feedback_label = QLabel()
+        self.feedback_label.setWordWrap(True)
+        self.feedback_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.feedback_label)
+        layout.addStretch()
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.submit_button = QPushButton("Submit")
+        self.submit_button.clicked.connect(self._submit)
+        button_layout.addWidget(self.submit_button)
+        self.next_button = QPushButton("Next")
+        self.next_button.clicked.connect(self._next)
+        button_layout.addWidget(self.next_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def _show_question(self):
+        """Display the current question with an answer widget for its type."""
+        question = self.questions[self.index]
+        self.position_label.setText(f"Question {self.index + 1} of {len(self.questions)}")
+        self.section_label.setText(question.get("section", ""))
+        self.question_label.setText(question["question"])
+        self.feedback_label.clear()
+        self._update_score()
+
+        if self.answer_widget is not None:
+            self.answer_container.removeWidget(self.answer_widget)
+            self.answer_widget.deleteLater()
+        if question["type"] == "multiple_choice":
+            self.answer_widget = QWidget()
+            choices_layout = QVBoxLayout()
+            choices_layout.setContentsMargins(0, 0, 0, 0)
+            self.choice_group = QButtonGroup(self.answer_widget)
+            for choice in question["choices"]:
+                button = QRadioButton(choice)
+                self.choice_group.addButton(button)
+                choices_layout.addWidget(button)
+            self.answer_widget.setLayout(choices_layout)
+        elif question["type"] == "short_answer":
+            self.answer_widget = QLineEdit()
+            self.answer_widget.setPlaceholderText("Your answer")
+            self.answer_widget.returnPressed.connect(self._submit)
+        else:
+            self.answer_widget = QTextEdit()
+            self.answer_widget.setPlaceholderText("Your answer")
+            self.answer_widget.setMaximumHeight(120)
+        self.answer_container.addWidget(self.answer_widget)
+        self.answer_widget.setFocus()
+
+        self.submit_button.setEnabled(True)
+        self.next_button.setText("Finish" if self.index == len(self.questions) - 1 else "Next")
+        self.next_button.setEnabled(False)
+
+    def _answer_text(self) -> str:
+        if isinstance(self.answer_widget, QLineEdit):
+            return self.answer_widget.text().strip()
+        if isinstance(self.answer_widget, QTextEdit):
+            return self.answer_widget.toPlainText().strip()
+        checked = self.choice_group.checkedButton()
+        return checked.text() if checked else ""
+
+    def _submit(self):
+        """Grade the current answer, locally or in the background."""
+        if not self.submit_button.isEnabled():
+            return
+        answer = self._answer_text()
+        if not answer:
+            return
+        self.submit_button.setEnabled(False)
+        self.next_button.setEnabled(True)
+        question = self.questions[self.index]
+        result = grade_locally(question, answer)
+        if result is not None:
+            self._record_result(self.index, result)
+            return
+
+        index = self.index
+        self.pending.add(index)
+        self.executor.submit(
+            self, self.run, self.quiz_service.grade, question, answer,
+            on_result=lambda result: self._record_result(index, result),
+            on_error=lambda error: self._grading_failed(index, error),
+            channel=f"grade-{index}"  # One channel per question so grades never supersede each other
+        )
+        self.feedback_label.setText("Your answer is being graded; you can continue.")
+        set_variant(self.feedback_label, "state", "pending")
+
+    def _record_result(self, index: int, result: dict):
+        self.pending.discard(index)
+        self.results[index] = result
+        if self.on_graded is not None:
+            self.on_graded(self.questions[index], result)
+        if self.complete:
+            self._update_summary()
+        elif index == self.index:
+            self.feedback_label.setText(result["feedback"])
+            set_variant(self.feedback_label, "state", "correct" if result["correct"] else "incorrect")
+        self._update_score()
+
+    def _grading_failed(self, index: int, error: str):
+        logger.error(f"Grading question {index} failed: {error}")
+        self.pending.discard(index)
+        self._update_score()
+        if self.complete:
+            self._update_summary()
+
+    def _update_score(self):
+        correct = sum(1 for result in self.results.values() if result["correct"])
+        text = f"Score: {correct}/{len(self.results)}"
+        if self.pending:
+            text += f" ({len(self.pending)} being graded)"
+        self.score_label.setText(text)
+
+    def _next(self):
+        if self.index < len(self.questions) - 1:
+            self.index += 1
+            self._show_question()
+            return
+        self._show_summary()
+
+    def _show_summary(self):
+        """Replace the question view with the final score."""
+        self.complete = True
+        if self.answer_widget is not None:
+            self.answer_widget.hide()
+        self.position_label.setText("Quiz complete")
+        self.section_label.clear()
+        set_variant(self.feedback_label, "state", "pending")
+        self.submit_button.hide()
+        self.next_button.setText("Close")
+        self.next_button.clicked.disconnect()
+        self.next_button.clicked.connect(self.accept)
+        self._update_summary()
+
+    def _update_summary(self):
+        correct = sum(1 for result in self.results.values() if result["correct"])
+        self.question_label.setText(f"You answered {correct} of {len(self.results)} graded questions correctly.")
+        self.feedback_label.setText(
+            f"{len(self.pending)} answers are still being graded." if self.pending else ""
+        )
+
+    def done(self, result):
+        # Drop callbacks for grades still in flight before the dialog goes away
+        self.executor.release(self)
+        super().done(result)
+        if self.on_finished is not None:
+            on_finished, self.on_finished = self.on_finished, None
+            on_finished([(self.questions[index], graded) for index, graded in sorted(self.results.items())])
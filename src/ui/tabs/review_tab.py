@@ -0,0 +1,140 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QListWidget,
+                            QListWidgetItem, QPushButton, QMessageBox)
+from PyQt5.QtCore import Qt, QTimer
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL_MS = 60 * 1000  # Pick up nodes that fall due while the app is open
+
+
+def _describe_wait(seconds: float) -> str:
+    """Rough human wording for a wait ("3 hours", "2 days")."""
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= size:
+            count = int(seconds // size)
+            return f"{count} {unit}{'s' if count != 1 else ''}"
+    return "a moment"
+
+
+class ReviewTab(QWidget):
+    """Curriculum sections due for spaced-repetition review, across all sessions.
+
+    Opening an entry brings up its learning session at the section and
+    starts a quiz on it; the quiz grades reschedule the section.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent = parent
+        self.init_ui()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.clock = QTimer(self)
+        self.clock.setInterval(REFRESH_INTERVAL_MS)
+        self.clock.timeout.connect(self.refresh)
+        self.clock.start()
+        self.refresh()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(10)
+
+        header = QLabel("Due for Review")
+        header.setProperty("role", "title")
+        layout.addWidget(header)
+        self.summary_label = QLabel()
+        self.summary_label.setProperty("role", "muted")
+        layout.addWidget(self.summary_label)
+
+        self.review_list = QListWidget()
+        self.review_list.setObjectName("reviewList")
+        self.review_list.itemActivated.connect(lambda item: self.start_review(item, quiz=True))
+        layout.addWidget(self.review_list)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        self.open_button = QPushButton("Open Section")
+        self.open_button.clicked.connect(lambda: self.start_review(self.review_list.currentItem(), quiz=False))
+        button_layout.addWidget(self.open_button)
+        self.quiz_button = QPushButton("Review with Quiz")
+        self.quiz_button.clicked.connect(lambda: self.start_review(self.review_list.currentItem(), quiz=True))
+        button_layout.addWidget(self.quiz_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+    def schedule_refresh(self):
+        """Refresh once control returns to the event loop, coalescing bursts of reviews."""
+        self.refresh_timer.start(0)
+
+    def refresh(self):
+        """List the nodes due now, most overdue first."""
+        scheduler = self.parent.review_scheduler
+        now = time.time()
+        due = scheduler.due(now)
+        self.review_list.clear()
+        for entry in due:
+            overdue = now - entry["due"]
+            when = f"overdue by {_describe_wait(overdue)}" if overdue >= 60 else "due now"
+            item = QListWidgetItem(
+                f"🔁 {entry['title']}\n{entry['topic']} - {entry['expertise_level']} Level · {when}"
+            )
+            item.setData(Qt.UserRole, entry)
+            self.review_list.addItem(item)
+
+        if due:
+            self.summary_label.setText(f"{len(due)} section{'s' if len(due) != 1 else ''} due for review")
+        elif scheduler.next_due() is not None:
+            self.summary_label.setText(f"Nothing due. Next review in {_describe_wait(scheduler.next_due() - now)}.")
+        else:
+            self.summary_label.setText("Sections you study are scheduled here for review.")
+        self.open_button.setEnabled(bool(due))
+        self.quiz_button.setEnabled(bool(due))
+        index = self.parent.indexOf(self)
+        if index >= 0:
+            self.parent.setTabText(index, f"Due for Review ({len(due)})" if due else "Due for Review")
+
+    def start_review(self, item: QListWidgetItem, quiz: bool = True):
+        """Open the learning session at a due node, then quiz on it if asked."""
+        entry = item.data(Qt.UserRole) if item is not None else None
+        if not entry:
+            return
+        tab = self._open_session(entry)
+        if tab is None:
+            return
+        if tab.curriculum_id != entry["curriculum_id"]:
+            QMessageBox.information(
+                self, "Session Open",
+                f"A session on '{entry['topic']}' at another level is open; close it to review this section.",
+                QMessageBox.Ok)
+            return
+        if not tab.show_node(entry["node_id"]):
+            # Retitled or removed since it was studied; it has a new schedule if studied again
+            self._forget(entry, "This section is no longer in the curriculum and was removed from your reviews.")
+            return
+        if quiz:
+            tab.start_quiz(entry["node_id"])
+
+    def _open_session(self, entry: dict):
+        """The session that studied the node, else a new one on its stored curriculum."""
+        tab = None
+        if entry.get("session_id"):
+            tab = self.parent.open_session(entry["session_id"])
+        if tab is None:
+            try:
+                record = self.parent.session_store.load_curriculum(entry["curriculum_id"])
+            except ValueError:
+                self._forget(entry, "The curriculum for this section is no longer stored.")
+                return None
+            tab = self.parent.create_learning_session(
+                record["topic"], record["expertise_level"], record["curriculum"])
+        return tab
+
+    def _forget(self, entry: dict, message: str):
+        logger.info(f"Dropping review of '{entry['title']}' ({entry['curriculum_id']})")
+        self.parent.review_scheduler.forget(entry["curriculum_id"], [entry["node_id"]])
+        QMessageBox.information(self, "Review Unavailable", message, QMessageBox.Ok)
+        self.refresh()
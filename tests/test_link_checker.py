@@ -0,0 +1,190 @@
+"""LinkChecker against a local http.server stand-in.
+
+The stand-in answers on 127.0.0.1, which the checker also reaches as
+localhost, so tests can use two hosts to exercise per-host limits.
+"""
+import time
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.link_checker import LinkChecker, extract_links
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+SLOW_SECONDS = 0.2
+PAGE = (b"<html><head><title>Closures  Explained</title>"
+        b'<meta name="description" content="A short guide to closures."></head>'
+        b"<body><p>Ignored paragraph.</p></body></html>")
+PARAGRAPH_PAGE = b"<html><head><title>Scope</title></head><body><p>First   paragraph.</p><p>Second.</p></body></html>"
+
+
+class StandIn(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._respond(body=False)
+
+    def do_GET(self):
+        self._respond(body=True)
+
+    def _respond(self, body: bool):
+        server = self.server
+        host = self.headers["Host"].split(":")[0]
+        with server.lock:
+            server.requests.append((self.command, self.path, dict(self.headers)))
+            server.in_flight[host] += 1
+            server.max_in_flight[host] = max(server.max_in_flight[host], server.in_flight[host])
+        try:
+            status, headers, content = self._route(body)
+        finally:
+            with server.lock:
+                server.in_flight[host] -= 1
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if body:
+            self.wfile.write(content)
+
+    def _route(self, body: bool):
+        html = {"Content-Type": "text/html; charset=utf-8"}
+        if self.path.startswith("/slow/"):
+            time.sleep(SLOW_SECONDS)
+            return 200, html, b"<html></html>"
+        if self.path == "/etag":
+            if self.headers.get("If-None-Match") == ETAG:
+                return 304, {"ETag": ETAG}, b""
+            return 200, dict(html, ETag=ETAG), PAGE
+        if self.path == "/last-modified":
+            if self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+                return 304, {"Last-Modified": LAST_MODIFIED}, b""
+            return 200, dict(html, **{"Last-Modified": LAST_MODIFIED}), PAGE
+        if self.path == "/no-head":
+            if not body:
+                return 405, {}, b""
+            return 200, html, PAGE
+        if self.path == "/page":
+            return 200, html, PAGE
+        if self.path == "/paragraph":
+            return 200, html, PARAGRAPH_PAGE
+        return 404, html, b"<html>Not found</html>"
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.in_flight = Counter()
+    httpd.max_in_flight = Counter()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server, path: str, host: str = "127.0.0.1") -> str:
+    return f"http://{host}:{server.server_address[1]}{path}"
+
+
+def make_checker(tmp_path, **kwargs) -> LinkChecker:
+    kwargs.setdefault("max_workers", 8)
+    kwargs.setdefault("per_host", 4)
+    kwargs.setdefault("ttl_hours", 0)  # Every check goes to the stand-in
+    return LinkChecker(str(tmp_path / "links.json"), **kwargs)
+
+
+def test_extract_links_finds_markdown_and_bare_urls():
+    text = "- [Docs](https://docs.python.org/3/) and https://peps.python.org/pep-0008/.\n- https://docs.python.org/3/"
+    assert extract_links(text) == ["https://docs.python.org/3/", "https://peps.python.org/pep-0008/"]
+
+
+def test_concurrency_is_limited_per_host(tmp_path, server):
+    urls = [url(server, f"/slow/{i}", host) for host in ("127.0.0.1", "localhost") for i in range(8)]
+    checker = make_checker(tmp_path, per_host=2)
+
+    started = time.monotonic()
+    results = checker.check(urls)
+    elapsed = time.monotonic() - started
+
+    assert all(results[link]["ok"] for link in urls)
+    assert server.max_in_flight["127.0.0.1"] == 2
+    assert server.max_in_flight["localhost"] == 2
+    # 8 slow requests per host, 2 at a time, both hosts in parallel
+    assert elapsed < 8 * SLOW_SECONDS
+
+
+def test_etag_revalidation_gets_304_and_keeps_prefetched_summary(tmp_path, server):
+    link = url(server, "/etag")
+    checker = make_checker(tmp_path)
+    first = checker.check([link], prefetch=True)[link]
+    assert first["etag"] == ETAG and first["title"] == "Closures Explained"
+
+    second = checker.check([link], prefetch=True)[link]
+
+    method, _, headers = server.requests[-1]
+    assert method == "GET" and headers.get("If-None-Match") == ETAG
+    assert second["ok"] and second["status"] == 200
+    assert second["title"] == "Closures Explained"
+    assert second["checked"] >= first["checked"]
+
+
+def test_last_modified_revalidation_gets_304(tmp_path, server):
+    link = url(server, "/last-modified")
+    checker = make_checker(tmp_path)
+    checker.check([link])
+
+    result = checker.check([link])[link]
+
+    method, _, headers = server.requests[-1]
+    assert method == "HEAD" and headers.get("If-Modified-Since") == LAST_MODIFIED
+    assert result["ok"] and result["last_modified"] == LAST_MODIFIED
+
+
+def test_fresh_results_are_served_from_the_cache(tmp_path, server):
+    link = url(server, "/page")
+    make_checker(tmp_path, ttl_hours=1).check([link])
+    count = len(server.requests)
+
+    # A new checker reads the saved cache
+    result = make_checker(tmp_path, ttl_hours=1).check([link])[link]
+
+    assert result["ok"]
+    assert len(server.requests) == count
+
+
+def test_head_rejected_falls_back_to_get(tmp_path, server):
+    link = url(server, "/no-head")
+
+    result = make_checker(tmp_path).check([link])[link]
+
+    assert result["ok"] and result["status"] == 200
+    assert [method for method, path, _ in server.requests if path == "/no-head"] == ["HEAD", "GET"]
+
+
+def test_prefetch_reads_title_and_summary(tmp_path, server):
+    page, paragraph = url(server, "/page"), url(server, "/paragraph")
+
+    results = make_checker(tmp_path).check([page, paragraph], prefetch=True)
+
+    assert results[page]["title"] == "Closures Explained"
+    assert results[page]["summary"] == "A short guide to closures."
+    assert results[paragraph]["title"] == "Scope"
+    assert results[paragraph]["summary"] == "First paragraph."
+
+
+def test_broken_and_unreachable_links(tmp_path, server):
+    missing = url(server, "/missing")
+    closed = "http://127.0.0.1:9/unreachable"  # Discard port; nothing listens
+
+    results = make_checker(tmp_path).check([missing, closed])
+
+    assert not results[missing]["ok"] and results[missing]["status"] == 404
+    assert not results[closed]["ok"] and results[closed]["status"] is None